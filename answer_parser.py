@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Javoblarni ajratish (parser)
+
+Ko'p tanlovli javoblar ikki formatda qabul qilinadi:
+
+    1a2b3c4d...   - raqamli: har bir harf oldida savol raqami (tartib ixtiyoriy,
+                    raqam va harf orasida "1) a", "1. a", "1-a" ham mumkin)
+    abcd...       - raqamsiz: harflar savollar tartibida
+
+Matn bitta kompilyatsiya qilingan regex bilan bir marta o'qiladi. Regexning
+har bir varianti oddiy belgilar sinfi - orqaga qaytish (backtracking) yo'q,
+shuning uchun vaqt matn uzunligiga chiziqli bog'liq. MAX_ERRORS ta xatodan
+keyin o'qish to'xtatiladi. Xatolar aniq joyi bilan (matndagi belgi raqami,
+1 dan boshlab) qaytariladi.
+
+Yozma (36-40) va masalaviy (41-43) javoblar - har bir qatorda bitta javob
+(answer_lines).
+"""
+
+import re
+
+# Savol raqami, javob harfi, ajratgichlar yoki boshqa (tushunarsiz) belgi
+_TOKEN = re.compile(r'([0-9]+)|([a-zA-Z])|([\s,;.:()\-=/]+)|(.)', re.S)
+
+# Shuncha xatodan keyin matnni o'qish to'xtatiladi
+MAX_ERRORS = 5
+
+# Standart test: 1-35 ko'p tanlov, 33-35 savollar uchun e va f ham mumkin
+STANDARD_CHOICE_LETTERS = ['abcd'] * 32 + ['abcdef'] * 3
+
+
+def choice_questions(questions):
+    """Ko'p tanlovli savollar indekslari (yozma va masalaviy savollarsiz)"""
+    return [idx for idx, q in enumerate(questions) if q.get('type') not in ('text_answer', 'problem')]
+
+
+def choice_letters(questions):
+    """Har bir ko'p tanlovli savol uchun mumkin bo'lgan harflar (variantlaridan)"""
+    letters = []
+    for idx in choice_questions(questions):
+        options = ''.join(o for o in questions[idx].get('options', []) if isinstance(o, str) and len(o) == 1)
+        letters.append(options.lower() or 'abcd')
+    return letters
+
+
+def parse_choice_answers(text, allowed):
+    """Ko'p tanlovli javoblarni ajratish va tekshirish (bir o'tishda)
+
+    Args:
+        text: foydalanuvchi matni
+        allowed: har bir savol uchun mumkin bo'lgan harflar, masalan ['abcd', ..., 'abcdef']
+
+    Returns:
+        tuple: (answers, errors) - answers: savollar tartibidagi harflar ro'yxati
+        (javob berilmagan savol - None); errors: [(belgi raqami yoki None, xabar), ...].
+        errors bo'sh bo'lsa barcha savollarga to'g'ri javob berilgan.
+    """
+    count = len(allowed)
+    answers = [None] * count
+    errors = []
+    numbered = None     # None - format hali aniqlanmagan
+    pending = None      # (belgi raqami, savol raqami matni) - harfini kutayotgan raqam
+    position = 0        # raqamsiz formatda navbatdagi savol
+
+    for match in _TOKEN.finditer(text):
+        if len(errors) >= MAX_ERRORS:
+            break
+        number, letter, separator, other = match.groups()
+        pos = match.start() + 1
+        if separator:
+            continue
+        if other:
+            errors.append((pos, f"'{other}' - tushunarsiz belgi"))
+            continue
+
+        if number:
+            if pending:
+                errors.append((pending[0], f"{pending[1]}-savol uchun javob harfi yo'q"))
+                pending = None
+            if numbered is False:
+                errors.append((pos, "raqamli va raqamsiz javoblar aralashib ketgan"))
+                continue
+            numbered = True
+            pending = (pos, number[:10])
+            continue
+
+        letter = letter.lower()
+        if pending:
+            number_pos, number = pending
+            pending = None
+            # Juda uzun raqamni int() ga o'tkazmaymiz
+            q_num = int(number) if len(number) <= 4 else 0
+            if not 1 <= q_num <= count:
+                errors.append((number_pos, f"{number}-savol yo'q (1-{count})"))
+                continue
+            idx = q_num - 1
+            if answers[idx] is not None:
+                errors.append((number_pos, f"{q_num}-savolga javob ikki marta berilgan"))
+                continue
+        elif numbered:
+            errors.append((pos, f"'{letter}' javobi oldida savol raqami yo'q"))
+            continue
+        else:
+            numbered = False
+            idx = position
+            position += 1
+            if idx >= count:
+                errors.append((pos, f"ortiqcha javoblar - {count} ta javob kerak"))
+                break
+
+        if letter not in allowed[idx]:
+            errors.append((pos, f"{idx + 1}-savol uchun '{letter}' javobi mumkin emas "
+                                f"({allowed[idx][0]}-{allowed[idx][-1]})"))
+            continue
+        answers[idx] = letter
+
+    if pending and len(errors) < MAX_ERRORS:
+        errors.append((pending[0], f"{pending[1]}-savol uchun javob harfi yo'q"))
+
+    if not errors:
+        missing = [idx + 1 for idx, answer in enumerate(answers) if answer is None]
+        if missing and numbered:
+            errors.append((None, f"javob berilmagan savollar: {_ranges(missing)}"))
+        elif missing:
+            errors.append((None, f"javoblar soni {count - len(missing)} ta, {count} ta kerak"))
+    return answers, errors
+
+
+def _ranges(numbers):
+    """[1, 2, 3, 7] -> "1-3, 7" """
+    parts = []
+    start = prev = numbers[0]
+    for number in numbers[1:] + [None]:
+        if number is not None and number == prev + 1:
+            prev = number
+            continue
+        parts.append(f"{start}-{prev}" if prev > start else str(start))
+        start = prev = number
+    return ', '.join(parts)
+
+
+def format_errors(errors):
+    """Xatolar ro'yxatini foydalanuvchiga ko'rsatish uchun matnga aylantirish"""
+    lines = []
+    for pos, message in errors:
+        lines.append(f"• {pos}-belgi: {message}" if pos else f"• {message}")
+    if len(errors) >= MAX_ERRORS:
+        lines.append("• ...")
+    return '\n'.join(lines)
+
+
+def answer_lines(text, keep_empty=False):
+    """Har bir qatorda bitta javob (yozma va masalaviy savollar uchun)
+
+    Qatorlar boshidagi va oxiridagi bo'shliqlar olib tashlanadi. keep_empty=False
+    bo'lsa bo'sh qatorlar tashlab yuboriladi, aks holda ular ham javob o'rni
+    (javob berilmagan) hisoblanadi.
+    """
+    lines = [line.strip() for line in text.split('\n')]
+    if keep_empty:
+        return lines
+    return [line for line in lines if line]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Natijalangan testlar arxivi (cold storage)
+
+Natijalangan test (test['finalized']) ARCHIVE_AFTER_DAYS kundan keyin
+asosiy ombordan ARCHIVE_DIR katalogiga ko'chiriladi:
+
+    archive/<test_id>.json.gz (yoki .json.xz) - test va uning barcha
+                                                natijalari, siqilgan
+    archive/index.jsonl                       - har bir arxivlangan test
+                                                uchun bitta qator: nomi,
+                                                sanalari va natijalarning
+                                                qisqacha ma'lumoti
+
+Asosiy omborda (va xotirada) faqat faol va yaqinda natijalangan testlar
+qoladi. Indeks esa kichik bo'lib, doim xotirada turadi - my_results va
+statistika arxivlangan natijalarni shundan ko'rsatadi. To'liq natijalar
+(javoblar bilan) kerak bo'lsa read_archive() orqali o'qiladi.
+
+Ko'chirish tartibi: arxiv fayli -> indeks qatori -> ombordan o'chirish.
+Oraliqda to'xtab qolinsa keyingi tekshiruvda ish davom ettiriladi.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import lzma
+import os
+from datetime import datetime, timedelta, timezone
+
+import config
+from database import transaction, get_test_result_ids, delete_test
+from storage import atomic_write_bytes, append_lines, iter_journal, truncate_torn_tail, result_summary
+
+logger = logging.getLogger(__name__)
+
+# Ixtiyoriy sozlamalar (eski config.py fayllarida bo'lmasligi mumkin)
+ARCHIVE_DIR = getattr(config, 'ARCHIVE_DIR', 'archive')
+# Natijalangandan keyin shuncha kun o'tgach arxivlanadi; None - arxivlash o'chirilgan
+ARCHIVE_AFTER_DAYS = getattr(config, 'ARCHIVE_AFTER_DAYS', 30)
+# "gzip" yoki "lzma" (sekinroq, lekin kichikroq fayl)
+ARCHIVE_COMPRESSION = getattr(config, 'ARCHIVE_COMPRESSION', 'gzip')
+# Arxivlash kerak bo'lgan testlarni tekshirish oralig'i (soniya)
+ARCHIVE_CHECK_INTERVAL = getattr(config, 'ARCHIVE_CHECK_INTERVAL', 6 * 3600)
+
+# Siqish formati -> (modul, fayl kengaytmasi)
+_COMPRESSORS = {
+    'gzip': (gzip, '.json.gz'),
+    'lzma': (lzma, '.json.xz'),
+}
+
+# Arxiv indeksi (birinchi murojaatda o'qiladi)
+_index = None           # test_id -> indeks yozuvi
+_results_by_user = {}   # user_id -> [natija qisqacha ma'lumoti, ...]
+
+
+def _index_path():
+    return os.path.join(ARCHIVE_DIR, 'index.jsonl')
+
+
+def _add_to_user_index(entry):
+    for summary in entry['results']:
+        _results_by_user.setdefault(summary.get('user_id'), []).append(summary)
+
+
+def load_index():
+    """Arxiv indeksini qaytarish: test_id -> {name, finalized_at, archived_at, file, results}"""
+    global _index
+    if _index is None:
+        _index = {}
+        for record in iter_journal(_index_path()):
+            # Test qayta arxivlangan bo'lsa oxirgi qator amal qiladi
+            _index[record['key']] = record['value']
+        truncate_torn_tail(_index_path())
+        _results_by_user.clear()
+        for entry in _index.values():
+            _add_to_user_index(entry)
+    return _index
+
+
+def archived_results(data, user_id=None):
+    """Arxivlangan natijalarning qisqacha ma'lumoti (javoblarsiz)
+
+    Hali asosiy omborda turgan testlar (arxivlash oxirigacha yetmagan)
+    o'tkazib yuboriladi - ularning natijalari ombordan olinadi.
+    """
+    index = load_index()
+    tests = data.get('tests', {})
+    if user_id is None:
+        summaries = [s for entry in index.values() for s in entry['results']]
+    else:
+        summaries = _results_by_user.get(user_id, [])
+    return [s for s in summaries if s.get('test_id') not in tests]
+
+
+def read_archive(test_id):
+    """Arxivlangan testni natijalari bilan o'qish
+
+    Returns:
+        dict: {'test': ..., 'user_results': {result_id: natija}} yoki None
+    """
+    entry = load_index().get(test_id)
+    if entry is None:
+        return None
+    path = os.path.join(ARCHIVE_DIR, entry['file'])
+    compression = 'lzma' if path.endswith('.xz') else 'gzip'
+    with _COMPRESSORS[compression][0].open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _finalized_at(test):
+    """Test natijalangan vaqt (noma'lum bo'lsa None)"""
+    try:
+        return datetime.fromisoformat(test['finalized_at'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def due_tests(data, now=None):
+    """Arxivlash vaqti kelgan testlar ID lari"""
+    if ARCHIVE_AFTER_DAYS is None:
+        return []
+    now = now or datetime.now(timezone.utc)
+    grace = timedelta(days=ARCHIVE_AFTER_DAYS)
+    due = []
+    for test_id, test in data.get('tests', {}).items():
+        finalized_at = _finalized_at(test) if test.get('finalized') else None
+        if finalized_at is None:
+            continue
+        current = now if finalized_at.tzinfo else now.replace(tzinfo=None)
+        if current - finalized_at >= grace:
+            due.append(test_id)
+    return due
+
+
+def _write_archive(file_name, text, entry_line):
+    """Siqilgan arxiv faylini va indeks qatorini yozish (alohida oqimda)"""
+    module, _ = _COMPRESSORS[ARCHIVE_COMPRESSION]
+    atomic_write_bytes(os.path.join(ARCHIVE_DIR, file_name), module.compress(text.encode('utf-8')))
+    append_lines(_index_path(), [entry_line])
+
+
+async def archive_test(data, test_id):
+    """Bitta testni arxivga ko'chirish (transaction() ichida chaqiriladi)
+
+    Returns:
+        int: arxivlangan natijalar soni
+    """
+    index = load_index()
+    result_ids = get_test_result_ids(test_id)
+    if test_id not in index:
+        test = data['tests'][test_id]
+        user_results = {r_id: data['user_results'][r_id] for r_id in result_ids}
+        file_name = f"{test_id}{_COMPRESSORS[ARCHIVE_COMPRESSION][1]}"
+        entry = {
+            'name': test.get('name'),
+            'finalized_at': test.get('finalized_at'),
+            'archived_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'file': file_name,
+            'results': [result_summary(r) for r in user_results.values()],
+        }
+        # Matnlar event loop ichida tayyorlanadi - keyin ma'lumot o'zgarsa ham arxiv butun
+        text = json.dumps({'test': test, 'user_results': user_results}, ensure_ascii=False)
+        entry_line = json.dumps({'key': test_id, 'value': entry}, ensure_ascii=False) + '\n'
+        await asyncio.to_thread(_write_archive, file_name, text, entry_line)
+        index[test_id] = entry
+        _add_to_user_index(entry)
+    # Indeksda bor, lekin ombordan o'chirilmay qolgan test - faqat o'chiriladi
+    await delete_test(test_id)
+    return len(result_ids)
+
+
+async def archive_due_tests(now=None):
+    """Vaqti kelgan barcha natijalangan testlarni arxivlash
+
+    Returns:
+        int: arxivlangan testlar soni
+    """
+    if ARCHIVE_AFTER_DAYS is None:
+        return 0
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived = 0
+    async with transaction() as data:
+        for test_id in due_tests(data, now):
+            try:
+                count = await archive_test(data, test_id)
+            except Exception as e:
+                logger.error(f"Testni arxivlash xatosi ({test_id}): {e}")
+                continue
+            archived += 1
+            logger.info(f"Test arxivlandi: {test_id} ({count} ta natija)")
+    return archived
+
+
+async def run_periodically():
+    """Har ARCHIVE_CHECK_INTERVAL soniyada arxivlash (bot ishlayotgan vaqtda)"""
+    while True:
+        try:
+            await archive_due_tests()
+        except Exception as e:
+            logger.error(f"Arxivlash xatosi: {e}")
+        await asyncio.sleep(ARCHIVE_CHECK_INTERVAL)
+
+
+if __name__ == '__main__':
+    # Foydalanish: python3 archive.py <test_id> - arxivlangan testni JSON ko'rinishida chiqarish
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Foydalanish: python3 archive.py <test_id>")
+        sys.exit(1)
+    archived = read_archive(sys.argv[1])
+    if archived is None:
+        print("Test arxivda topilmadi")
+        sys.exit(1)
+    print(json.dumps(archived, ensure_ascii=False, indent=2))
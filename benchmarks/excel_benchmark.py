@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel eksport benchmarki (oqimli va xotiradagi kitob)
+
+Solishtiriladi:
+    legacy  - eski usul: to'liq xotiradagi Workbook, har bir katakka alohida
+              Font/Alignment, natijalar varag'ida iter_rows bilan ikkinchi
+              o'tish (har bir katakni markazlashtirish)
+    stream  - utils._excel_workbook(): write-only Workbook va nomlangan uslublar
+
+Ikki turdagi fayl:
+    results - test natijalari (6 ustun, barcha kataklar markazlashtirilgan),
+              generate_test_results_excel()
+    matrix  - 0-1 matrix (Talabgor + 40 ustun, faqat header formatlangan),
+              _write_matrix_excel()
+
+Har bir qatorlar soni uchun vaqt (eng yaxshi natija) va tracemalloc bilan
+eng katta xotira chiqariladi. Avval ikkala usul bir xil qiymatlar va
+formatlash berishi tekshiriladi.
+
+Foydalanish:
+    python3 benchmarks/excel_benchmark.py [--rows 1000,10000] [--repeat 3]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_TEMPLATE = '''BOT_TOKEN = "123456:BENCHMARK"
+BOSS_ID = 1
+DATA_FILE = {data_file!r}
+'''
+
+
+def legacy_results(file_path, finalized_results):
+    """Eski generate_test_results_excel (xotiradagi kitob, iter_rows bilan markazlashtirish)"""
+    from datetime import datetime
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Test Natijalari"
+    headers = ['#', 'Talabgor', 'To\'g\'ri javoblar', 'Jami savollar', 'Foiz (%)', 'Vaqt']
+    ws.append(headers)
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    for cell in ws[1]:
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.fill = header_fill
+    for idx, result in enumerate(finalized_results, 1):
+        completed_time = datetime.fromisoformat(result['completed_at']).strftime('%Y-%m-%d %H:%M')
+        ws.append([idx, result['user_id'], result['correct'], result['total'],
+                   round(result['percentage'], 2), completed_time])
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 20
+    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
+        for cell in row:
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+    wb.save(file_path)
+
+
+def legacy_matrix(file_path, sheet_title, header, names, rows):
+    """Eski _write_matrix_excel (xotiradagi kitob)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet_title
+    ws.append(header)
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='center')
+    for name, row in zip(names, rows):
+        ws.append([name] + row)
+    wb.save(file_path)
+
+
+def stream_results(file_path, finalized_results):
+    """utils.generate_test_results_excel - xotiradagi fayl solishtirish uchun diskka yoziladi"""
+    import utils
+
+    with open(file_path, 'wb') as f:
+        f.write(utils.generate_test_results_excel('benchmark', finalized_results).getvalue())
+
+
+def stream_matrix(file_path, sheet_title, header, names, rows):
+    import utils
+
+    with open(file_path, 'wb') as f:
+        f.write(utils._write_matrix_excel(sheet_title, header, names, rows, 'matrix_benchmark_').getvalue())
+
+
+def build_inputs(n_rows, rng):
+    finalized_results = [{
+        'user_id': 100000 + idx,
+        'correct': (correct := rng.randint(0, 43)),
+        'total': 43,
+        'percentage': correct / 43 * 100,
+        'completed_at': f"2024-05-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+    } for idx in range(n_rows)]
+    header = ['Talabgor'] + [f"Q{idx + 1}" for idx in range(40)]
+    names = [f"Talaba {idx + 1}" for idx in range(n_rows)]
+    rows = [[rng.randint(0, 1) for _ in range(40)] for _ in range(n_rows)]
+    return (finalized_results,), ("Questions 1-40", header, names, rows)
+
+
+def sheet_summary(file_path):
+    """Varaqdagi qiymatlar va har bir katak formatlashi (solishtirish uchun)"""
+    import openpyxl
+
+    def color(font):
+        # Oddiy shrift rangi mavzu (theme) rangi bo'lishi mumkin - faqat aniq RGB solishtiriladi
+        return font.color.rgb if font.color is not None and font.color.type == 'rgb' else None
+
+    ws = openpyxl.load_workbook(file_path).active
+    return ws.title, [[(c.value, c.font.b, color(c.font), c.fill.fgColor.rgb,
+                        c.alignment.horizontal, c.alignment.vertical) for c in row] for row in ws.iter_rows()]
+
+
+def measure(func, args, file_path, repeat):
+    """Eng yaxshi vaqt (soniya), eng katta xotira (bayt) va fayl hajmi"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(file_path, *args)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func(file_path, *args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, os.path.getsize(file_path)
+
+
+def option(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def main():
+    row_counts = [int(v) for v in option('--rows', '1000,10000').split(',')]
+    repeat = int(option('--repeat', '3'))
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # utils config.py ni import qiladi - vaqtinchalik katalogda soxta config,
+        # Excel fayllari ham shu katalogga yoziladi
+        with open(os.path.join(tmp_dir, 'config.py'), 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(data_file=os.path.join(tmp_dir, 'data.json')))
+        sys.path[:0] = [tmp_dir, REPO_DIR]
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            kinds = (('results', legacy_results, stream_results), ('matrix', legacy_matrix, stream_matrix))
+
+            # Ikkala usul bir xil fayl berishini tekshirish (kichik hajmda)
+            small = build_inputs(50, rng)
+            for (kind, legacy, stream), args in zip(kinds, small):
+                legacy('legacy.xlsx', *args)
+                stream('stream.xlsx', *args)
+                assert sheet_summary('legacy.xlsx') == sheet_summary('stream.xlsx'), kind
+            print("Ikkala usulda qiymatlar va formatlash bir xil\n")
+
+            print(f"{'fayl':<8} {'qatorlar':>8} {'usul':<7} {'vaqt':>10} {'xotira':>11} {'hajm':>10}")
+            for n_rows in row_counts:
+                inputs = build_inputs(n_rows, rng)
+                for (kind, legacy, stream), args in zip(kinds, inputs):
+                    for method, func in (('legacy', legacy), ('stream', stream)):
+                        seconds, peak, size = measure(func, args, f"{kind}_{method}.xlsx", repeat)
+                        print(f"{kind:<8} {n_rows:>8} {method:<7} {seconds * 1e3:>8.1f}ms "
+                              f"{peak / 2**20:>7.1f} MiB {size / 1024:>7.0f} KiB", flush=True)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
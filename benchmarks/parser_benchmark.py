@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Javoblar parseri benchmarki (oddiy, uzun va zararli kiritishlar)
+
+Solishtiriladi:
+    legacy_taking   - eski process_test_answers tsikli (harflarni sanash)
+    legacy_creation - eski process_test_creation: r'(\\d+)([a-fA-F])' findall
+                      + harflar bo'yicha ikkinchi o'tish
+    parser          - answer_parser.parse_choice_answers()
+
+Har bir kiritish uchun bitta xabarni qayta ishlash vaqti (eng yaxshi natija)
+chiqariladi. Oddiy to'g'ri kiritishlarda eski va yangi parser bir xil
+javoblar berishi avval tekshiriladi.
+
+--size - uzun kiritishlar hajmi (standart 4096 - Telegram xabarining
+maksimal uzunligi). Kattaroq hajmda legacy_creation juda sekin (kvadratik).
+
+Foydalanish:
+    python3 benchmarks/parser_benchmark.py [--size 4096]
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_parser import STANDARD_CHOICE_LETTERS, parse_choice_answers  # noqa: E402
+
+
+def legacy_taking(text):
+    """Eski process_test_answers: 1-35 savollar uchun harflarni ketma-ket yig'ish"""
+    answers = []
+    for char in text.lower():
+        question_idx = len(answers)
+        if question_idx >= 35:
+            break
+        if question_idx in [32, 33, 34]:
+            if char in 'abcdef':
+                answers.append(char)
+        elif char in 'abcd':
+            answers.append(char)
+    return answers if len(answers) == 35 else None
+
+
+def legacy_creation(text):
+    """Eski process_test_creation: raqam+harf juftliklari, bo'lmasa harflar"""
+    mc_answers = {}
+    for num_str, letter in re.findall(r'(\d+)([a-fA-F])', text):
+        q_num = int(num_str)
+        if q_num <= 35:
+            mc_answers[q_num] = letter.lower()
+    if len(mc_answers) < 35:
+        return legacy_taking(text)
+    return [mc_answers.get(q_num) for q_num in range(1, 36)]
+
+
+def parser(text):
+    answers, errors = parse_choice_answers(text, STANDARD_CHOICE_LETTERS)
+    return None if errors else answers
+
+
+def build_inputs(size, rng):
+    key = [rng.choice('abcdef' if idx >= 32 else 'abcd') for idx in range(35)]
+    numbered = ''.join(f"{idx + 1}{letter}" for idx, letter in enumerate(key))
+    return key, {
+        "raqamsiz (abc...)": ''.join(key),
+        "raqamli (1a2b...)": numbered,
+        "raqamli, bo'shliqlar bilan": ' '.join(f"{idx + 1}) {letter.upper()}" for idx, letter in enumerate(key)),
+        f"uzun raqam ({size} ta '1')": '1' * size,
+        f"raqamlar + bo'shliq ({size})": ('1' * 50 + ' ' * 50) * (size // 100),
+        f"'a' x {size}": 'a' * size,
+        f"tasodifiy belgilar ({size})": ''.join(rng.choice('0123456789abcdefxyz ,.-)') for _ in range(size)),
+        f"kirill harflari ({size})": 'абвгд' * (size // 5),
+        f"raqamli javob, {size} belgigacha takrorlangan": (numbered * (size // len(numbered) + 1))[:size],
+    }, numbered
+
+
+def best_time(func, text, budget=0.2):
+    """Bitta chaqiruv vaqti (eng yaxshisi), sekin funksiyalar kamroq takrorlanadi"""
+    single = timeit.timeit(lambda: func(text), number=1)
+    number = max(1, min(1000, int(budget / max(single, 1e-7))))
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=3)) / number
+
+
+def main():
+    size = 4096
+    if '--size' in sys.argv:
+        size = int(sys.argv[sys.argv.index('--size') + 1])
+
+    rng = random.Random(7)
+    key, inputs, numbered = build_inputs(size, rng)
+    for text in (''.join(key), numbered, numbered.upper()):
+        assert parser(text) == key == legacy_creation(text)
+    assert parser(''.join(key)) == legacy_taking(''.join(key))
+    print("To'g'ri kiritishlarda natijalar bir xil\n")
+
+    print(f"{'kiritish':<44} {'legacy_taking':>14} {'legacy_creation':>16} {'parser':>10}")
+    for title, text in inputs.items():
+        times = [best_time(func, text) for func in (legacy_taking, legacy_creation, parser)]
+        print(f"{title:<44} " + ' '.join(f"{t * 1e6:>{w}.1f}us" for t, w in zip(times, (12, 14, 8))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rasch tahlili benchmarki (sintetik ma'lumotlarda)
+
+Javoblar Rasch modelining o'zidan generatsiya qilinadi: talabalar
+qobiliyati theta ~ N(0, 1), savollar qiyinligi beta ~ U(-2, 2),
+P(to'g'ri) = 1 / (1 + exp(beta - theta)). Har bir o'lcham uchun:
+
+    rasch_model_analysis  - vaqt, iteratsiyalar soni, eng katta xotira
+    rasch_fit_analysis    - vaqt va xotira (xatoliklar, infit/outfit bilan)
+    tiklash xatosi        - baholangan va haqiqiy theta/beta orasidagi RMSE
+                            (ikkalasi ham talabalar o'rtachasi 0 shkalasida)
+    perform_rasch_analysis, generate_final_results_excel
+                          - standart tuzilishdagi testda (35 ko'p tanlov,
+                            5 yozma, 3 masalaviy savol), --no-reports bo'lmasa
+
+Vaqt - bir nechta takrorlashning eng yaxshisi. Xotira tracemalloc bilan
+alohida chaqiruvda o'lchanadi (numpy massivlari ham hisobga olinadi).
+
+Natijalar jadval ko'rinishida chiqariladi va --output berilsa JSON faylga
+yoziladi. --baseline bilan avvalgi JSON bilan solishtiriladi: vaqt
+--tolerance dan ko'proq oshsa, iteratsiyalar ko'paysa yoki tiklash xatosi
+oshsa - regressiya, dastur 1 kodi bilan tugaydi.
+
+Foydalanish:
+    python3 benchmarks/rasch_benchmark.py [--students 100,1000,10000,50000]
+        [--items 40,60] [--repeat 3] [--no-reports]
+        [--output rasch.json] [--baseline rasch.json] [--tolerance 0.25]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_TEMPLATE = '''BOT_TOKEN = "123456:BENCHMARK"
+BOSS_ID = 1
+DATA_FILE = {data_file!r}
+'''
+
+TEST_ID = 'test_benchmark'
+SEED = 2024
+# Shundan kichik vaqt farqlari regressiya hisoblanmaydi (o'lchov shovqini)
+MIN_TIME_DIFF = 0.002
+
+
+def generate_responses(n_students, n_items, rng):
+    """Rasch modelidan 0-1 javoblar matritsasi va haqiqiy parametrlar"""
+    import numpy as np
+
+    theta = rng.normal(0.0, 1.0, n_students)
+    beta = rng.uniform(-2.0, 2.0, n_items)
+    p = 1.0 / (1.0 + np.exp(beta[np.newaxis, :] - theta[:, np.newaxis]))
+    matrix = (rng.random((n_students, n_items)) < p).astype(np.uint8)
+    return matrix, theta, beta
+
+
+def recovery_error(theta_hat, beta_hat, theta, beta):
+    """Baholangan parametrlarning haqiqiy qiymatlardan RMSE si
+
+    Model faqat theta - beta farqini aniqlaydi: tahlil theta ni talabalar
+    bo'yicha markazlaydi, shuning uchun haqiqiy qiymatlar ham shu shkalaga
+    o'tkaziladi.
+    """
+    import numpy as np
+
+    shift = theta.mean()
+    theta_rmse = float(np.sqrt(np.mean((theta_hat - (theta - shift)) ** 2)))
+    beta_rmse = float(np.sqrt(np.mean((beta_hat - (beta - shift)) ** 2)))
+    return theta_rmse, beta_rmse
+
+
+def best_time(func, repeat):
+    """Eng yaxshi vaqt (soniya) va oxirgi natija"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def peak_memory(func):
+    """func() bajarilishidagi eng katta qo'shimcha xotira (baytlarda)"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def build_snapshot(n_students, rng):
+    """Standart tuzilishdagi test uchun build_test_snapshot() ko'rinishidagi ma'lumot
+
+    0-1 matritsa tayyor holda (response_tensors) beriladi - natijalar
+    yozuvlari yaratilmaydi.
+    """
+    import numpy as np
+    from result_codec import response_layout
+
+    questions = [{'question': f"Savol {idx + 1}", 'options': list('abcd'), 'correct': 'a'} for idx in range(35)]
+    questions += [{'question': f"Savol {36 + idx}", 'type': 'text_answer', 'options': [], 'correct': 'x'}
+                  for idx in range(5)]
+    questions += [{'question': f"Savol {41 + idx}", 'type': 'problem', 'options': [],
+                   'correct': ['1'] * count, 'sub_question_count': count}
+                  for idx, count in enumerate((4, 3, 5))]
+    labels, _, sub_counts = response_layout(questions)
+    matrix, _, _ = generate_responses(n_students, len(labels), rng)
+    matrix.flags.writeable = False
+    user_ids = np.arange(1, n_students + 1, dtype=np.int64)
+    return {
+        'tests': {TEST_ID: {'name': 'Benchmark', 'questions': questions}},
+        'user_results': {},
+        'users': {str(uid): {'first_name': 'Talaba', 'last_name': str(uid)} for uid in user_ids.tolist()},
+        'response_tensors': {TEST_ID: {
+            'user_ids': user_ids,
+            'matrix': matrix,
+            'labels': labels,
+            'item_question': np.repeat(np.arange(len(questions)), [max(c, 1) for c in sub_counts]),
+            'question_types': [q.get('type', 'choice') for q in questions],
+        }},
+    }
+
+
+def run_case(n_students, n_items, repeat, reports):
+    """Bitta o'lcham uchun barcha o'lchovlar"""
+    import numpy as np
+    import utils
+
+    # Har bir o'lcham o'z seed i bilan - boshqa o'lchamlar tanlanishidan qat'i nazar bir xil ma'lumot
+    rng = np.random.default_rng([SEED, n_students, n_items])
+
+    matrix, theta, beta = generate_responses(n_students, n_items, rng)
+    case = {'n_students': n_students, 'n_items': n_items}
+
+    case['solve_seconds'], (theta_hat, beta_hat) = best_time(lambda: utils.rasch_model_analysis(matrix), repeat)
+    case['iterations'] = utils._solve_rasch(matrix)['iterations']
+    case['solve_peak_bytes'] = peak_memory(lambda: utils.rasch_model_analysis(matrix))
+    case['theta_rmse'], case['beta_rmse'] = recovery_error(theta_hat, beta_hat, theta, beta)
+
+    case['fit_seconds'], fit = best_time(lambda: utils.rasch_fit_analysis(matrix), repeat)
+    case['fit_peak_bytes'] = peak_memory(lambda: utils.rasch_fit_analysis(matrix))
+    case['mean_infit'] = float(fit['infit'].mean())
+    case['mean_outfit'] = float(fit['outfit'].mean())
+
+    # Boshlang'ich qiymatni oldingi yechimdan olish (qayta tahlil holati)
+    case['warm_seconds'], _ = best_time(lambda: utils.rasch_model_analysis(matrix, beta_init=beta_hat), repeat)
+
+    if reports:
+        snapshot = build_snapshot(n_students, rng)
+
+        def perform():
+            # Warm start keshi har bir o'lchovda tozalanadi - birinchi tahlil holati
+            utils._rasch_difficulties.clear()
+            return utils.perform_rasch_analysis(TEST_ID, snapshot, '1-40')
+
+        case['perform_seconds'], _ = best_time(perform, repeat)
+        case['excel_seconds'], excel = best_time(lambda: utils.generate_final_results_excel(TEST_ID, snapshot), 1)
+        case['excel_bytes'] = len(excel.getvalue()) if excel else None
+    return case
+
+
+def compare(cases, baseline, tolerance):
+    """Avvalgi natijalar bilan solishtirish - regressiyalar ro'yxati"""
+    previous = {(c['n_students'], c['n_items']): c for c in baseline.get('cases', [])}
+    regressions = []
+    for case in cases:
+        old = previous.get((case['n_students'], case['n_items']))
+        if old is None:
+            continue
+        name = f"{case['n_students']}x{case['n_items']}"
+        for key in ('solve_seconds', 'fit_seconds', 'warm_seconds', 'perform_seconds', 'excel_seconds'):
+            if (case.get(key) is not None and old.get(key) and case[key] > old[key] * (1 + tolerance)
+                    and case[key] - old[key] > MIN_TIME_DIFF):
+                regressions.append(f"{name}: {key} {old[key]:.4f} -> {case[key]:.4f}")
+        if case['iterations'] > old.get('iterations', case['iterations']):
+            regressions.append(f"{name}: iterations {old['iterations']} -> {case['iterations']}")
+        for key in ('theta_rmse', 'beta_rmse'):
+            if key in old and case[key] > old[key] + 0.01:
+                regressions.append(f"{name}: {key} {old[key]:.4f} -> {case[key]:.4f}")
+    return regressions
+
+
+def option(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def main():
+    students = [int(v) for v in option('--students', '100,1000,10000,50000').split(',')]
+    items = [int(v) for v in option('--items', '40,60').split(',')]
+    repeat = int(option('--repeat', '3'))
+    output = option('--output', None)
+    baseline_path = option('--baseline', None)
+    tolerance = float(option('--tolerance', '0.25'))
+    reports = '--no-reports' not in sys.argv
+    if output:
+        output = os.path.abspath(output)
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    import numpy as np
+
+    cases = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # utils config.py ni import qiladi - vaqtinchalik katalogda soxta config,
+        # Excel fayllari ham (SAVE_REPORTS bo'lsa) shu katalogga yoziladi
+        with open(os.path.join(tmp_dir, 'config.py'), 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(data_file=os.path.join(tmp_dir, 'data.json')))
+        sys.path[:0] = [tmp_dir, REPO_DIR]
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            for n_students in students:
+                for n_items in items:
+                    cases.append(run_case(n_students, n_items, repeat, reports))
+                    case = cases[-1]
+                    line = (f"{n_students:>7} x {n_items:<3} solve {case['solve_seconds'] * 1e3:8.1f} ms "
+                            f"({case['iterations']:>2} it, {case['solve_peak_bytes'] / 2**20:6.1f} MiB)  "
+                            f"fit {case['fit_seconds'] * 1e3:8.1f} ms  warm {case['warm_seconds'] * 1e3:7.1f} ms  "
+                            f"RMSE theta {case['theta_rmse']:.3f} beta {case['beta_rmse']:.3f}")
+                    if reports:
+                        line += (f"  perform {case['perform_seconds'] * 1e3:8.1f} ms"
+                                 f"  excel {case['excel_seconds']:6.2f} s")
+                    print(line, flush=True)
+        finally:
+            os.chdir(cwd)
+
+    result = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'cases': cases,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nNatijalar yozildi: {output}")
+
+    if baseline_path:
+        regressions = compare(cases, baseline, tolerance)
+        if regressions:
+            print("\nRegressiyalar:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nRegressiya yo'q")
+
+
+if __name__ == '__main__':
+    main()
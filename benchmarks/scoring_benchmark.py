@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bitta topshiriqni baholash narxi (finish_test) benchmarki
+
+Solishtiriladi:
+    legacy - eski finish_test tsikli: har bir savol uchun tur bo'yicha
+             tarmoqlanish, to'g'ri javoblarni qayta strip/lower qilish va
+             batafsil ro'yxatni encode_items() bilan ixcham formatga o'tkazish
+    plan   - scoring.ScoringPlan.score() (reja oldindan tuzilgan)
+
+Shuningdek, kalit tahrirlanganda bir testning barcha natijalarini qayta
+baholash (ScoringPlan.score_many) vaqti o'lchanadi.
+
+Avval barcha usullar tasodifiy javoblarda bir xil natija berishi tekshiriladi.
+Test standart tuzilishda: 35 ko'p tanlov, 5 yozma, 3 masalaviy savol.
+
+Foydalanish:
+    python3 benchmarks/scoring_benchmark.py [--submissions 2000] [--students 300]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_codec import encode_items  # noqa: E402
+from scoring import ScoringPlan  # noqa: E402
+
+
+def build_questions(rng):
+    """Standart 43 savolli test"""
+    questions = []
+    for idx in range(35):
+        options = list('abcdef') if idx in (32, 33, 34) else list('abcd')
+        questions.append({'question': f"Savol {idx + 1}", 'options': options, 'correct': rng.choice(options)})
+    for idx in range(5):
+        questions.append({'question': f"Savol {36 + idx}", 'type': 'text_answer', 'options': [],
+                          'correct': rng.choice([' Toshkent', 'x=2', '3.14 ', 'Amir Temur'])})
+    for idx, sub_count in enumerate((4, 3, 5)):
+        correct = [str(rng.randint(1, 99)) for _ in range(sub_count)]
+        questions.append({'question': f"Savol {41 + idx} (masalaviy)", 'type': 'problem', 'options': [],
+                          'correct': correct, 'sub_question_count': sub_count})
+    return questions
+
+
+def random_answers(questions, rng):
+    """Talaba javoblari (to'g'ri, noto'g'ri, katta harf, bo'sh va h.k.)"""
+    answers = {}
+    for idx, question in enumerate(questions):
+        q_type = question.get('type')
+        if q_type == 'problem':
+            parts = [c if rng.random() < 0.7 else str(rng.randint(1, 99)) for c in question['correct']]
+            cut = rng.choice([len(parts), len(parts), len(parts) - 1, len(parts) + 1])
+            parts = (parts + ['7'])[:cut]
+            answers[str(idx)] = ', '.join(parts)
+        elif q_type == 'text_answer':
+            answers[str(idx)] = rng.choice([question['correct'].upper(), question['correct'], 'boshqa'])
+        elif rng.random() < 0.95:
+            answers[str(idx)] = rng.choice(question['options'])
+    return answers
+
+
+def legacy_score(questions, user_answers):
+    """Eski finish_test hisoblashi (o'zgarishsiz nusxa)"""
+    correct = 0
+    results = []
+    for idx, question in enumerate(questions):
+        user_answer = user_answers.get(str(idx), '')
+        if question.get('type') == 'text_answer':
+            correct_answer = question.get('correct', '')
+            is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
+            if is_correct:
+                correct += 1
+            results.append({'question': question['question'], 'user_answer': user_answer,
+                            'correct_answer': correct_answer, 'is_correct': is_correct, 'type': 'text_answer'})
+        elif question.get('type') == 'problem':
+            correct_answers = question.get('correct', [])
+            user_answers_list = [a.strip() for a in user_answer.split(',')]
+            sub_results = []
+            correct_count = 0
+            for i, (user_ans, correct_ans) in enumerate(zip(user_answers_list, correct_answers)):
+                is_sub_correct = user_ans.strip().lower() == correct_ans.strip().lower()
+                if is_sub_correct:
+                    correct_count += 1
+                sub_results.append({'sub_index': i + 1, 'user_answer': user_ans.strip(),
+                                    'correct_answer': correct_ans.strip(), 'is_correct': is_sub_correct})
+            is_correct = (correct_count == len(correct_answers))
+            if is_correct:
+                correct += 1
+            results.append({'question': question['question'], 'user_answer': user_answer,
+                            'correct_answer': ','.join(correct_answers), 'is_correct': is_correct,
+                            'type': 'problem', 'sub_results': sub_results,
+                            'sub_question_count': len(correct_answers)})
+        else:
+            is_correct = user_answer == question['correct']
+            if is_correct:
+                correct += 1
+            results.append({'question': question['question'], 'user_answer': user_answer,
+                            'correct_answer': question['correct'], 'is_correct': is_correct})
+    answers, correct_bits = encode_items(questions, results)
+    return answers, correct_bits, correct
+
+
+def plan_score(plan, total, user_answers):
+    """Yangi finish_test hisoblashi"""
+    answers = [user_answers.get(str(idx), '') for idx in range(total)]
+    correct_bits, correct = plan.score(answers)
+    return answers, correct_bits, correct
+
+
+def main():
+    submissions = 2000
+    if '--submissions' in sys.argv:
+        submissions = int(sys.argv[sys.argv.index('--submissions') + 1])
+    students = 300
+    if '--students' in sys.argv:
+        students = int(sys.argv[sys.argv.index('--students') + 1])
+
+    rng = random.Random(42)
+    questions = build_questions(rng)
+    batch = [random_answers(questions, rng) for _ in range(submissions)]
+    plan = ScoringPlan(questions)
+    total = len(questions)
+
+    for user_answers in batch:
+        expected = legacy_score(questions, user_answers)
+        actual = plan_score(plan, total, user_answers)
+        assert expected == actual, (user_answers, expected, actual)
+    rows = [[a.get(str(idx), '') for idx in range(total)] for a in batch[:students]]
+    bulk_bits, bulk_correct = plan.score_many(rows)
+    assert list(zip(bulk_bits, bulk_correct)) == [plan.score(row) for row in rows]
+    print(f"{submissions} ta topshiriqda natijalar bir xil")
+
+    compile_cost = min(timeit.repeat(lambda: ScoringPlan(questions), number=200, repeat=5)) / 200
+    legacy = min(timeit.repeat(lambda: [legacy_score(questions, a) for a in batch], number=1, repeat=5))
+    planned = min(timeit.repeat(lambda: [plan_score(plan, total, a) for a in batch], number=1, repeat=5))
+
+    print("Bitta topshiriqni baholash (eng yaxshi natija):")
+    print(f"  {'legacy (tsikl + encode_items)':<32} {legacy / submissions * 1e6:8.1f} us")
+    print(f"  {'plan.score()':<32} {planned / submissions * 1e6:8.1f} us")
+    print(f"  {'rejani tuzish (bir marta)':<32} {compile_cost * 1e6:8.1f} us")
+    print(f"  tezlanish: {legacy / planned:.1f}x")
+
+    bulk = min(timeit.repeat(lambda: plan.score_many(rows), number=1, repeat=5))
+    looped = min(timeit.repeat(lambda: [plan.score(row) for row in rows], number=1, repeat=5))
+    print(f"Qayta baholash ({len(rows)} ta natija):")
+    print(f"  {'score_many()':<32} {bulk * 1e3:8.2f} ms")
+    print(f"  {'score() tsiklda':<32} {looped * 1e3:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
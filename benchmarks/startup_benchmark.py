@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bot ishga tushish vaqti benchmarki (cold start -> birinchi javob)
+
+Har bir o'lchov yangi Python jarayonida bajariladi:
+    1. bot modulini import qilish
+    2. build_application() - handlerlarni ro'yxatdan o'tkazish
+    3. ma'lumotlarni yuklash va birinchi /start update ni qayta ishlash
+
+Telegram API ga so'rov yuborilmaydi - javoblar soxta BaseRequest orqali
+qaytariladi. Vaqtinchalik katalogda alohida config.py va data.json
+yaratiladi, asosiy ma'lumotlarga tegilmaydi.
+
+Foydalanish:
+    python3 benchmarks/startup_benchmark.py [--runs 5] [--eager]
+
+--eager - numpy/scipy/openpyxl ni bot bilan birga darhol yuklash
+(kutubxonalar modul darajasida import qilingandagi holat bilan solishtirish uchun).
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_TEMPLATE = '''BOT_TOKEN = "123456:BENCHMARK"
+BOSS_ID = 1
+DATA_FILE = {data_file!r}
+WARMUP_ON_START = False
+'''
+
+
+def child(eager):
+    """Bitta o'lchov (yangi jarayon ichida)"""
+    started = time.perf_counter()
+
+    import asyncio
+    import bot
+    if eager:
+        from utils import warm_up
+        warm_up()
+    imported = time.perf_counter()
+
+    from telegram import Update
+    from telegram.request import BaseRequest
+
+    first_reply = {}
+
+    class FakeRequest(BaseRequest):
+        """Telegram API o'rniga tayyor javoblar qaytaradi"""
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            endpoint = url.rsplit('/', 1)[-1]
+            if endpoint == 'getMe':
+                result = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+            elif endpoint == 'sendMessage':
+                first_reply.setdefault('at', time.perf_counter())
+                result = {'message_id': 2, 'date': 0, 'chat': {'id': 42, 'type': 'private'}, 'text': 'ok'}
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    async def run():
+        application = bot.build_application(request=FakeRequest())
+        built = time.perf_counter()
+        await application.initialize()
+        bot.load_data()
+        update = Update.de_json({
+            'update_id': 1,
+            'message': {
+                'message_id': 1, 'date': 0, 'text': '/start',
+                'chat': {'id': 42, 'type': 'private'},
+                'from': {'id': 42, 'is_bot': False, 'first_name': 'Talaba'},
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            },
+        }, application.bot)
+        await application.process_update(update)
+        await application.shutdown()
+        return built
+
+    built = asyncio.run(run())
+    print(json.dumps({
+        'import': imported - started,
+        'build': built - imported,
+        'first_reply': first_reply.get('at', float('nan')) - started,
+    }))
+
+
+def main():
+    runs = 5
+    if '--runs' in sys.argv:
+        runs = int(sys.argv[sys.argv.index('--runs') + 1])
+    eager = '--eager' in sys.argv
+
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'config.py'), 'w', encoding='utf-8') as f:
+                f.write(CONFIG_TEMPLATE.format(data_file=os.path.join(tmp_dir, 'data.json')))
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([tmp_dir, REPO_DIR]))
+            args = [sys.executable, os.path.abspath(__file__), '--child'] + (['--eager'] if eager else [])
+            started = time.perf_counter()
+            output = subprocess.run(args, cwd=tmp_dir, env=env, capture_output=True, text=True, check=True)
+            sample = json.loads(output.stdout.strip().splitlines()[-1])
+            sample['process'] = time.perf_counter() - started
+            samples.append(sample)
+
+    print(f"Ishga tushish ({runs} marta, {'eager' if eager else 'lazy'} import), mediana:")
+    for key, title in [('import', "bot import"), ('build', "build_application"),
+                       ('first_reply', "birinchi javobgacha"), ('process', "jarayon (interpretator bilan)")]:
+        values = [s[key] for s in samples]
+        print(f"  {title:<32} {statistics.median(values) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child('--eager' in sys.argv)
+    else:
+        main()
@@ -5,6 +5,7 @@ Telegram Test Bot - Asosiy fayl
 Boss, admin va oddiy foydalanuvchilar uchun test tizimi
 """
 
+import asyncio
 import logging
 from telegram import Update
 from telegram.ext import (
@@ -16,7 +17,12 @@ from telegram.ext import (
     ContextTypes,
 )
 
+import config
 from config import BOT_TOKEN
+from database import load_data, close_storage
+import archive
+import calibration
+import jobs
 from handlers import (
     start,
     admin_panel,
@@ -42,10 +48,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Polling boshlangandan keyin og'ir kutubxonalarni fonda yuklash
+WARMUP_ON_START = getattr(config, 'WARMUP_ON_START', True)
 
-def main():
-    """Botni ishga tushirish"""
-    application = Application.builder().token(BOT_TOKEN).build()
+
+async def warm_up():
+    """numpy/scipy/openpyxl va hisobot jarayonlarini fonda tayyorlab qo'yish"""
+    from utils import warm_up as warm_up_imports
+    try:
+        await asyncio.to_thread(warm_up_imports)
+        await jobs.warm_up(warm_up_imports)
+        logger.info("Hisobot kutubxonalari va jarayonlari tayyor")
+    except Exception as e:
+        logger.error(f"Oldindan yuklash xatosi: {e}")
+
+
+# Natijalangan testlarni davriy arxivlash vazifasi (post_init da boshlanadi)
+_archive_task = None
+
+
+async def post_init(application: Application):
+    """Bot ishga tushgandan keyin (polling oldidan) chaqiriladi"""
+    global _archive_task
+    if WARMUP_ON_START:
+        # Fonda - polling warm-up tugashini kutmaydi
+        application.create_task(warm_up())
+    if archive.ARCHIVE_AFTER_DAYS is not None:
+        # Cheksiz tsikl - application.create_task emas (stop() uni kutib qolardi)
+        _archive_task = asyncio.get_running_loop().create_task(archive.run_periodically())
+
+
+async def post_stop(application: Application):
+    """Bot to'xtaganda fon vazifalarini bekor qilish"""
+    if _archive_task is not None:
+        _archive_task.cancel()
+    calibration.cancel_all()
+
+
+def build_application(request=None):
+    """Application yaratish va barcha handlerlarni ro'yxatdan o'tkazish
+
+    request - ixtiyoriy telegram.request.BaseRequest (masalan, benchmark uchun).
+    """
+    builder = Application.builder().token(BOT_TOKEN).post_init(post_init).post_stop(post_stop)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
     
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -143,6 +191,19 @@ def main():
                 pass  # Agar xabar yuborib bo'lmasa, hech narsa qilmaymiz
     
     application.add_error_handler(error_handler)
+    return application
+
+
+def main():
+    """Botni ishga tushirish"""
+    # Ma'lumotlarni bir marta yuklab olamiz - keyin handlerlar xotiradagi keshdan o'qiydi
+    data = load_data()
+    logger.info(
+        f"Ma'lumotlar yuklandi: {len(data.get('tests', {}))} ta test, "
+        f"{len(data.get('user_results', {}))} ta natija"
+    )
+
+    application = build_application()
     
     # Botni ishga tushirish
     logger.info("Bot ishga tushmoqda...")
@@ -152,6 +213,9 @@ def main():
         logger.info("Bot to'xtatildi.")
     except Exception as e:
         logger.error(f"Bot ishga tushishda xatolik: {e}", exc_info=True)
+    finally:
+        jobs.shutdown()
+        close_storage()
 
 
 if __name__ == '__main__':
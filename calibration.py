@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Savollar qiyinligini kalibrovka qilish va taxminiy (provisional) ball
+
+Testga kamida CALIBRATION_MIN_RESULTS ta natija yig'ilgach, fonda (alohida
+jarayonda, jobs.run_job) Rasch tahlili bajariladi va savollar qiyinligi
+(beta) testning o'zida saqlanadi:
+
+    test['calibration'] = {
+        'n_results': ..., 'calibrated_at': ..., 'n_bits': ...,
+        'ranges': {
+            '1-40':  {'columns': [...], 'beta': [...], 'scores': [...]},
+            '40-43': {'columns': [...], 'steps': [...], 'max_scores': [...], 'scores': [...]},
+        }
+    }
+
+Rasch modelida beta o'zgarmas bo'lsa theta faqat xom ballga bog'liq -
+shuning uchun har bir mumkin bo'lgan xom ball uchun standart ball
+(scores[xom ball]) kalibrovkada bir marta hisoblanadi. Yangi topshiriq
+(finish_test) uchun taxminiy ball ustunlardagi to'g'ri javoblarni sanash va
+jadvaldan olish bilan topiladi - Rasch tahlili qayta bajarilmaydi.
+
+Kalibrovkadan keyin yana CALIBRATION_EVERY ta natija qo'shilsa, kalibrovka
+fonda yangilanadi. Testni natijalashda to'liq Rasch tahlili saqlangan
+qiyinliklardan boshlanadi (warm start).
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+import config
+from database import (
+    load_data, transaction, get_test_result_ids, get_test_results, save_calibration, test_version,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kalibrovka uchun kerakli minimal natijalar soni; None - kalibrovka o'chirilgan
+CALIBRATION_MIN_RESULTS = getattr(config, 'CALIBRATION_MIN_RESULTS', 30)
+# Oxirgi kalibrovkadan keyin shuncha yangi natija qo'shilsa qayta kalibrovka qilinadi
+CALIBRATION_EVERY = getattr(config, 'CALIBRATION_EVERY', 25)
+
+RANGES = ('1-40', '40-43')
+
+# Bajarilayotgan kalibrovkalar: test_id -> asyncio.Task
+_running = {}
+# Bajarilayotgan kalibrovka tugagach qayta kalibrovka qilinadigan testlar
+# (kalibrovka davomida test, masalan javoblar kaliti, o'zgargan)
+_rerun = set()
+
+
+def build_calibration(test_id, data):
+    """Test uchun kalibrovka yozuvini tayyorlash (alohida jarayonda bajariladi)
+
+    Args:
+        data: build_test_snapshot() nusxasi
+
+    Returns:
+        dict yoki None (natijalar yetarli bo'lmasa)
+    """
+    from utils import (
+        get_response_tensor, rasch_columns, rasch_model_analysis, partial_credit_analysis,
+        written_item_scores, estimate_ability, ability_to_standard_score, _calibrated_difficulties,
+    )
+
+    tensor = get_response_tensor(test_id, data)
+    if tensor is None or len(tensor['user_ids']) < 2:
+        return None
+    test = data['tests'][test_id]
+    matrix = tensor['matrix']
+    ranges = {}
+    for question_range in RANGES:
+        columns = rasch_columns(tensor, question_range)
+        if len(columns) == 0:
+            continue
+        init = _calibrated_difficulties(test, question_range, columns)
+        calibrated = {'columns': [int(c) for c in columns]}
+        if question_range == '40-43':
+            # Yozma qism - partial credit model (perform_rasch_analysis dagidek)
+            score_matrix, max_scores, _ = written_item_scores(tensor, columns)
+            fit = partial_credit_analysis(score_matrix, max_scores, steps_init=init)
+            theta, steps = fit['theta'], [float(d) for d in fit['steps']]
+            calibrated['steps'] = [round(d, 6) for d in steps]
+            calibrated['max_scores'] = max_scores
+            # estimate_ability uchun: har bir savolning qadam qiyinliklari
+            offsets = [sum(max_scores[:idx]) for idx in range(len(max_scores))]
+            difficulties = [steps[start:start + m] for start, m in zip(offsets, max_scores)]
+            raw_scores = score_matrix.sum(axis=1).tolist()
+        else:
+            data_matrix = matrix[:, columns]
+            theta, beta = rasch_model_analysis(data_matrix, beta_init=init)
+            difficulties = [float(b) for b in beta]
+            calibrated['beta'] = [round(b, 6) for b in difficulties]
+            raw_scores = data_matrix.sum(axis=1).tolist()
+        # Xom ball bo'yicha theta (markazlashtirishdan oldingi shkalada)
+        by_score = [estimate_ability(score, difficulties) for score in range(len(columns) + 1)]
+        # Tahlil theta ni talabalar bo'yicha markazlaydi - shu siljish
+        shift = sum(by_score[score] - float(t) for score, t in zip(raw_scores, theta)) / len(raw_scores)
+        scores = [float(ability_to_standard_score(t - shift)) for t in by_score]
+        if question_range == '40-43':
+            # Yozma ball 0-75 shkalada (generate_final_results_excel dagidek)
+            scores = [s * 0.75 for s in scores]
+        calibrated['scores'] = [round(s, 4) for s in scores]
+        ranges[question_range] = calibrated
+    return {
+        'n_results': len(tensor['user_ids']),
+        'calibrated_at': datetime.now().isoformat(),
+        'n_bits': int(matrix.shape[1]),
+        'ranges': ranges,
+    }
+
+
+def provisional_scores(test, correct_bits):
+    """Natija uchun taxminiy ball (testning joriy kalibrovkasi bo'yicha)
+
+    Returns:
+        dict yoki None (test kalibrovka qilinmagan yoki tuzilishi o'zgargan):
+        {'test_score', 'written_score', 'final_score', 'calibrated_at'}
+    """
+    calibration = test.get('calibration')
+    if not calibration or len(correct_bits) != calibration.get('n_bits'):
+        return None
+    ranges = calibration['ranges']
+    scores = {}
+    for question_range in RANGES:
+        calibrated = ranges.get(question_range)
+        if calibrated is None:
+            scores[question_range] = 0
+            continue
+        raw_score = sum(1 for col in calibrated['columns'] if correct_bits[col] == '1')
+        scores[question_range] = calibrated['scores'][raw_score]
+    test_score, written_score = scores['1-40'], scores['40-43']
+    return {
+        'test_score': round(test_score, 2),
+        'written_score': round(written_score, 2),
+        # Yakuniy ball - ikkalasining o'rtachasi (yakuniy natijalar Excel dagidek)
+        'final_score': round((test_score + written_score) / 2, 2),
+        'calibrated_at': calibration['calibrated_at'],
+    }
+
+
+def leaderboard(test_id, data=None):
+    """Joriy reyting: testning barcha natijalari taxminiy yakuniy ball bo'yicha
+
+    Natijada saqlangan ball emas, eng oxirgi kalibrovka bo'yicha hisoblanadi -
+    barcha talabalar bir xil shkalada taqqoslanadi.
+
+    Returns:
+        list yoki None (test hali kalibrovka qilinmagan): [(natija, taxminiy ball), ...]
+    """
+    data = data if data is not None else load_data()
+    test = data['tests'][test_id]
+    if not test.get('calibration'):
+        return None
+    rows = []
+    for result in get_test_results(test_id, data):
+        scores = provisional_scores(test, result.get('correct_bits', ''))
+        if scores is not None:
+            rows.append((result, scores))
+    rows.sort(key=lambda row: row[1]['final_score'], reverse=True)
+    return rows
+
+
+def needs_calibration(test, n_results):
+    """Test (qayta) kalibrovka qilinishi kerakmi"""
+    if CALIBRATION_MIN_RESULTS is None or n_results < max(CALIBRATION_MIN_RESULTS, 2):
+        return False
+    calibration = test.get('calibration')
+    if not calibration:
+        return True
+    return n_results - calibration.get('n_results', 0) >= CALIBRATION_EVERY
+
+
+async def calibrate_test(test_id):
+    """Testni alohida jarayonda kalibrovka qilish va natijani saqlash
+
+    Kalibrovka davomida test o'zgargan bo'lsa (test_version), eski nusxa
+    bo'yicha hisoblangan natija saqlanmaydi va test qayta kalibrovka
+    qilish uchun belgilanadi (_rerun).
+    """
+    from jobs import run_job
+    from utils import build_test_snapshot
+
+    data = load_data()
+    version = test_version(test_id, data)
+    snapshot = build_test_snapshot(test_id, data)
+    calibration = await run_job(build_calibration, test_id, snapshot)
+    if calibration is None:
+        return None
+    async with transaction() as data:
+        if test_id not in data.get('tests', {}):
+            # Kalibrovka davomida test o'chirilgan (arxivlangan)
+            return None
+        if test_version(test_id, data) != version:
+            _rerun.add(test_id)
+            return None
+        durable = save_calibration(test_id, calibration)
+    await durable
+    logger.info(f"Test kalibrovka qilindi: {test_id} ({calibration['n_results']} ta natija)")
+    return calibration
+
+
+def schedule_calibration(test_id, force=False):
+    """Kerak bo'lsa testni fonda kalibrovka qilishni boshlash (kutilmaydi)
+
+    force=True - natijalar soni yetarli bo'lsa, oxirgi kalibrovkadan keyin
+    qo'shilgan natijalar sonidan qat'i nazar (masalan, javoblar kaliti
+    tahrirlangandan keyin). Shu test uchun kalibrovka bajarilayotgan bo'lsa,
+    u tugagach yana bir marta kalibrovka qilinadi.
+    """
+    if test_id in _running:
+        if force:
+            _rerun.add(test_id)
+        return
+    data = load_data()
+    test = data.get('tests', {}).get(test_id)
+    if test is None:
+        return
+    n_results = len(get_test_result_ids(test_id, data))
+    if force and test.get('calibration'):
+        test = {k: v for k, v in test.items() if k != 'calibration'}
+    if not needs_calibration(test, n_results):
+        return
+
+    async def run():
+        try:
+            await calibrate_test(test_id)
+        except Exception as e:
+            logger.error(f"Kalibrovka xatosi ({test_id}): {e}")
+        finally:
+            _running.pop(test_id, None)
+        if test_id in _rerun:
+            _rerun.discard(test_id)
+            schedule_calibration(test_id, force=True)
+
+    _running[test_id] = asyncio.get_running_loop().create_task(run())
+
+
+def cancel_all():
+    """Bajarilayotgan kalibrovkalarni to'xtatish (bot to'xtaganda)"""
+    _rerun.clear()
+    for task in list(_running.values()):
+        task.cancel()
+    _running.clear()
@@ -2,33 +2,447 @@
 # -*- coding: utf-8 -*-
 """
 Ma'lumotlar bazasi bilan ishlash
+
+Ma'lumotlar jarayon ichida bitta umumiy obyektda (kesh) saqlanadi:
+ombor (storage) faqat birinchi murojaatda o'qiladi, keyingi load_data()
+chaqiruvlari shu obyektni qaytaradi. Yozish write-through - avval
+xotiradagi obyekt o'zgaradi, keyin ombor yangilanadi.
+
+Ombor config.STORAGE_BACKEND orqali tanlanadi ("json", "journal", "sqlite"
+yoki "sharded").
+Butun obyektni yozadigan save_data() dan tashqari qator darajasidagi
+save_user/save_test/add_result/save_settings funksiyalari bor - SQLite
+backendda ular faqat bitta yozuvni yangilaydi.
+
+JSON fayl atomik yoziladi (vaqtinchalik fayl + fsync + rename). Bir nechta
+await dan iborat o'qish-o'zgartirish-yozish jarayonlari transaction()
+qulfi ichida bajariladi - bir vaqtda ishlayotgan korutinlar bir-birining
+o'zgarishini yo'qotib qo'ymaydi.
+
+user_results uchun xotirada ikkilamchi indekslar yuritiladi (test_id,
+user_id va (user_id, test_id) bo'yicha) - natijalarni qidirish barcha
+natijalarni aylanib chiqmasdan, faqat kerakli yozuvlar soniga mos vaqt oladi.
+Har bir test uchun versiya hisoblagichi ham bor (results_version) - natija
+qo'shilganda yoki test o'zgarganda oshadi, hisobot keshlari shunga tayanadi.
+test_version esa faqat testning o'zi (savollar, javoblar kaliti) o'zgarganda
+oshadi - baholash rejasi keshi (scoring.py) shunga tayanadi.
+
+Qator darajasidagi yozishlar guruhlab saqlanadi (write-behind / group
+commit): o'zgarish darhol xotiraga tushadi, diskka esa WRITE_BEHIND_DELAY
+soniya ichida kelgan boshqa o'zgarishlar bilan birga bitta yozishda
+saqlanadi. Har bir save_* chaqiruvi awaitable qaytaradi - uni await qilgan
+korutin o'z o'zgarishi diskka tushguncha kutadi.
 """
 
-import json
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
+
+import config
 from config import DATA_FILE
+from storage import (
+    JsonStorage, JournalStorage, SqliteStorage, ShardedStorage,
+    migrate_json_to_sqlite, migrate_json_to_shards,
+)
+from result_codec import compact_all_results
+
+logger = logging.getLogger(__name__)
+
+# Ixtiyoriy sozlamalar (eski config.py fayllarida bo'lmasligi mumkin)
+STORAGE_BACKEND = getattr(config, 'STORAGE_BACKEND', 'json')
+SQLITE_FILE = getattr(config, 'SQLITE_FILE', 'data.db')
+# "journal" backendda shuncha yozuvdan keyin jurnal snapshotga siqiladi
+JOURNAL_SNAPSHOT_EVERY = getattr(config, 'JOURNAL_SNAPSHOT_EVERY', 1000)
+# "sharded" backend: shardlar katalogi va xotirada saqlanadigan test shardlari soni
+SHARDS_DIR = getattr(config, 'SHARDS_DIR', 'shards')
+SHARD_CACHE_SIZE = getattr(config, 'SHARD_CACHE_SIZE', 16)
+# Guruhlab saqlashda maksimal kechikish (soniya); 0 - har bir o'zgarish darhol yoziladi
+WRITE_BEHIND_DELAY = getattr(config, 'WRITE_BEHIND_DELAY', 0.2)
+
+# Jarayon ichidagi ma'lumotlar keshi (load_data() birinchi marta chaqirilganda to'ldiriladi)
+_data_cache = None
+_storage = None
+# O'qish-o'zgartirish-yozish uchun qulf (event loop ichida yaratiladi)
+_data_lock = None
+
+# user_results indekslari (keshdagi obyekt uchun)
+_results_by_test = {}       # test_id -> [result_id, ...]
+_results_by_user = {}       # user_id -> [result_id, ...]
+_result_by_user_test = {}   # (user_id, test_id) -> result_id
+# Keshlar uchun versiyalar: kesh almashganda _generation, test/natija o'zgarganda test versiyasi oshadi
+_generation = 0
+_test_versions = {}         # test_id -> int
+_definition_versions = {}   # test_id -> int (faqat save_test/delete_test da oshadi)
+
+
+def get_storage():
+    """Sozlamaga mos ombor obyektini qaytarish (bir marta yaratiladi)"""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == 'sqlite':
+            is_new = not os.path.exists(SQLITE_FILE)
+            if is_new and os.path.exists(DATA_FILE):
+                # Birinchi ishga tushirishda data.json dan avtomatik ko'chirish
+                migrate_json_to_sqlite(DATA_FILE, SQLITE_FILE)
+            _storage = SqliteStorage(SQLITE_FILE)
+        elif STORAGE_BACKEND == 'sharded':
+            if not os.path.exists(SHARDS_DIR) and os.path.exists(DATA_FILE):
+                # Birinchi ishga tushirishda data.json dan avtomatik ko'chirish
+                migrate_json_to_shards(DATA_FILE, SHARDS_DIR)
+            _storage = ShardedStorage(SHARDS_DIR, SHARD_CACHE_SIZE)
+        elif STORAGE_BACKEND == 'journal':
+            # data.json snapshot sifatida ishlatiladi - json backenddan o'tish shart emas
+            _storage = JournalStorage(DATA_FILE, JOURNAL_SNAPSHOT_EVERY)
+        else:
+            _storage = JsonStorage(DATA_FILE)
+        logger.info(f"Ma'lumotlar ombori: {_storage.name}")
+    return _storage
+
+
+def close_storage():
+    """Omborni yopish (bot to'xtaganda) - kutilayotgan o'zgarishlar ham yoziladi"""
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+
+
+class _Committed:
+    """Allaqachon diskka yozilgan o'zgarish uchun awaitable (darhol tugaydi)"""
+
+    def __await__(self):
+        return iter(())
+
+
+class _GroupCommitter:
+    """O'zgarishlarni guruhlab diskka yozish (write-behind)
+
+    Birinchi o'zgarish kelganda taymer boshlanadi; max_latency soniya
+    ichida kelgan barcha o'zgarishlar bitta commit bilan yoziladi va
+    ularning hammasi uchun qaytarilgan Future lar shundan keyin tugaydi.
+    """
+
+    def __init__(self, max_latency):
+        self.max_latency = max_latency
+        self._waiters = []
+        self._task = None
+
+    def schedule(self):
+        """Navbatdagi commit ga yozilish va uni kutish uchun Future olish"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(future)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while self._waiters:
+            await asyncio.sleep(self.max_latency)
+            waiters, self._waiters = self._waiters, []
+            try:
+                job = get_storage().prepare_commit()
+                if job:
+                    # Diskka yozish va fsync event loop ni to'xtatmasligi uchun
+                    await asyncio.to_thread(job)
+            except Exception as e:
+                logger.error(f"Ma'lumotlarni saqlash xatosi: {e}")
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(None)
+            if len(waiters) > 1:
+                logger.debug(f"{len(waiters)} ta o'zgarish bitta yozishda saqlandi")
+
+
+_committer = None
+
+
+def _commit():
+    """Tayyorlangan o'zgarishni saqlash - guruhlab yoki darhol
+
+    Returns:
+        awaitable: o'zgarish diskka tushganda tugaydi
+    """
+    global _committer
+    if WRITE_BEHIND_DELAY > 0:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # Event loop yo'q (masalan, skript) - darhol yozamiz
+        else:
+            if _committer is None:
+                _committer = _GroupCommitter(WRITE_BEHIND_DELAY)
+            return _committer.schedule()
+    flush()
+    return _Committed()
+
+
+def flush():
+    """Kutilayotgan barcha o'zgarishlarni darhol diskka yozish"""
+    job = get_storage().prepare_commit()
+    if job:
+        job()
+
+
+def _index_result(result_id, result):
+    """Bitta natijani indekslarga qo'shish"""
+    user_id = result.get('user_id')
+    test_id = result.get('test_id')
+    _results_by_test.setdefault(test_id, []).append(result_id)
+    _results_by_user.setdefault(user_id, []).append(result_id)
+    _result_by_user_test.setdefault((user_id, test_id), result_id)
+
+
+def _result_items(data):
+    """(result_id, natija) juftliklari - shard omborida faqat qisqacha ma'lumot
+
+    Indekslar va statistika uchun javoblar kerak emas, shuning uchun shard
+    omborida test shardlari yuklanmaydi.
+    """
+    results = data.get('user_results', {})
+    if isinstance(results, dict):
+        return results.items()
+    return results.summaries()
+
+
+def result_summaries(data=None):
+    """Barcha natijalar (javoblarsiz bo'lishi mumkin) - statistika uchun"""
+    return [result for _, result in _result_items(data if data is not None else load_data())]
+
+
+def _rebuild_indexes():
+    """Indekslarni keshdagi ma'lumotlardan qaytadan qurish"""
+    _results_by_test.clear()
+    _results_by_user.clear()
+    _result_by_user_test.clear()
+    for result_id, result in _result_items(_data_cache):
+        _index_result(result_id, result)
+
+
+def _set_cache(data):
+    """Keshni almashtirish va indekslarni qayta qurish"""
+    global _data_cache, _generation
+    _data_cache = data
+    _generation += 1
+    _rebuild_indexes()
+
+
+def _load_from_storage():
+    """Omborni o'qish; eski formatdagi natijalar bir marta ixcham formatga o'tkaziladi"""
+    data = get_storage().load()
+    # Shard omboriga natijalar ko'chirishda ixcham formatga o'tkaziladi
+    converted = compact_all_results(data) if isinstance(data.get('user_results'), dict) else 0
+    if converted:
+        get_storage().save(data)
+        logger.info(f"{converted} ta natija ixcham formatga o'tkazildi")
+    return data
 
 
 def load_data():
-    """Ma'lumotlarni yuklash"""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Eski ma'lumotlar bazasida 'users' bo'lmasligi mumkin
-            if 'users' not in data:
-                data['users'] = {}
-            return data
-    return {
-        "admins": [],
-        "mandatory_channels": [],
-        "tests": {},
-        "user_results": {},
-        "users": {}
-    }
+    """Ma'lumotlarni yuklash (xotiradagi keshdan)
+
+    Qaytarilgan obyekt barcha handlerlar uchun umumiy. Uni o'zgartirgandan
+    keyin save_data() yoki qator darajasidagi save_* funksiyalardan biri
+    chaqirilishi kerak - aks holda o'zgarish faqat xotirada qoladi.
+    """
+    if _data_cache is None:
+        _set_cache(_load_from_storage())
+    return _data_cache
+
+
+def reload_data():
+    """Keshni tashlab, ma'lumotlarni ombordan qayta o'qish"""
+    _set_cache(_load_from_storage())
+    return _data_cache
+
+
+@asynccontextmanager
+async def transaction():
+    """O'qish-o'zgartirish-yozish jarayoni uchun qulf
+
+    Foydalanish:
+        async with transaction() as data:
+            ... data ni o'zgartirish va save_* chaqirish ...
+
+    Qulf faqat ma'lumot bilan ishlash qismini o'rab oladi - Telegram ga
+    javob yuborish kabi tarmoq amallarini qulfdan tashqarida bajaring.
+    """
+    global _data_lock
+    if _data_lock is None:
+        _data_lock = asyncio.Lock()
+    async with _data_lock:
+        yield load_data()
 
 
 def save_data(data):
-    """Ma'lumotlarni saqlash"""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Ma'lumotlarni to'liq saqlash (write-through: ombor va kesh birga yangilanadi)"""
+    get_storage().save(data)
+    # To'liq saqlashda natijalar to'g'ridan-to'g'ri o'zgargan bo'lishi mumkin
+    _set_cache(data)
+
+
+def save_user(user_id, user_info):
+    """Bitta foydalanuvchini saqlash"""
+    data = load_data()
+    user_key = str(user_id)
+    data.setdefault('users', {})[user_key] = user_info
+    get_storage().save_user(data, user_key)
+    return _commit()
+
+
+def save_test(test_id, test):
+    """Bitta testni saqlash (yangi yoki o'zgartirilgan)"""
+    data = load_data()
+    data.setdefault('tests', {})[test_id] = test
+    _bump_version(test_id, definition=True)
+    get_storage().save_test(data, test_id)
+    return _commit()
+
+
+def save_calibration(test_id, calibration):
+    """Test kalibrovkasini (calibration.py) saqlash
+
+    Savollar, javoblar kaliti va natijalar o'zgarmaydi - shuning uchun
+    versiyalar oshirilmaydi (hisobot va baholash rejasi keshlari saqlanadi).
+    """
+    data = load_data()
+    data['tests'][test_id]['calibration'] = calibration
+    get_storage().save_test(data, test_id)
+    return _commit()
+
+
+def add_result(result_id, result):
+    """Yangi test natijasini qo'shish"""
+    data = load_data()
+    data.setdefault('user_results', {})[result_id] = result
+    _index_result(result_id, result)
+    _bump_version(result.get('test_id'))
+    get_storage().save_result(data, result_id)
+    return _commit()
+
+
+def save_settings():
+    """Adminlar va majburiy kanallar ro'yxatini saqlash"""
+    get_storage().save_settings(load_data())
+    return _commit()
+
+
+def update_results(results):
+    """Mavjud natijalarni yangilash (masalan, qayta baholashdan keyin)
+
+    Barcha o'zgarishlar bitta guruhda (bitta yozishda) saqlanadi.
+
+    Args:
+        results: {result_id: yangi natija} - natijalar test va foydalanuvchisi o'zgarmaydi
+    """
+    data = load_data()
+    user_results = data.setdefault('user_results', {})
+    storage = get_storage()
+    for result_id, result in results.items():
+        user_results[result_id] = result
+        _bump_version(result.get('test_id'))
+        storage.save_result(data, result_id)
+    return _commit()
+
+
+def delete_test(test_id):
+    """Testni va uning barcha natijalarini o'chirish (masalan, arxivlangandan keyin)"""
+    data = load_data()
+    user_results = data.get('user_results', {})
+    result_ids = _results_by_test.pop(test_id, [])
+    for result_id in result_ids:
+        user_id = user_results[result_id].get('user_id')
+        del user_results[result_id]
+        user_ids = _results_by_user.get(user_id, [])
+        if result_id in user_ids:
+            user_ids.remove(result_id)
+        if not user_ids:
+            _results_by_user.pop(user_id, None)
+        if _result_by_user_test.get((user_id, test_id)) == result_id:
+            del _result_by_user_test[(user_id, test_id)]
+    data.get('tests', {}).pop(test_id, None)
+    _bump_version(test_id, definition=True)
+    get_storage().delete_test(data, test_id, result_ids)
+    return _commit()
+
+
+def _bump_version(test_id, definition=False):
+    """Test yoki uning natijalari o'zgarganini belgilash"""
+    _test_versions[test_id] = _test_versions.get(test_id, 0) + 1
+    if definition:
+        _definition_versions[test_id] = _definition_versions.get(test_id, 0) + 1
+
+
+def results_version(test_id, data=None):
+    """Test va uning natijalari versiyasi (hisobot keshlari uchun kalit)
+
+    data keshdagi obyekt bo'lmasa None qaytariladi - bunday ma'lumot
+    uchun hisoblangan natijani keshlash mumkin emas.
+    """
+    if not _uses_cache(data):
+        return None
+    return (_generation, _test_versions.get(test_id, 0))
+
+
+def test_version(test_id, data=None):
+    """Testning o'zi (savollar va javoblar kaliti) versiyasi - natijalar qo'shilganda oshmaydi
+
+    data keshdagi obyekt bo'lmasa None qaytariladi (results_version ga qarang).
+    """
+    if not _uses_cache(data):
+        return None
+    return (_generation, _definition_versions.get(test_id, 0))
+
+
+def _uses_cache(data):
+    """data keshdagi obyekt (va demak indekslar unga mos) ekanligini tekshirish
+
+    Boshqa dict berilganda (masalan, alohida jarayondagi nusxa) ombor
+    o'qilmaydi - chaqiruvchi oddiy qidiruvga o'tadi.
+    """
+    if data is None:
+        load_data()
+        return True
+    return data is _data_cache
+
+
+def get_test_results(test_id, data=None):
+    """Test bo'yicha barcha natijalar (qo'shilish tartibida)
+
+    data berilmasa yoki keshdagi obyekt bo'lsa indeksdan foydalaniladi,
+    aks holda (masalan, nusxa yoki sintetik ma'lumot) oddiy qidiruv qilinadi.
+    """
+    if _uses_cache(data):
+        user_results = _data_cache.get('user_results', {})
+        return [user_results[r_id] for r_id in _results_by_test.get(test_id, [])]
+    return [r for r in data.get('user_results', {}).values() if r.get('test_id') == test_id]
+
+
+def get_test_result_ids(test_id, data=None):
+    """Test natijalari ID lari (qo'shilish tartibida)"""
+    if _uses_cache(data):
+        return list(_results_by_test.get(test_id, []))
+    return [r_id for r_id, r in data.get('user_results', {}).items() if r.get('test_id') == test_id]
+
+
+def get_user_results(user_id, data=None):
+    """Foydalanuvchining barcha natijalari (qo'shilish tartibida)"""
+    if _uses_cache(data):
+        user_results = _data_cache.get('user_results', {})
+        return [user_results[r_id] for r_id in _results_by_user.get(user_id, [])]
+    return [r for r in data.get('user_results', {}).values() if r.get('user_id') == user_id]
+
 
+def find_user_result(user_id, test_id, data=None):
+    """Foydalanuvchining shu testdagi natijasi ID si (yo'q bo'lsa None)"""
+    if _uses_cache(data):
+        return _result_by_user_test.get((user_id, test_id))
+    for r_id, r in data.get('user_results', {}).items():
+        if r.get('user_id') == user_id and r.get('test_id') == test_id:
+            return r_id
+    return None
@@ -4,19 +4,34 @@
 Bot handler funksiyalari
 """
 
+import asyncio
 import logging
-import re
 import os
 from datetime import datetime, timedelta
 import pytz
 from io import BytesIO
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-import pdfkit
 
 from config import BOSS_ID
-from database import load_data, save_data
-from utils import check_subscription, generate_pdf
+from database import (
+    load_data, save_user, save_test, add_result, save_settings, transaction,
+    get_test_results, get_user_results, find_user_result, result_summaries,
+)
+from answer_parser import (
+    STANDARD_CHOICE_LETTERS, parse_choice_answers, choice_questions, choice_letters,
+    format_errors, answer_lines,
+)
+from archive import archived_results
+from calibration import provisional_scores, schedule_calibration, leaderboard, CALIBRATION_MIN_RESULTS
+from jobs import run_job
+from scoring import get_scoring_plan, rescore_test
+from utils import (
+    check_subscription, invalidate_subscription_cache, generate_pdf, build_test_snapshot,
+    generate_test_results_excel, generate_final_results_excel, generate_response_matrix,
+    cached_report, store_report, report_version,
+)
 
 # O'zbekiston vaqti (UTC+5)
 UZBEKISTAN_TZ = pytz.timezone('Asia/Tashkent')
@@ -149,17 +164,12 @@ async def process_user_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         first_name = context.user_data.get('first_name', '').strip()
         last_name = text.strip()
 
-        # Ma'lumotlar bazasiga saqlash
-        data = load_data()
-        if 'users' not in data:
-            data['users'] = {}
-
-        data['users'][str(user_id)] = {
+        # Ma'lumotlar bazasiga saqlash (faqat shu foydalanuvchi yoziladi)
+        await save_user(user_id, {
             'first_name': first_name,
             'last_name': last_name,
             'registered_at': datetime.now().isoformat()
-        }
-        save_data(data)
+        })
 
         # User data ni tozalash
         context.user_data.pop('waiting_for_name', None)
@@ -363,7 +373,7 @@ async def process_test_editing(update: Update, context: ContextTypes.DEFAULT_TYP
             return
 
         test['name'] = new_name
-        save_data(data)
+        await save_test(test_id, test)
         context.user_data.pop('editing_test', None)
         context.user_data.pop('editing_test_id', None)
         context.user_data.pop('test_editing_step', None)
@@ -382,32 +392,45 @@ async def process_test_editing(update: Update, context: ContextTypes.DEFAULT_TYP
 
         try:
             questions = test['questions']
-            answers = []
-
-            for char in answers_text:
-                if char.lower() in 'abcd':
-                    answers.append(char.lower())
+            # Faqat ko'p tanlovli savollar (1-35) kaliti tahrirlanadi - yozma va
+            # masalaviy savollar javoblari o'zgarishsiz qoladi
+            mc_questions = [questions[idx] for idx in choice_questions(questions)]
+            answers, errors = parse_choice_answers(answers_text, choice_letters(questions))
 
-            if len(answers) != len(questions):
+            if errors:
                 await update.message.reply_text(
-                    f"❌ Javoblar soni noto'g'ri!\n"
-                    f"Savollar soni: {len(questions)}\n"
-                    f"Javoblar soni: {len(answers)}\n\n"
+                    f"❌ Javoblarda xatolik:\n{format_errors(errors)}\n\n"
+                    f"Ko'p tanlovli savollar soni: {len(mc_questions)}\n"
                     f"Qayta kiriting: 1a2b3c4d... formatida"
                 )
                 return
 
-            # Javoblarni yangilash
-            for idx, answer in enumerate(answers):
-                if idx < len(questions):
+            # Javoblarni yangilash - qulf ichida: shu vaqtda tugatilgan topshiriq
+            # (finish_test) yo eski kalit bo'yicha baholanib qayta baholashga
+            # tushadi, yo to'liq yangi kalit bo'yicha baholanadi
+            async with transaction() as data:
+                test = data['tests'][test_id]
+                questions = test['questions']
+                for idx, answer in zip(choice_questions(questions), answers):
                     questions[idx]['correct'] = answer
-
-            test['questions'] = questions
-            save_data(data)
+                # Kalibrovka eski kalit bo'yicha - qayta kalibrovkagacha taxminiy
+                # ball va joriy reyting berilmaydi
+                test.pop('calibration', None)
+                durable = save_test(test_id, test)
+            await durable
             context.user_data.pop('editing_test', None)
             context.user_data.pop('editing_test_id', None)
             context.user_data.pop('test_editing_step', None)
-            await update.message.reply_text(f"✅ Javoblar yangilandi!")
+
+            # Saqlangan natijalarni yangi kalit bo'yicha qayta baholash
+            # (baholash rejasi ham shu yerda yangi kalit bo'yicha tuziladi)
+            rescored, changed = await rescore_test(test_id)
+            # Savollar qiyinligi yangi kalit bo'yicha qayta kalibrovka qilinadi (fonda)
+            schedule_calibration(test_id, force=True)
+            text = "✅ Javoblar yangilandi!"
+            if rescored:
+                text += f"\n\n🔄 {rescored} ta natija qayta baholandi, {changed} tasining bali o'zgardi."
+            await update.message.reply_text(text)
 
         except Exception as e:
             logger.error(f"Javoblar yangilash xatosi: {e}")
@@ -420,33 +443,36 @@ async def save_test_immediately(update: Update, context: ContextTypes.DEFAULT_TY
     """Testni darhol saqlash (vaqt belgilamasdan)"""
     user_id = update.effective_user.id
 
-    # Testni saqlash
-    data = load_data()
-    test_id = f"test_{len(data['tests']) + 1}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    test_data = {
-        'name': context.user_data['test_name'],
-        'questions': context.user_data['test_questions'],
-        'created_by': user_id,
-        'created_at': datetime.now(UZBEKISTAN_TZ).isoformat()
-    }
-    # Agar fayl yuklangan bo'lsa, faylni test ID bilan qayta nomlash
-    if 'test_file_path' in context.user_data:
-        old_file_path = context.user_data['test_file_path']
-        test_files_dir = "test_files"
-        file_name = context.user_data.get('test_file_name', 'test.txt')
-        # Fayl kengaytmasini saqlash
-        file_ext = os.path.splitext(file_name)[1] or '.txt'
-        new_file_path = os.path.join(test_files_dir, f"{test_id}{file_ext}")
-
-        # Faylni qayta nomlash
-        if os.path.exists(old_file_path):
-            os.rename(old_file_path, new_file_path)
-            test_data['file_path'] = new_file_path
-        else:
-            test_data['file_path'] = old_file_path
-        test_data['file_name'] = file_name
-    data['tests'][test_id] = test_data
-    save_data(data)
+    # Testni saqlash (test ID ni ajratish va saqlash qulf ichida)
+    async with transaction() as data:
+        test_id = f"test_{len(data['tests']) + 1}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        test_data = {
+            'name': context.user_data['test_name'],
+            'questions': context.user_data['test_questions'],
+            'created_by': user_id,
+            'created_at': datetime.now(UZBEKISTAN_TZ).isoformat()
+        }
+        # Agar fayl yuklangan bo'lsa, faylni test ID bilan qayta nomlash
+        if 'test_file_path' in context.user_data:
+            old_file_path = context.user_data['test_file_path']
+            test_files_dir = "test_files"
+            file_name = context.user_data.get('test_file_name', 'test.txt')
+            # Fayl kengaytmasini saqlash
+            file_ext = os.path.splitext(file_name)[1] or '.txt'
+            new_file_path = os.path.join(test_files_dir, f"{test_id}{file_ext}")
+
+            # Faylni qayta nomlash
+            if os.path.exists(old_file_path):
+                os.rename(old_file_path, new_file_path)
+                test_data['file_path'] = new_file_path
+            else:
+                test_data['file_path'] = old_file_path
+            test_data['file_name'] = file_name
+        durable = save_test(test_id, test_data)
+    # Test diskka yozilgunicha kutamiz (qulfdan tashqarida)
+    await durable
+    # Baholash rejasini oldindan tuzib qo'yish - birinchi topshiriq kutmasin
+    get_scoring_plan(test_id)
 
     test_name = context.user_data.get('test_name', 'Noma\'lum')
     test_questions = context.user_data.get('test_questions', [])
@@ -520,13 +546,8 @@ async def process_test_creation(update: Update, context: ContextTypes.DEFAULT_TY
         try:
             # Yozma javoblarni qatorlarga ajratish
             # Bo'sh qatorlar ham qabul qilinadi (5 ta qator bo'lishi kerak)
-            lines = text_answers_input.split('\n')
-
             # Faqat birinchi 5 ta qatorni olish
-            text_answers = []
-            for i in range(min(5, len(lines))):
-                line = lines[i].strip()
-                text_answers.append(line)
+            text_answers = answer_lines(text_answers_input, keep_empty=True)[:5]
 
             # Agar 5 ta qatordan kam bo'lsa, xatolik berish
             if len(text_answers) < 5:
@@ -592,14 +613,8 @@ async def process_test_creation(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         try:
-            # Javoblarni qatorlarga ajratish
-            lines = problem_41_input.split('\n')
-            problem_41_answers = []
-
-            for line in lines:
-                line = line.strip()
-                if line:  # Faqat bo'sh bo'lmagan qatorlarni olish
-                    problem_41_answers.append(line)
+            # Javoblarni qatorlarga ajratish (faqat bo'sh bo'lmagan qatorlar)
+            problem_41_answers = answer_lines(problem_41_input)
 
             # Hech bo'lmaganda 1 ta javob bo'lishi kerak
             if len(problem_41_answers) == 0:
@@ -639,14 +654,8 @@ async def process_test_creation(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         try:
-            # Javoblarni qatorlarga ajratish
-            lines = problem_42_input.split('\n')
-            problem_42_answers = []
-
-            for line in lines:
-                line = line.strip()
-                if line:  # Faqat bo'sh bo'lmagan qatorlarni olish
-                    problem_42_answers.append(line)
+            # Javoblarni qatorlarga ajratish (faqat bo'sh bo'lmagan qatorlar)
+            problem_42_answers = answer_lines(problem_42_input)
 
             # Hech bo'lmaganda 1 ta javob bo'lishi kerak
             if len(problem_42_answers) == 0:
@@ -686,14 +695,8 @@ async def process_test_creation(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         try:
-            # Javoblarni qatorlarga ajratish
-            lines = problem_43_input.split('\n')
-            problem_43_answers = []
-
-            for line in lines:
-                line = line.strip()
-                if line:  # Faqat bo'sh bo'lmagan qatorlarni olish
-                    problem_43_answers.append(line)
+            # Javoblarni qatorlarga ajratish (faqat bo'sh bo'lmagan qatorlar)
+            problem_43_answers = answer_lines(problem_43_input)
 
             # Hech bo'lmaganda 1 ta javob bo'lishi kerak
             if len(problem_43_answers) == 0:
@@ -789,57 +792,16 @@ async def process_test_creation(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         try:
-            # Javoblarni qayta ishlash
-            mc_answers = {}  # {question_num: answer}
-
-            # Raqam + harf kombinatsiyalarini topish (1a, 2b, 10c, ...)
-            pattern = r'(\d+)([a-fA-F])'
-            matches = re.findall(pattern, answers_text)
-            for num_str, letter in matches:
-                q_num = int(num_str)
-                if q_num <= 35:
-                    mc_answers[q_num] = letter.lower()
-
-            # Agar raqam+harf formatida yetarli javob bo'lmasa, eski formatni sinab ko'rish
-            if len(mc_answers) < 35:
-                # Eski format: faqat harflar (abc...)
-                answers = []
-                for char in answers_text.lower():
-                    question_idx = len(answers)
-                    if question_idx >= 35:
-                        break
-                    if question_idx in [32, 33, 34]:  # 33, 34, 35-savollar
-                        if char in 'abcdef':
-                            answers.append(char)
-                    else:
-                        if char in 'abcd':
-                            answers.append(char)
-
-                if len(answers) == 35:
-                    # Eski format ishladi
-                    mc_answers = {i+1: answers[i] for i in range(len(answers))}
-                else:
-                    await update.message.reply_text(
-                        f"❌ Javoblar soni noto'g'ri!\n\n"
-                        f"⚠️ 1-35 savollar uchun 35 ta javob kerak.\n"
-                        f"🔢 Hozirgi son: {len(answers)} ta\n\n"
-                        f"Format: 1a2b3c4d... yoki abc... (35 ta javob)\n"
-                        f"⚠️ 33, 34, 35-savollar uchun e va f javoblar ham mumkin!"
-                    )
-                    return
-
-            # 1-35 savollar uchun javoblarni listga o'tkazish
-            mc_answers_list = []
-            for q_num in range(1, 36):
-                if q_num in mc_answers:
-                    mc_answers_list.append(mc_answers[q_num])
-                else:
-                    await update.message.reply_text(
-                        f"❌ {q_num}-savol uchun javob topilmadi!\n\n"
-                        f"Barcha 1-35 savollar uchun javoblar kerak.\n"
-                        f"Format: 1a2b3c4d... yoki abc... (35 ta javob)"
-                    )
-                    return
+            # Javoblarni ajratish va tekshirish (1a2b3c... yoki abc...)
+            mc_answers_list, errors = parse_choice_answers(answers_text, STANDARD_CHOICE_LETTERS)
+            if errors:
+                await update.message.reply_text(
+                    f"❌ Javoblarda xatolik:\n{format_errors(errors)}\n\n"
+                    f"⚠️ 1-35 savollar uchun 35 ta javob kerak.\n"
+                    f"Format: 1a2b3c4d... yoki abc... (35 ta javob)\n"
+                    f"⚠️ 33, 34, 35-savollar uchun e va f javoblar ham mumkin!"
+                )
+                return
 
             # Javoblarni saqlash va 36-40 savollar uchun javoblarni so'rash
             context.user_data['mc_answers'] = mc_answers_list
@@ -941,7 +903,7 @@ async def process_test_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Testni yangilash (savollarni o'zgartirmaslik, faqat faylni yangilash)
                 data['tests'][test_id]['file_path'] = new_file_path
                 data['tests'][test_id]['file_name'] = file_name
-                save_data(data)
+                await save_test(test_id, data['tests'][test_id])
 
                 context.user_data.pop('editing_test', None)
                 context.user_data.pop('editing_test_id', None)
@@ -1060,6 +1022,7 @@ async def edit_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test_id:
         [InlineKeyboardButton("✅ Javoblarni o'zgartirish", callback_data=f"edit_answers_{test_id}")],
         [InlineKeyboardButton("📊 Testni natijalash", callback_data=f"finalize_test_{test_id}")],
         [InlineKeyboardButton("📋 0-1 Matrix yuklab olish", callback_data=f"download_matrix_{test_id}")],
+        [InlineKeyboardButton("🏆 Joriy reyting", callback_data=f"leaderboard_{test_id}")],
         [InlineKeyboardButton("❌ Bekor qilish", callback_data="cancel_edit")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -1099,17 +1062,15 @@ async def start_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test_id
             await update.message.reply_text(error_text)
         return
 
-    # Foydalanuvchi bu testni allaqachon ishlaganligini tekshirish
-    user_results = data.get('user_results', {})
-    for r_id, result in user_results.items():
-        if result.get('user_id') == user_id and result.get('test_id') == test_id:
-            # Foydalanuvchi bu testni allaqachon ishlagan
-            error_text = "❌ Siz bu testni allaqachon ishlagansiz!\n\nHar bir testni faqat bir marta ishlash mumkin."
-            if update.callback_query:
-                await update.callback_query.answer(error_text, show_alert=True)
-            else:
-                await update.message.reply_text(error_text)
-            return
+    # Foydalanuvchi bu testni allaqachon ishlaganligini tekshirish (indeks orqali)
+    if find_user_result(user_id, test_id) is not None:
+        # Foydalanuvchi bu testni allaqachon ishlagan
+        error_text = "❌ Siz bu testni allaqachon ishlagansiz!\n\nHar bir testni faqat bir marta ishlash mumkin."
+        if update.callback_query:
+            await update.callback_query.answer(error_text, show_alert=True)
+        else:
+            await update.message.reply_text(error_text)
+        return
 
     # Testni boshlash
     context.user_data[f'test_{test_id}'] = {
@@ -1249,13 +1210,7 @@ async def process_test_answers(update: Update, context: ContextTypes.DEFAULT_TYP
     
     if waiting_problem_answers:
         # Masalaviy javoblar kiritilmoqda (41-43 savollar)
-        lines = text.split('\n')
-        problem_answers = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                problem_answers.append(line)
+        problem_answers = answer_lines(text)
         
         # 41-43 savollar uchun kerakli javoblar sonini tekshirish
         problem_questions = [q for q in test['questions'] if q.get('type') == 'problem']
@@ -1295,16 +1250,8 @@ async def process_test_answers(update: Update, context: ContextTypes.DEFAULT_TYP
     if waiting_text_answers:
         # Yozma javoblar kiritilmoqda (36-40 savollar)
         # Javoblarni qatorlarga ajratish (har bir qator bitta savol uchun)
-        # Qavs ichidagi matn alohida javob deb hisoblanmaydi
-        lines = text.split('\n')
-        text_answers = []
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            # Qavs ichidagi matn javobning bir qismi bo'lib qoladi, alohida javob emas
-            text_answers.append(line)
+        # Qavs ichidagi matn javobning bir qismi bo'lib qoladi, alohida javob emas
+        text_answers = answer_lines(text)
 
         # 36-40 savollar uchun 5 ta javob kerak
         text_question_indices = [35, 36, 37, 38, 39]  # 0-based index
@@ -1366,49 +1313,27 @@ async def process_test_answers(update: Update, context: ContextTypes.DEFAULT_TYP
 
     else:
         # Ko'p tanlov javoblari kiritilmoqda (1-35 savollar)
-        text_lower = text.lower()
-
         # 36-40 savollar mavjudligini tekshirish
         has_text_questions = any(
             q.get('type') == 'text_answer'
             for q in test['questions']
         )
 
-        # Javoblarni ajratish (1a2b3c4d... yoki abc...)
-        # Faqat 1-35 savollar uchun (0-based: 0-34)
-        answers = []
-        for char in text_lower:
-            char_lower = char.lower()
-            # Hozirgi savol indexini aniqlash (mavjud javoblar soni)
-            question_idx = len(answers)
-
-            # Faqat 1-35 savollar uchun javob qabul qilamiz (0-based: 0-34)
-            if question_idx >= 35:
-                break
-
-            # 33, 34, 35-savollar (idx 32, 33, 34) uchun e va f ham qabul qilamiz
-            if question_idx in [32, 33, 34]:  # 33, 34, 35-savollar
-                if char_lower in 'abcdef':
-                    answers.append(char_lower)
-            else:
-                # Boshqa savollar uchun faqat a-d qabul qilamiz
-                if char_lower in 'abcd':
-                    answers.append(char_lower)
-
-        # 1-35 savollar uchun 35 ta javob kerak
-        required_mc_answers = 35
-        if len(answers) != required_mc_answers:
+        # Javoblarni ajratish va tekshirish (1a2b3c4d... yoki abc...)
+        # Har bir savol uchun mumkin bo'lgan harflar uning variantlaridan olinadi
+        # (33, 34, 35-savollar uchun a-f, qolganlari uchun a-d)
+        answers, errors = parse_choice_answers(text, choice_letters(test['questions']))
+        if errors:
             await update.message.reply_text(
-                f"❌ Javoblar soni noto'g'ri!\n"
-                f"1-35 savollar uchun {required_mc_answers} ta javob kerak.\n"
-                f"Hozirgi son: {len(answers)} ta\n\n"
+                f"❌ Javoblarda xatolik:\n{format_errors(errors)}\n\n"
+                f"1-{len(answers)} savollar uchun {len(answers)} ta javob kerak.\n"
                 f"Qayta kiriting: 1a2b3c4d... formatida\n"
                 f"⚠️ 33, 34, 35-savollar uchun e va f javoblar ham mumkin!"
             )
             return True
 
         # Ko'p tanlov javoblarini saqlash
-        for idx, answer in enumerate(answers):
+        for idx, answer in zip(choice_questions(test['questions']), answers):
             context.user_data[test_data_key]['answers'][str(idx)] = answer
 
         # Agar 36-40 savollar mavjud bo'lsa, yozma javoblarni so'rash
@@ -1439,106 +1364,49 @@ async def finish_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test_i
     if test_data_key not in context.user_data:
         return
 
-    data = load_data()
-    test = data['tests'][test_id]
     user_answers = context.user_data[test_data_key]['answers']
     user_id = update.effective_user.id
 
-    # To'g'ri javoblar soni
-    correct = 0
-    total = len(test['questions'])
-    results = []
-
-    for idx, question in enumerate(test['questions']):
-        user_answer = user_answers.get(str(idx), '')
-
-        # Yozma javoblar uchun avtomatik tekshirish (36-40 savollar)
-        if question.get('type') == 'text_answer':
-            correct_answer = question.get('correct', '')
-            # Case-insensitive tekshirish
-            is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
-            if is_correct:
-                correct += 1
-            results.append({
-                'question': question['question'],
-                'user_answer': user_answer,
-                'correct_answer': correct_answer,
-                'is_correct': is_correct,
-                'type': 'text_answer'
-            })
-        # Masalaviy javoblar uchun avtomatik tekshirish (41-43 savollar)
-        elif question.get('type') == 'problem':
-            correct_answers = question.get('correct', [])
-            # User answer vergul bilan ajratilgan
-            user_answers_list = [a.strip() for a in user_answer.split(',')]
-            
-            # Har bir javobni tekshirish va alohida saqlash
-            sub_results = []
-            correct_count = 0
-            for i, (user_ans, correct_ans) in enumerate(zip(user_answers_list, correct_answers)):
-                is_sub_correct = user_ans.strip().lower() == correct_ans.strip().lower()
-                if is_sub_correct:
-                    correct_count += 1
-                sub_results.append({
-                    'sub_index': i + 1,
-                    'user_answer': user_ans.strip(),
-                    'correct_answer': correct_ans.strip(),
-                    'is_correct': is_sub_correct
-                })
-            
-            # Agar barcha javoblar to'g'ri bo'lsa
-            is_correct = (correct_count == len(correct_answers))
-            if is_correct:
-                correct += 1
-            
-            results.append({
-                'question': question['question'],
-                'user_answer': user_answer,
-                'correct_answer': ','.join(correct_answers) if isinstance(correct_answers, list) else correct_answers,
-                'is_correct': is_correct,
-                'type': 'problem',
-                'sub_results': sub_results,
-                'sub_question_count': len(correct_answers)
-            })
-        else:
-            # Ko'p tanlov javoblari uchun avtomatik tekshirish (1-35 savollar)
-            is_correct = user_answer == question['correct']
-            if is_correct:
-                correct += 1
-            results.append({
-                'question': question['question'],
-                'user_answer': user_answer,
-                'correct_answer': question['correct'],
-                'is_correct': is_correct
-            })
-
-    # Natijalarni saqlash (lekin hozir ko'rsatmaymiz)
-    result_id = f"result_{user_id}_{test_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    if 'user_results' not in data:
-        data['user_results'] = {}
-    data['user_results'][result_id] = {
-        'user_id': user_id,
-        'test_id': test_id,
-        'test_name': test['name'],
-        'correct': correct,
-        'total': total,
-        'percentage': (correct / total * 100) if total > 0 else 0,
-        'results': results,
-        'completed_at': datetime.now().isoformat()
-    }
-    save_data(data)
-
-    # 0-1 Matrix yaratish va yangilash
-    from utils import generate_response_matrix
-    matrix_file_path_1_40, matrix_file_path_41_43, _ = generate_response_matrix(test_id, data)
-    if matrix_file_path_1_40:
-        # Matrix faylini test ma'lumotlariga saqlash
-        if 'matrix_file' not in test:
-            test['matrix_file'] = matrix_file_path_1_40
-        if 'matrix_file_41_43' not in test and matrix_file_path_41_43:
-            test['matrix_file_41_43'] = matrix_file_path_41_43
-        data['tests'][test_id] = test
-        save_data(data)
+    # Baholash va natijani saqlash (lekin hozir ko'rsatmaymiz) qulf ichida -
+    # bir vaqtda tugatayotgan talabalar bir-birining natijasini o'chirmasligi
+    # va javoblar kaliti tahrirlanayotganda natija eski kalit bo'yicha
+    # baholanib, qayta baholashdan (rescore_test) keyin saqlanib qolmasligi uchun
+    async with transaction() as data:
+        test = data['tests'][test_id]
+        # Baholash - test uchun bir marta tuzilgan javoblar kaliti bo'yicha (scoring.py).
+        # Natija ixcham saqlanadi: xom javoblar va to'g'ri/noto'g'ri belgilari,
+        # savol matni va to'g'ri javoblar testdan olinadi (result_codec.py)
+        total = len(test['questions'])
+        answers = [user_answers.get(str(idx), '') for idx in range(total)]
+        correct_bits, correct = get_scoring_plan(test_id, data).score(answers)
+
+        result_id = f"result_{user_id}_{test_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        result = {
+            'user_id': user_id,
+            'test_id': test_id,
+            'test_name': test['name'],
+            'correct': correct,
+            'total': total,
+            'percentage': (correct / total * 100) if total > 0 else 0,
+            'answers': answers,
+            'correct_bits': correct_bits,
+            'completed_at': datetime.now().isoformat()
+        }
+        # Taxminiy Rasch bali - test kalibrovka qilingan bo'lsa, saqlangan
+        # savollar qiyinligi bo'yicha (to'liq tahlilsiz, calibration.py)
+        provisional = provisional_scores(test, correct_bits)
+        if provisional is not None:
+            result['provisional'] = provisional
+        durable = add_result(result_id, result)
+
+    # 0-1 Matrix bu yerda yaratilmaydi - u faqat "Matrix yuklab olish" va
+    # "Testni natijalash" bosilganda hosil qilinadi (har bir javobda emas)
+
+    # Natija diskka yozilgunicha kutamiz - qulf bo'shatilgan, boshqa talabalar
+    # ham shu vaqtda natija qo'shadi va hammasi bitta yozishda saqlanadi
+    await durable
+    # Natijalar yetarli bo'lsa savollar qiyinligini fonda (qayta) kalibrovka qilish
+    schedule_calibration(test_id)
 
     # Faqat "javobingiz qabul qilindi" deb yuborish
     # Natijalar testni natijalash tugmasi bosilguncha ko'rsatilmaydi
@@ -1553,6 +1421,65 @@ async def finish_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test_i
     del context.user_data[test_data_key]
 
 
+# generate_response_matrix natijalari uchun hisobot turlari (keshda)
+MATRIX_REPORTS = ('matrix_1-40', 'matrix_41-43', 'matrix_text')
+
+
+async def _reports(test_id, version, kinds, func, make_args):
+    """Hisobotlar - keshdan yoki func ni alohida jarayonda bajarib
+
+    Kesh kaliti (test_id, hisobot turi, report_version): yangi natija,
+    javoblar kaliti tahriri yoki talabgor ismi o'zgarganidan keyin hisobot
+    qayta yaratiladi. make_args()
+    faqat kesh bo'sh bo'lsa chaqiriladi. func natijasi kinds ga mos: bitta
+    fayl (BytesIO) yoki (BytesIO/matn) kortej.
+
+    Returns:
+        list yoki None (hisobot yaratilmadi): [{'content', 'file_id'}, ...]
+    """
+    reports = [cached_report(test_id, kind, version) for kind in kinds]
+    if None not in reports:
+        return reports
+    outputs = await run_job(func, *make_args())
+    if len(kinds) == 1:
+        outputs = (outputs,)
+    if any(output is None for output in outputs):
+        return None
+    return [store_report(test_id, kind, version, output.getvalue() if isinstance(output, BytesIO) else output)
+            for kind, output in zip(kinds, outputs)]
+
+
+def _release_jobs(jobs):
+    """Kutilmay qolgan hisobot ishlarini bekor qilish va tugaganlari xatosini olish
+
+    Aks holda asyncio "Task exception was never retrieved" deb yozadi.
+    """
+    for job in jobs:
+        if not job.done():
+            job.cancel()
+        elif not job.cancelled():
+            job.exception()
+
+
+async def send_report(update: Update, report, filename, caption):
+    """Hisobot faylini yuborish (_reports yozuvi)
+
+    Fayl bir marta yuklanadi: keyingi so'rovlarda Telegram file_id bilan
+    yuboriladi. file_id yaroqsiz bo'lsa fayl baytlardan qayta yuklanadi.
+    """
+    message = update.callback_query.message if update.callback_query else update.message
+    if report['file_id']:
+        try:
+            return await message.reply_document(document=report['file_id'], caption=caption)
+        except BadRequest as e:
+            logger.error(f"Hisobotni file_id bilan yuborish xatosi: {e}")
+            report['file_id'] = None
+    sent = await message.reply_document(document=BytesIO(report['content']), filename=filename, caption=caption)
+    if sent is not None and sent.document is not None:
+        report['file_id'] = sent.document.file_id
+    return sent
+
+
 async def finalize_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test_id: str):
     """Testni natijalash - barcha natijalarni to'plash va o'qituvchiga yuborish"""
     user_id = update.effective_user.id
@@ -1572,10 +1499,7 @@ async def finalize_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test
         return
 
     # Barcha foydalanuvchi natijalarini to'plash
-    all_results = [
-        r for r_id, r in data.get('user_results', {}).items()
-        if r.get('test_id') == test_id
-    ]
+    all_results = get_test_results(test_id)
 
     if not all_results:
         if update.callback_query:
@@ -1617,168 +1541,126 @@ async def finalize_test(update: Update, context: ContextTypes.DEFAULT_TYPE, test
     if total_students > 20:
         text += f"... va yana {total_students - 20} ta natija\n"
 
-    # Excel fayl yaratish (barcha natijalar uchun)
+    # Og'ir hisobotlar (Excel, Rasch tahlili, matrix) alohida jarayonlarda
+    # parallel tayyorlanadi - shu vaqtda bot boshqa foydalanuvchilarga javob beradi.
+    # Shu natijalar uchun avval tayyorlangan hisobotlar (masalan, matrix
+    # yuklab olingan bo'lsa) qayta yaratilmaydi
+    version = report_version(test_id, data)
+    snapshot = build_test_snapshot(test_id, data)
+    excel_job = asyncio.ensure_future(_reports(
+        test_id, version, ('test_results',), generate_test_results_excel, lambda: (test_id, finalized_results)))
+    final_job = asyncio.ensure_future(_reports(
+        test_id, version, ('final_results',), generate_final_results_excel, lambda: (test_id, snapshot)))
+    matrix_job = asyncio.ensure_future(_reports(
+        test_id, version, MATRIX_REPORTS, generate_response_matrix, lambda: (test_id, snapshot)))
+
+    jobs = (excel_job, final_job, matrix_job)
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
-        
-        # Excel fayl yaratish
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Test Natijalari"
-        
-        # Header qator
-        headers = ['#', 'Talabgor', 'To\'g\'ri javoblar', 'Jami savollar', 'Foiz (%)', 'Vaqt']
-        ws.append(headers)
-        
-        # Header qatorini formatlash
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = header_fill
-        
-        # Ma'lumotlar qatorlari
-        for idx, result in enumerate(finalized_results, 1):
-            completed_time = datetime.fromisoformat(result['completed_at']).strftime('%Y-%m-%d %H:%M')
-            row = [
-                idx,
-                result['user_id'],
-                result['correct'],
-                result['total'],
-                round(result['percentage'], 2),
-                completed_time
-            ]
-            ws.append(row)
-        
-        # Ustunlarni kengaytirish
-        for col in range(1, len(headers) + 1):
-            col_letter = get_column_letter(col)
-            ws.column_dimensions[col_letter].width = 20
-        
-        # Ma'lumotlar qatorlarini formatlash
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-            for cell in row:
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Excel faylni saqlash
-        results_dir = "final_results"
-        os.makedirs(results_dir, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        excel_file_path = os.path.join(results_dir, f"test_results_{test_id}_{timestamp}.xlsx")
-        wb.save(excel_file_path)
-        
-        # O'qituvchiga yuborish
-        if update.callback_query:
-            await update.callback_query.edit_message_text(text)
-        else:
-            await update.message.reply_text(text)
+        # Excel fayl (barcha natijalar uchun)
+        try:
+            excel_reports = await excel_job
+            if excel_reports is None:
+                raise ValueError("hisobot yaratilmadi")
 
-        # Excel faylni yuborish
-        with open(excel_file_path, 'rb') as excel_file:
+            # O'qituvchiga yuborish
             if update.callback_query:
-                await update.callback_query.message.reply_document(
-                    document=excel_file,
-                    filename=f"test_results_{test_id}.xlsx",
-                    caption=f"📊 Test natijalari: {test['name']}\n\n"
-                            f"📈 Jami ishtirokchilar: {total_students}\n"
-                            f"📊 O'rtacha foiz: {avg_percentage:.1f}%"
-                )
+                await update.callback_query.edit_message_text(text)
             else:
-                await update.message.reply_document(
-                    document=excel_file,
-                    filename=f"test_results_{test_id}.xlsx",
-                    caption=f"📊 Test natijalari: {test['name']}\n\n"
-                            f"📈 Jami ishtirokchilar: {total_students}\n"
-                            f"📊 O'rtacha foiz: {avg_percentage:.1f}%"
-                )
+                await update.message.reply_text(text)
+
+            # Excel faylni yuborish
+            await send_report(
+                update, excel_reports[0],
+                filename=f"test_results_{test_id}.xlsx",
+                caption=f"📊 Test natijalari: {test['name']}\n\n"
+                        f"📈 Jami ishtirokchilar: {total_students}\n"
+                        f"📊 O'rtacha foiz: {avg_percentage:.1f}%"
+            )
         
-    except Exception as e:
-        logger.error(f"Excel fayl yaratish xatosi: {e}")
-        error_text = f"❌ Excel fayl yaratishda xatolik: {str(e)}"
-        if update.callback_query:
-            await update.callback_query.message.reply_text(error_text)
-        else:
-            await update.message.reply_text(error_text)
+        except Exception as e:
+            logger.error(f"Excel fayl yaratish xatosi: {e}")
+            error_text = f"❌ Excel fayl yaratishda xatolik: {str(e)}"
+            if update.callback_query:
+                await update.callback_query.message.reply_text(error_text)
+            else:
+                await update.message.reply_text(error_text)
+
+        try:
+            # Yakuniy natijalar (Rasch modeli asosida) - kamida 2 ta natija kerak
+            final_reports = await final_job
+            if final_reports:
+                try:
+                    await send_report(
+                        update, final_reports[0],
+                        filename=f"final_results_{test_id}.xlsx",
+                        caption=f"🏆 Yakuniy natijalar: {test['name']}\n\n"
+                                f"Test-ball, yozma ball, yakuniy ball va daraja (Rasch modeli)"
+                    )
+                except Exception as e:
+                    logger.error(f"Yakuniy natijalar yuborish xatosi: {e}")
 
-    # 2ta matrix faylini yaratish va yuborish
-        from utils import generate_response_matrix
-        matrix_file_path_1_40, matrix_file_path_41_43, _ = generate_response_matrix(test_id, data)
+            # 2ta matrix faylini yuborish
+            matrix_reports = await matrix_job
         
-        if matrix_file_path_1_40 and matrix_file_path_41_43:
-            # 1. Questions 1-40 faylini yuborish
-            try:
-                with open(matrix_file_path_1_40, 'rb') as f1:
-                    if update.callback_query:
-                        await update.callback_query.message.reply_document(
-                            document=f1,
-                            filename=f"matrix_1-40_{test_id}.xlsx",
-                            caption=f"📋 0-1 Matrix (1-dars): {test['name']}\n\n"
-                                    f"📊 1-40 savollar uchun matrix\n"
-                                    f"Format: user_id, Q1, Q2, ..., Q40\n"
-                                    f"0 = xato javob, 1 = to'g'ri javob"
-                        )
-                    else:
-                        await update.message.reply_document(
-                            document=f1,
-                            filename=f"matrix_1-40_{test_id}.xlsx",
-                            caption=f"📋 0-1 Matrix (1-dars): {test['name']}\n\n"
-                                    f"📊 1-40 savollar uchun matrix\n"
-                                    f"Format: user_id, Q1, Q2, ..., Q40\n"
-                                    f"0 = xato javob, 1 = to'g'ri javob"
-                        )
-            except Exception as e:
-                logger.error(f"Matrix 1-40 yuborish xatosi: {e}")
+            if matrix_reports:
+                # 1. Questions 1-40 faylini yuborish
+                try:
+                    await send_report(update, matrix_reports[0], **_matrix_1_40_document(test_id, test))
+                except Exception as e:
+                    logger.error(f"Matrix 1-40 yuborish xatosi: {e}")
             
-            # 2. Questions 41-43 faylini yuborish
-            try:
-                with open(matrix_file_path_41_43, 'rb') as f2:
-                    if update.callback_query:
-                        await update.callback_query.message.reply_document(
-                            document=f2,
-                            filename=f"matrix_41-43_{test_id}.xlsx",
-                            caption=f"📋 0-1 Matrix (2-dars): {test['name']}\n\n"
-                                    f"📊 41-43 savollar uchun batafsil matrix\n"
-                                    f"Format: Talabgor, 41.1, 41.2, ..., 43.n\n"
-                                    f"Har bir kichik savol uchun alohida ustun\n"
-                                    f"0 = xato javob, 1 = to'g'ri javob"
-                        )
-                    else:
-                        await update.message.reply_document(
-                            document=f2,
-                            filename=f"matrix_41-43_{test_id}.xlsx",
-                            caption=f"📋 0-1 Matrix (2-dars): {test['name']}\n\n"
-                                    f"📊 41-43 savollar uchun batafsil matrix\n"
-                                    f"Format: Talabgor, 41.1, 41.2, ..., 43.n\n"
-                                    f"Har bir kichik savol uchun alohida ustun\n"
-                                    f"0 = xato javob, 1 = to'g'ri javob"
-                        )
-            except Exception as e:
-                logger.error(f"Matrix 41-43 yuborish xatosi: {e}")
-
-        # Testni to'xtatish (o'chirmaslik, faqat to'xtatish)
-        # Testni ishlashni to'xtatish uchun 'finalized' flag qo'shamiz
-        test['finalized'] = True
-        test['finalized_at'] = datetime.now(UZBEKISTAN_TZ).isoformat()
-        data['tests'][test_id] = test
-        save_data(data)
-
-        success_text = f"✅ Test muvaffaqiyatli natijalandi va to'xtatildi!"
-        if update.callback_query:
-            await update.callback_query.message.reply_text(success_text)
-        else:
-            await update.message.reply_text(success_text)
+                # 2. Questions 41-43 faylini yuborish
+                try:
+                    await send_report(update, matrix_reports[1], **_matrix_41_43_document(test_id, test))
+                except Exception as e:
+                    logger.error(f"Matrix 41-43 yuborish xatosi: {e}")
+
+            # Testni to'xtatish (o'chirmaslik, faqat to'xtatish)
+            # Testni ishlashni to'xtatish uchun 'finalized' flag qo'shamiz
+            test['finalized'] = True
+            test['finalized_at'] = datetime.now(UZBEKISTAN_TZ).isoformat()
+            await save_test(test_id, test)
+
+            success_text = f"✅ Test muvaffaqiyatli natijalandi va to'xtatildi!"
+            if update.callback_query:
+                await update.callback_query.message.reply_text(success_text)
+            else:
+                await update.message.reply_text(success_text)
+
+        except Exception as e:
+            logger.error(f"Test natijalash xatosi: {e}")
+            error_text = f"❌ Xatolik: {str(e)}"
+            if update.callback_query:
+                await update.callback_query.answer(error_text, show_alert=True)
+            else:
+                await update.message.reply_text(error_text)
+    finally:
+        # Yuborish to'xtab qolsa (masalan, bot to'xtaganda CancelledError) ham
+        # kutilmagan ishlar osilib qolmaydi
+        _release_jobs(jobs)
+
+
+def _matrix_1_40_document(test_id, test):
+    """1-40 savollar matrixi uchun fayl nomi va izoh"""
+    return {
+        'filename': f"matrix_1-40_{test_id}.xlsx",
+        'caption': f"📋 0-1 Matrix (1-dars): {test['name']}\n\n"
+                   f"📊 1-40 savollar uchun matrix\n"
+                   f"Format: user_id, Q1, Q2, ..., Q40\n"
+                   f"0 = xato javob, 1 = to'g'ri javob",
+    }
 
-    except Exception as e:
-        logger.error(f"Test natijalash xatosi: {e}")
-        error_text = f"❌ Xatolik: {str(e)}"
-        if update.callback_query:
-            await update.callback_query.answer(error_text, show_alert=True)
-        else:
-            await update.message.reply_text(error_text)
+
+def _matrix_41_43_document(test_id, test):
+    """41-43 savollar matrixi uchun fayl nomi va izoh"""
+    return {
+        'filename': f"matrix_41-43_{test_id}.xlsx",
+        'caption': f"📋 0-1 Matrix (2-dars): {test['name']}\n\n"
+                   f"📊 41-43 savollar uchun batafsil matrix\n"
+                   f"Format: Talabgor, 41.1, 41.2, ..., 43.n\n"
+                   f"Har bir kichik savol uchun alohida ustun\n"
+                   f"0 = xato javob, 1 = to'g'ri javob",
+    }
 
 
 async def download_matrix(update: Update, context: ContextTypes.DEFAULT_TYPE, test_id: str):
@@ -1799,80 +1681,94 @@ async def download_matrix(update: Update, context: ContextTypes.DEFAULT_TYPE, te
             await update.callback_query.answer("❌ Bu testni matrixini yuklab olish huquqingiz yo'q!")
         return
 
-    # Matrix yaratish/yangilash - ikkita alohida fayl
-    from utils import generate_response_matrix
-    file_path_1_40, file_path_41_43, matrix_text = generate_response_matrix(test_id, data)
+    # Matrix - ikkita alohida fayl (keshdan yoki alohida jarayonda yaratib)
+    matrix_reports = await _reports(
+        test_id, report_version(test_id, data), MATRIX_REPORTS, generate_response_matrix,
+        lambda: (test_id, build_test_snapshot(test_id, data))
+    )
 
-    if not file_path_1_40 or not file_path_41_43:
+    if not matrix_reports:
         if update.callback_query:
             await update.callback_query.answer("❌ Matrix yaratib bo'lmadi yoki hali natijalar yo'q!", show_alert=True)
         else:
             await update.message.reply_text("❌ Matrix yaratib bo'lmadi yoki hali natijalar yo'q!")
         return
+    report_1_40, report_41_43, matrix_text = matrix_reports
 
     # Ikkita matrix faylini yuborish
     try:
         # 1. Questions 1-40 faylini yuborish
-        with open(file_path_1_40, 'rb') as f1:
-            if update.callback_query:
-                await update.callback_query.message.reply_document(
-                    document=f1,
-                    filename=f"matrix_1-40_{test_id}.xlsx",
-                    caption=f"📋 0-1 Matrix (1-dars): {test['name']}\n\n"
-                            f"📊 1-40 savollar uchun matrix\n"
-                            f"Format: user_id, Q1, Q2, ..., Q40\n"
-                            f"0 = xato javob, 1 = to'g'ri javob"
-                )
-            else:
-                await update.message.reply_document(
-                    document=f1,
-                    filename=f"matrix_1-40_{test_id}.xlsx",
-                    caption=f"📋 0-1 Matrix (1-dars): {test['name']}\n\n"
-                            f"📊 1-40 savollar uchun matrix\n"
-                            f"Format: user_id, Q1, Q2, ..., Q40\n"
-                            f"0 = xato javob, 1 = to'g'ri javob"
-                )
+        await send_report(update, report_1_40, **_matrix_1_40_document(test_id, test))
         
         # 2. Questions 41-43 faylini yuborish
-        with open(file_path_41_43, 'rb') as f2:
-            if update.callback_query:
-                await update.callback_query.message.reply_document(
-                    document=f2,
-                    filename=f"matrix_41-43_{test_id}.xlsx",
-                    caption=f"📋 0-1 Matrix (2-dars): {test['name']}\n\n"
-                            f"📊 41-43 savollar uchun batafsil matrix\n"
-                            f"Format: Talabgor, 41.1, 41.2, ..., 43.n\n"
-                            f"Har bir kichik savol uchun alohida ustun\n"
-                            f"0 = xato javob, 1 = to'g'ri javob"
-                )
-                await update.callback_query.answer("✅ Ikkala matrix ham yuborildi!")
-            else:
-                await update.message.reply_document(
-                    document=f2,
-                    filename=f"matrix_41-43_{test_id}.xlsx",
-                    caption=f"📋 0-1 Matrix (2-dars): {test['name']}\n\n"
-                            f"📊 41-43 savollar uchun batafsil matrix\n"
-                            f"Format: Talabgor, 41.1, 41.2, ..., 43.n\n"
-                            f"Har bir kichik savol uchun alohida ustun\n"
-                            f"0 = xato javob, 1 = to'g'ri javob"
-                )
+        await send_report(update, report_41_43, **_matrix_41_43_document(test_id, test))
+        if update.callback_query:
+            await update.callback_query.answer("✅ Ikkala matrix ham yuborildi!")
     except Exception as e:
         logger.error(f"Matrix yuborish xatosi: {e}")
         # Agar fayl yuborib bo'lmasa, matn sifatida yuborish
         if update.callback_query:
             await update.callback_query.message.reply_text(
                 f"📋 0-1 Matrix: {test['name']}\n\n"
-                f"```\n{matrix_text}\n```",
+                f"```\n{matrix_text['content']}\n```",
                 parse_mode='Markdown'
             )
         else:
             await update.message.reply_text(
                 f"📋 0-1 Matrix: {test['name']}\n\n"
-                f"```\n{matrix_text}\n```",
+                f"```\n{matrix_text['content']}\n```",
                 parse_mode='Markdown'
             )
 
 
+async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE, test_id: str):
+    """Joriy reyting - natijalashdan oldin taxminiy Rasch ballari bo'yicha (o'qituvchi uchun)"""
+    user_id = update.effective_user.id
+    query = update.callback_query
+    data = load_data()
+
+    if test_id not in data['tests']:
+        await query.answer("❌ Test topilmadi!")
+        return
+
+    test = data['tests'][test_id]
+
+    # Faqat test yaratgan foydalanuvchi yoki boss ko'rishi mumkin
+    if user_id != BOSS_ID and test.get('created_by') != user_id:
+        await query.answer("❌ Bu test reytingini ko'rish huquqingiz yo'q!")
+        return
+
+    if CALIBRATION_MIN_RESULTS is None:
+        await query.answer("❌ Joriy reyting o'chirilgan (CALIBRATION_MIN_RESULTS).", show_alert=True)
+        return
+
+    rows = leaderboard(test_id, data)
+    if not rows:
+        n_results = len(get_test_results(test_id, data))
+        await query.answer(
+            f"⏳ Reyting uchun kamida {CALIBRATION_MIN_RESULTS} ta natija kerak (hozir {n_results} ta).",
+            show_alert=True
+        )
+        return
+
+    calibration = test['calibration']
+    text = f"🏆 Joriy reyting: {test['name']}\n\n"
+    text += f"Taxminiy ballar - {calibration['n_results']} ta natija bo'yicha kalibrovka\n"
+    text += "(yakuniy ballar testni natijalashda hisoblanadi)\n\n"
+    users = data.get('users', {})
+    for idx, (result, scores) in enumerate(rows[:20], 1):
+        user_info = users.get(str(result['user_id']), {})
+        full_name = f"{user_info.get('first_name', '')} {user_info.get('last_name', '')}".strip()
+        text += f"{idx}. {full_name or result['user_id']}\n"
+        text += f"   {scores['final_score']:.1f} (test: {scores['test_score']:.1f}, yozma: {scores['written_score']:.1f})\n"
+
+    if len(rows) > 20:
+        text += f"\n... va yana {len(rows) - 20} ta natija\n"
+
+    await query.message.reply_text(text)
+    await query.answer()
+
+
 async def my_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Foydalanuvchi natijalari"""
     if not await check_subscription(update, context):
@@ -1890,14 +1786,16 @@ async def my_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = load_data()
 
     # Faqat natijalangan testlar natijalarini ko'rsatish
-    # Test natijalangan bo'lsa, u data['tests'] dan o'chirilgan bo'ladi
+    # Natijalangan test 'finalized' bilan belgilanadi, keyinroq esa arxivga
+    # ko'chiriladi (data['tests'] dan o'chiriladi)
     user_results = []
-    for r_id, r in data.get('user_results', {}).items():
-        if r['user_id'] == user_id:
-            test_id = r.get('test_id')
-            # Agar test hali mavjud bo'lsa (natijalanmagan), natijalarni ko'rsatmaymiz
-            if test_id not in data.get('tests', {}):
-                user_results.append(r)
+    for r in get_user_results(user_id):
+        test = data.get('tests', {}).get(r.get('test_id'))
+        # Agar test hali natijalanmagan bo'lsa, natijalarni ko'rsatmaymiz
+        if test is None or test.get('finalized', False):
+            user_results.append(r)
+    # Arxivlangan testlar natijalari (qisqacha indeksdan)
+    user_results.extend(archived_results(data, user_id))
 
     if not user_results:
         await update.message.reply_text("❌ Sizda hali test natijalari yo'q yoki testlar hali natijalanmagan.")
@@ -1930,17 +1828,18 @@ async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     finalized_tests = len([t for t_id, t in data.get('tests', {}).items() if t.get('finalized', False)])
     total_tests = active_tests + finalized_tests
     
-    # Test topshirganlar soni (barcha natijalar)
-    total_results = len(data.get('user_results', {}))
+    # Test topshirganlar soni (barcha natijalar, arxivlanganlari bilan)
+    summaries = result_summaries(data) + archived_results(data)
+    total_results = len(summaries)
     
     # Bugungi test topshirganlar soni
     today = datetime.now(UZBEKISTAN_TZ).date()
-    today_results = sum(1 for r in data.get('user_results', {}).values() 
+    today_results = sum(1 for r in summaries
                        if datetime.fromisoformat(r.get('completed_at', '2000-01-01')).date() == today)
     
     # Eng ko'p test topshirgan foydalanuvchi
     user_test_counts = {}
-    for r in data.get('user_results', {}).values():
+    for r in summaries:
         uid = r.get('user_id')
         user_test_counts[uid] = user_test_counts.get(uid, 0) + 1
     
@@ -1948,7 +1847,7 @@ async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     top_user_count = user_test_counts.get(top_user_id, 0) if top_user_id else 0
     
     # O'rtacha foiz (barcha natijalar uchun)
-    all_percentages = [r.get('percentage', 0) for r in data.get('user_results', {}).values()]
+    all_percentages = [r.get('percentage', 0) for r in summaries]
     avg_percentage = sum(all_percentages) / len(all_percentages) if all_percentages else 0
     
     # Qisqacha statistika matni
@@ -2114,7 +2013,10 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['editing_test_id'] = test_id
             context.user_data['test_editing_step'] = 'answers'
             context.user_data['test_questions'] = test['questions']
-            await query.edit_message_text(f"Javoblarni kiriting: 1a2b3c4d...\n\nSavollar soni: {len(test['questions'])}")
+            mc_count = len(choice_questions(test['questions']))
+            await query.edit_message_text(
+                f"Javoblarni kiriting: 1a2b3c4d...\n\nKo'p tanlovli savollar soni: {mc_count}"
+            )
         else:
             await query.answer("❌ Test topilmadi!")
 
@@ -2126,6 +2028,10 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         test_id = data.replace("download_matrix_", "")
         await download_matrix(update, context, test_id)
 
+    elif data.startswith("leaderboard_"):
+        test_id = data.replace("leaderboard_", "")
+        await show_leaderboard(update, context, test_id)
+
     elif data == "cancel_edit":
         context.user_data.pop('editing_test', None)
         context.user_data.pop('editing_test_id', None)
@@ -2156,7 +2062,7 @@ async def process_admin_channel_commands(update: Update, context: ContextTypes.D
             admin_id = int(text)
             if admin_id not in data['admins']:
                 data['admins'].append(admin_id)
-                save_data(data)
+                await save_settings()
                 await update.message.reply_text(f"✅ Admin {admin_id} qo'shildi!")
             else:
                 await update.message.reply_text(f"⚠️ Bu admin allaqachon mavjud.")
@@ -2170,7 +2076,7 @@ async def process_admin_channel_commands(update: Update, context: ContextTypes.D
             admin_id = int(text)
             if admin_id in data['admins']:
                 data['admins'].remove(admin_id)
-                save_data(data)
+                await save_settings()
                 await update.message.reply_text(f"✅ Admin {admin_id} olib tashlandi!")
             else:
                 await update.message.reply_text(f"❌ Bu admin topilmadi.")
@@ -2183,7 +2089,8 @@ async def process_admin_channel_commands(update: Update, context: ContextTypes.D
         channel = text.replace('@', '').strip()
         if channel not in data['mandatory_channels']:
             data['mandatory_channels'].append(channel)
-            save_data(data)
+            await save_settings()
+            invalidate_subscription_cache(channel)
             await update.message.reply_text(f"✅ Kanal {channel} qo'shildi!")
         else:
             await update.message.reply_text(f"⚠️ Bu kanal allaqachon mavjud.")
@@ -2194,7 +2101,8 @@ async def process_admin_channel_commands(update: Update, context: ContextTypes.D
         channel = text.replace('@', '').strip()
         if channel in data['mandatory_channels']:
             data['mandatory_channels'].remove(channel)
-            save_data(data)
+            await save_settings()
+            invalidate_subscription_cache(channel)
             await update.message.reply_text(f"✅ Kanal {channel} olib tashlandi!")
         else:
             await update.message.reply_text(f"❌ Bu kanal topilmadi.")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Og'ir hisobotlarni alohida jarayonlarda bajarish
+
+Excel, Rasch tahlili va PDF generatsiyasi CPU ni ko'p band qiladi. Ular
+event loop ichida bajarilsa, shu vaqtda bot boshqa foydalanuvchilarga
+javob bera olmaydi. run_job() funksiyani ProcessPoolExecutor da ishga
+tushiradi va natijani kutadi - event loop bo'sh qoladi.
+
+Bir vaqtda bajariladigan ishlar soni JOB_MAX_CONCURRENCY bilan
+cheklanadi. Funksiya va argumentlar pickle qilinadigan bo'lishi kerak
+(modul darajasidagi funksiyalar, dict/list/str kabi oddiy qiymatlar).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Ixtiyoriy sozlamalar
+JOB_WORKERS = getattr(config, 'JOB_WORKERS', 2)
+JOB_MAX_CONCURRENCY = getattr(config, 'JOB_MAX_CONCURRENCY', JOB_WORKERS)
+
+_executor = None
+_semaphore = None
+
+
+def get_executor():
+    """Jarayonlar pulini qaytarish (birinchi murojaatda yaratiladi)"""
+    global _executor
+    if _executor is None:
+        # 'spawn' - ishchi jarayonlar ochiq fayllar, qulflar va SQLite
+        # ulanishini bot jarayonidan meros qilib olmaydi
+        _executor = ProcessPoolExecutor(
+            max_workers=JOB_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+async def run_job(func, *args):
+    """func(*args) ni alohida jarayonda bajarish va natijasini qaytarish
+
+    Jarayonlar puli ishdan chiqqan bo'lsa (masalan, ishchi jarayon
+    o'ldirilgan), pul qayta yaratiladi va ish oqimda (thread) bajariladi.
+    """
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(JOB_MAX_CONCURRENCY)
+
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_executor(), func, *args)
+        except BrokenProcessPool as e:
+            logger.error(f"Jarayonlar puli ishdan chiqdi: {e} - {func.__name__} oqimda bajariladi")
+            shutdown()
+            return await asyncio.to_thread(func, *args)
+
+
+async def warm_up(func):
+    """Ishchi jarayonlarni oldindan ishga tushirish va ularda func() ni bajarish
+
+    Birinchi hisobot jarayon yaratish va kutubxonalarni yuklashni kutmasligi uchun.
+    """
+    await asyncio.gather(*(run_job(func) for _ in range(JOB_WORKERS)))
+
+
+def shutdown():
+    """Jarayonlar pulini to'xtatish"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test natijalarini ixcham ko'rinishda saqlash
+
+Eski formatda har bir natija har bir savol uchun alohida dict saqlardi
+(savol matni, to'g'ri javob, tur, kichik javoblar) - ya'ni har bir
+natijada butun javoblar kaliti takrorlanardi. Ixcham formatda natijada
+faqat quyidagilar qoladi:
+
+- answers      - foydalanuvchining xom javoblari (savol tartibida)
+- correct_bits - to'g'ri/noto'g'ri belgilari, '0'/'1' satri. Har bir
+                 belgi 0-1 matrixning bitta ustuniga mos: oddiy savol -
+                 bitta belgi, masalaviy savol - har bir kichik savolga bitta
+
+Savol matni, to'g'ri javob va tur testning o'zidan (indeks bo'yicha)
+olinadi. Eski ko'rinishdagi ro'yxat kerak bo'lganda (PDF, HTML)
+result_items() uni talab bo'yicha tiklaydi.
+"""
+
+
+def response_layout(questions):
+    """Matrix ustunlari tartibi: har bir savol uchun bitta ustun, masalaviy
+    savollar uchun esa har bir kichik savolga alohida ustun
+
+    Returns:
+        tuple: (labels, offsets, sub_counts) - ustun nomlari, har bir savolning
+        birinchi ustuni va kichik savollar soni (oddiy savol uchun 0)
+    """
+    labels, offsets, sub_counts = [], [], []
+    for q_idx, question in enumerate(questions, start=1):
+        offsets.append(len(labels))
+        sub_count = question.get('sub_question_count', 0) if question.get('type') == 'problem' else 0
+        sub_counts.append(sub_count)
+        if sub_count > 0:
+            labels.extend(f"{q_idx}.{sub_idx}" for sub_idx in range(1, sub_count + 1))
+        else:
+            # Oddiy savol yoki eski format (kichik savollarsiz masala)
+            labels.append(f"Q{q_idx}")
+    return labels, offsets, sub_counts
+
+
+def is_compact(result):
+    """Natija ixcham formatda saqlanganmi"""
+    return 'correct_bits' in result
+
+
+def encode_items(questions, items):
+    """Eski formatdagi savollar ro'yxatini (answers, correct_bits) ga aylantirish"""
+    _, _, sub_counts = response_layout(questions)
+    answers = []
+    bits = []
+    for q_idx, sub_count in enumerate(sub_counts):
+        item = items[q_idx] if q_idx < len(items) else {}
+        answers.append(item.get('user_answer', ''))
+        if not sub_count:
+            bits.append('1' if item.get('is_correct') else '0')
+            continue
+        row = ['0'] * sub_count
+        if 'sub_results' in item:
+            for pos, sub in enumerate(item['sub_results'][:sub_count]):
+                if sub.get('is_correct'):
+                    row[pos] = '1'
+        else:
+            # Juda eski format - user_answer ni to'g'ri javoblar bilan taqqoslash
+            correct_answers = questions[q_idx].get('correct', [])
+            user_answer = item.get('user_answer', '')
+            user_answers_list = [a.strip() for a in user_answer.split(',')] if user_answer else []
+            for pos, (user_ans, correct_ans) in enumerate(zip(user_answers_list, correct_answers[:sub_count])):
+                if user_ans.lower() == correct_ans.strip().lower():
+                    row[pos] = '1'
+        bits.extend(row)
+    return answers, ''.join(bits)
+
+
+def compact_result(result, questions):
+    """Natijani ixcham formatga o'tkazish (yangi dict qaytariladi)"""
+    if is_compact(result):
+        return result
+    compact = {k: v for k, v in result.items() if k != 'results'}
+    compact['answers'], compact['correct_bits'] = encode_items(questions, result.get('results', []))
+    return compact
+
+
+def result_items(result, questions):
+    """Natija bo'yicha har bir savol tafsiloti (eski formatdagi ro'yxat)
+
+    Ixcham natija uchun ro'yxat test savollaridan tiklanadi.
+    """
+    if not is_compact(result):
+        return result.get('results', [])
+
+    _, offsets, sub_counts = response_layout(questions)
+    answers = result.get('answers', [])
+    bits = result['correct_bits']
+    items = []
+    for q_idx, question in enumerate(questions):
+        user_answer = answers[q_idx] if q_idx < len(answers) else ''
+        col = offsets[q_idx]
+        q_type = question.get('type')
+        if q_type == 'problem':
+            correct_answers = question.get('correct', [])
+            sub_count = sub_counts[q_idx]
+            sub_results = []
+            for i, (user_ans, correct_ans) in enumerate(zip(user_answer.split(','), correct_answers)):
+                sub_results.append({
+                    'sub_index': i + 1,
+                    'user_answer': user_ans.strip(),
+                    'correct_answer': correct_ans.strip(),
+                    'is_correct': i < sub_count and bits[col + i:col + i + 1] == '1'
+                })
+            if sub_count:
+                is_correct = sum(s['is_correct'] for s in sub_results) == len(correct_answers)
+            else:
+                is_correct = bits[col:col + 1] == '1'
+            items.append({
+                'question': question.get('question', ''),
+                'user_answer': user_answer,
+                'correct_answer': ','.join(correct_answers) if isinstance(correct_answers, list) else correct_answers,
+                'is_correct': is_correct,
+                'type': 'problem',
+                'sub_results': sub_results,
+                'sub_question_count': len(correct_answers)
+            })
+            continue
+
+        item = {
+            'question': question.get('question', ''),
+            'user_answer': user_answer,
+            'correct_answer': question.get('correct', ''),
+            'is_correct': bits[col:col + 1] == '1'
+        }
+        if q_type == 'text_answer':
+            item['type'] = 'text_answer'
+        items.append(item)
+    return items
+
+
+def compact_all_results(data):
+    """Barcha eski formatdagi natijalarni ixcham formatga o'tkazish (joyida)
+
+    Testi topilmagan natijalar o'zgarishsiz qoldiriladi.
+
+    Returns:
+        int: o'tkazilgan natijalar soni
+    """
+    tests = data.get('tests', {})
+    converted = 0
+    for result_id, result in data.get('user_results', {}).items():
+        test = tests.get(result.get('test_id'))
+        if is_compact(result) or not test or not test.get('questions'):
+            continue
+        data['user_results'][result_id] = compact_result(result, test['questions'])
+        converted += 1
+    return converted
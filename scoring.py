@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test javoblarini baholash
+
+Har bir test bir marta "baholash rejasi" ga (ScoringPlan) kompilyatsiya
+qilinadi: barcha to'g'ri javoblar normallashtirilib (strip + lower), 0-1
+matrix ustunlari tartibida bitta tekis ro'yxatga yoziladi:
+
+- ko'p tanlov (1-35)  - bitta ustun, javob aynan taqqoslanadi
+- yozma javob (36-40) - bitta ustun, katta-kichik harf va bo'shliqlarsiz
+- masalaviy (41-43)   - har bir kichik javobga bitta ustun (vergul bilan)
+
+Baholashda foydalanuvchi javoblari ham shu ustunlarga yoyiladi va kalit
+bilan bitta o'tishda taqqoslanadi - savol turi bo'yicha tarmoqlanish va
+to'g'ri javoblarni qayta normallashtirish har bir topshiriqda takrorlanmaydi.
+
+Reja database.test_version() bo'yicha keshlanadi: test saqlanganda
+(yaratish, javoblar kalitini tahrirlash) versiya oshadi va reja qaytadan
+tuziladi.
+
+Javoblar kaliti tahrirlanganda rescore_test() testning barcha saqlangan
+natijalarini yangi kalit bo'yicha bitta matritsaviy taqqoslashda qayta
+baholaydi va o'zgarganlarini bitta yozishda saqlaydi.
+"""
+
+from operator import eq
+
+from result_codec import response_layout
+
+# Ustunga yoyish usuli
+_EXACT, _TEXT, _SPLIT = 0, 1, 2
+
+# Reja keshi: test_id -> (test_version, ScoringPlan)
+_plan_cache = {}
+
+
+def _normalize(answer):
+    return answer.strip().lower()
+
+
+class ScoringPlan:
+    """Bitta test uchun kompilyatsiya qilingan javoblar kaliti
+
+    Natija finish_test dagi eski hisoblash bilan bir xil: masalaviy savol
+    barcha kichik javoblari to'g'ri bo'lsa to'g'ri hisoblanadi, correct_bits
+    esa result_codec.encode_items() formatida.
+    """
+
+    __slots__ = ('kinds', 'keys', 'single', 'groups', 'spans', 'sub_counts', 'direct_bits')
+
+    def __init__(self, questions):
+        _, _, sub_counts = response_layout(questions)
+        kinds, keys, single, groups, spans = [], [], [], [], []
+        for question in questions:
+            start = len(keys)
+            q_type = question.get('type')
+            if q_type == 'problem':
+                sub_keys = [_normalize(a) for a in question.get('correct', [])]
+                kinds.append((_SPLIT, len(sub_keys)))
+                keys.extend(sub_keys)
+                groups.append((start, len(keys)))
+            else:
+                if q_type == 'text_answer':
+                    kinds.append((_TEXT, 1))
+                    keys.append(_normalize(question.get('correct', '')))
+                else:
+                    kinds.append((_EXACT, 1))
+                    keys.append(question.get('correct'))
+                single.append(start)
+            spans.append((start, len(keys)))
+
+        self.kinds = kinds
+        self.keys = keys
+        self.single = single
+        self.groups = groups
+        self.spans = spans
+        self.sub_counts = sub_counts
+        # Odatiy holatda (kichik savollar soni = kalitlar soni) ustunlar
+        # correct_bits bilan bir xil tartibda - belgilar to'g'ridan-to'g'ri olinadi
+        self.direct_bits = all(
+            sub_count == end - start and sub_count > 0
+            for (start, end), sub_count, (kind, _) in zip(spans, sub_counts, kinds)
+            if kind == _SPLIT
+        )
+
+    def columns(self, answers):
+        """Foydalanuvchi javoblarini kalit ustunlariga yoyish (normallashtirilgan)"""
+        cols = []
+        for (kind, count), answer in zip(self.kinds, answers):
+            if kind == _EXACT:
+                cols.append(answer)
+            elif kind == _TEXT:
+                cols.append(_normalize(answer))
+            else:
+                parts = [_normalize(p) for p in answer.split(',', count)[:count]]
+                parts.extend([None] * (count - len(parts)))
+                cols.extend(parts)
+        return cols
+
+    def score(self, answers):
+        """Javoblarni baholash
+
+        Args:
+            answers: foydalanuvchi javoblari, savollar tartibida (ro'yxat)
+
+        Returns:
+            tuple: (correct_bits, to'g'ri javoblar soni)
+        """
+        answers = list(answers) + [''] * (len(self.kinds) - len(answers))
+        matches = list(map(eq, self.columns(answers), self.keys))
+        correct = sum([matches[col] for col in self.single])
+        correct += sum([all(matches[start:end]) for start, end in self.groups])
+        if self.direct_bits:
+            return ''.join(['1' if m else '0' for m in matches]), correct
+
+        bits = []
+        for (start, end), sub_count in zip(self.spans, self.sub_counts):
+            span = matches[start:end]
+            if sub_count:
+                row = span[:sub_count]
+                bits.extend('1' if m else '0' for m in row)
+                bits.append('0' * (sub_count - len(row)))
+            else:
+                bits.append('1' if all(span) else '0')
+        return ''.join(bits), correct
+
+    def score_many(self, answer_rows):
+        """Ko'p topshiriqni birdaniga baholash (numpy, talabalar x ustunlar matritsasi)
+
+        Returns:
+            tuple: (correct_bits ro'yxati, to'g'ri javoblar soni ro'yxati)
+        """
+        import numpy as np
+
+        width = len(self.kinds)
+        # None - javob berilmagan kichik savol, hech qaysi kalitga teng emas (object dtype)
+        cols = np.array([self.columns(list(row) + [''] * (width - len(row))) for row in answer_rows],
+                        dtype=object).reshape(len(answer_rows), len(self.keys))
+        keys = np.empty(len(self.keys), dtype=object)
+        keys[:] = self.keys
+        matches = (cols == keys).astype(bool)
+
+        correct = matches[:, self.single].sum(axis=1)
+        for start, end in self.groups:
+            correct += matches[:, start:end].all(axis=1)
+
+        if self.direct_bits:
+            bits = matches
+        else:
+            blocks = []
+            for (start, end), sub_count in zip(self.spans, self.sub_counts):
+                span = matches[:, start:end]
+                if sub_count:
+                    row = span[:, :sub_count]
+                    blocks.append(row)
+                    blocks.append(np.zeros((len(answer_rows), sub_count - row.shape[1]), dtype=bool))
+                else:
+                    blocks.append(span.all(axis=1, keepdims=True))
+            bits = np.hstack(blocks)
+        # '0'/'1' belgilari: har bir qator - bitta natijaning correct_bits satri
+        text = (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+        n_bits = bits.shape[1]
+        return [text[i:i + n_bits] for i in range(0, len(text), n_bits)], correct.tolist()
+
+
+def get_scoring_plan(test_id, data=None):
+    """Test uchun baholash rejasi (kerak bo'lsa kompilyatsiya qilinadi)"""
+    # ScoringPlan ni config siz ishlatish mumkin bo'lishi uchun (benchmark, ishchi jarayonlar)
+    from database import load_data, test_version
+
+    version = test_version(test_id, data)
+    cached = _plan_cache.get(test_id)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    plan = ScoringPlan((data if data is not None else load_data())['tests'][test_id]['questions'])
+    if version is not None:
+        _plan_cache[test_id] = (version, plan)
+    return plan
+
+
+async def rescore_test(test_id):
+    """Testning barcha natijalarini joriy javoblar kaliti bo'yicha qayta baholash
+
+    O'zgargan natijalar (correct, percentage, correct_bits) bitta yozishda
+    saqlanadi, ularning taxminiy bali (provisional) testning joriy
+    kalibrovkasi bo'yicha qayta hisoblanadi (kalibrovka bo'lmasa o'chiriladi).
+    Javoblari saqlanmagan natijalar o'tkazib yuboriladi.
+
+    Returns:
+        tuple: (qayta baholangan natijalar soni, bali o'zgargan natijalar soni)
+    """
+    from database import transaction, get_test_result_ids, update_results
+    from calibration import provisional_scores
+
+    async with transaction() as data:
+        plan = get_scoring_plan(test_id, data)
+        test = data.get('tests', {}).get(test_id, {})
+        user_results = data.get('user_results', {})
+        rescored = [(r_id, user_results[r_id]) for r_id in get_test_result_ids(test_id)]
+        rescored = [(r_id, r) for r_id, r in rescored if 'answers' in r]
+        if not rescored:
+            return 0, 0
+        all_bits, all_correct = plan.score_many([r['answers'] for _, r in rescored])
+
+        updated = {}
+        changed = 0
+        for (result_id, result), bits, correct in zip(rescored, all_bits, all_correct):
+            if bits == result.get('correct_bits') and correct == result.get('correct'):
+                continue
+            if correct != result.get('correct'):
+                changed += 1
+            total = result.get('total', 0)
+            row = dict(
+                result, correct=correct, correct_bits=bits,
+                percentage=(correct / total * 100) if total > 0 else 0
+            )
+            provisional = provisional_scores(test, bits)
+            if provisional is not None:
+                row['provisional'] = provisional
+            else:
+                row.pop('provisional', None)
+            updated[result_id] = row
+        durable = update_results(updated) if updated else None
+    # Diskka yozilishini qulfdan tashqarida kutamiz
+    if durable is not None:
+        await durable
+    return len(rescored), changed
@@ -0,0 +1,897 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ma'lumotlar ombori (storage) backendlari
+
+database.py xotiradagi ma'lumotlar obyektini boshqaradi, bu yerdagi
+backendlar esa uni diskka yozish bilan shug'ullanadi:
+
+- JsonStorage    - butun ma'lumot bitta data.json faylida (eski format)
+- JournalStorage - data.json snapshot + har bir o'zgarish uchun bitta
+                   qator qo'shiladigan jurnal (append-only)
+- SqliteStorage  - SQLite (WAL rejimi), har bir yozuv alohida qatorda
+- ShardedStorage - har bir test (savollari va natijalari) alohida shardda,
+                   natijalar faqat kerak bo'lganda yuklanadi (LRU)
+
+Barcha backendlar bir xil interfeysga ega: load(), save(data) va
+qator darajasidagi save_user/save_test/save_result/save_settings hamda
+delete_test (test va uning natijalarini o'chirish).
+JSON backendda qator darajasidagi metodlar butun faylni qayta yozadi,
+SQLite backendda esa faqat o'zgargan qatorlar yangilanadi.
+
+Qator darajasidagi metodlar o'zgarishni faqat "tayyorlab" qo'yadi, uni
+diskka mustahkam yozish prepare_commit() orqali bo'ladi. Shu tufayli
+qisqa vaqt ichida kelgan bir nechta o'zgarish bitta yozish bilan
+saqlanishi mumkin (group commit, database.py ga qarang).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Yuqori darajadagi (top-level) kalitlar - qolganlari 'meta' jadvalida saqlanadi
+_COLLECTION_KEYS = ('users', 'tests', 'user_results')
+
+
+def empty_data():
+    """Bo'sh ma'lumotlar strukturasi"""
+    return {
+        "admins": [],
+        "mandatory_channels": [],
+        "tests": {},
+        "user_results": {},
+        "users": {}
+    }
+
+
+def atomic_write_json(path, data, indent=None):
+    """JSON faylni xavfsiz yozish (atomic_write_text ga qarang)"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+def atomic_write_text(path, text):
+    """Matnli faylni xavfsiz yozish (atomic_write_bytes ga qarang)"""
+    atomic_write_bytes(path, text.encode('utf-8'))
+
+
+def atomic_write_bytes(path, payload):
+    """Faylni xavfsiz yozish: vaqtinchalik fayl + fsync + rename
+
+    Yozish jarayonida bot to'xtab qolsa ham eski fayl butunligicha qoladi -
+    yangi fayl faqat to'liq yozilib, diskka tushgandan keyin almashtiriladi.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Rename ham diskka tushishi uchun katalogni fsync qilamiz (POSIX)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+def _dumps(value):
+    """JSON ga o'tkazish (ixcham, unicode saqlanadi)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class JsonStorage:
+    """Butun ma'lumotlar bazasi bitta JSON faylda"""
+
+    name = 'json'
+
+    def __init__(self, path):
+        self.path = path
+        # Hali diskka yozilmagan o'zgarishlar bor-yo'qligi
+        self.dirty = False
+        self._pending = None
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """data.json faylini o'qish"""
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                # Eski ma'lumotlar bazasida 'users' bo'lmasligi mumkin
+                if 'users' not in data:
+                    data['users'] = {}
+                return data
+        return empty_data()
+
+    def _serialize(self, data):
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    def _write_text(self, text):
+        with self._write_lock:
+            atomic_write_text(self.path, text)
+
+    def save(self, data):
+        """Butun ma'lumotlarni faylga atomik yozish"""
+        self.dirty = False
+        self._write_text(self._serialize(data))
+
+    # JSON faylda qatorlar yo'q - har qanday o'zgarish butun faylni yozishni talab qiladi
+    def _stage(self, data):
+        self._pending = data
+        self.dirty = True
+
+    def save_user(self, data, user_key):
+        self._stage(data)
+
+    def save_test(self, data, test_id):
+        self._stage(data)
+
+    def save_result(self, data, result_id):
+        self._stage(data)
+
+    def save_settings(self, data):
+        self._stage(data)
+
+    def delete_test(self, data, test_id, result_ids):
+        self._stage(data)
+
+    def prepare_commit(self):
+        """Tayyorlangan o'zgarishlarni yozishga tayyorlash
+
+        Ma'lumot shu yerda (event loop ichida) JSON matnga aylantiriladi,
+        diskka yozish esa qaytarilgan funksiya orqali - uni alohida oqimda
+        (thread) bajarish mumkin. Yozadigan narsa bo'lmasa None qaytadi.
+        """
+        if not self.dirty:
+            return None
+        self.dirty = False
+        text = self._serialize(self._pending)
+        return lambda: self._write_text(text)
+
+    def close(self):
+        job = self.prepare_commit()
+        if job:
+            job()
+
+
+def iter_journal(path):
+    """Jurnal faylidagi yozuvlarni ketma-ket qaytarish
+
+    Oxirgi qator to'liq yozilmay qolgan bo'lsa (yozish paytida to'xtab
+    qolish), u tashlab yuboriladi.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.error(f"Jurnal qatori o'qilmadi: {path}:{line_no} - tashlab yuborildi")
+
+
+def truncate_torn_tail(path):
+    """Jurnal oxiridagi to'liq yozilmagan qatorni kesib tashlash
+
+    Aks holda keyingi yozuv shu qator davomiga qo'shilib, u ham o'qilmay qoladi.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        content = f.read()
+        if content and not content.endswith(b'\n'):
+            f.truncate(content.rfind(b'\n') + 1)
+
+
+def append_lines(path, lines):
+    """Qatorlarni faylga qo'shish va diskka tushirish (fsync)"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def apply_journal_record(data, record):
+    """Bitta jurnal yozuvini ma'lumotlarga qo'llash
+
+    Yozuvlar "kalitga qiymat berish" ko'rinishida, shuning uchun bir
+    yozuvni ikki marta qo'llash natijani o'zgartirmaydi.
+    """
+    op = record.get('op')
+    if op == 'user':
+        data.setdefault('users', {})[record['key']] = record['value']
+    elif op == 'test':
+        data.setdefault('tests', {})[record['key']] = record['value']
+    elif op == 'result':
+        data.setdefault('user_results', {})[record['key']] = record['value']
+    elif op == 'settings':
+        data.update(record['value'])
+    elif op == 'delete_test':
+        # value - testning o'chirilgan natijalari ID lari
+        data.setdefault('tests', {}).pop(record['key'], None)
+        for result_id in record['value']:
+            data.setdefault('user_results', {}).pop(result_id, None)
+    else:
+        logger.error(f"Noma'lum jurnal yozuvi: {op}")
+
+
+class JournalStorage:
+    """data.json snapshot + append-only jurnal (data.json.journal)
+
+    Har bir o'zgarish (foydalanuvchi, test, natija, sozlamalar) jurnalga
+    bitta JSON qator bo'lib qo'shiladi - natija topshirish butun bazani
+    emas, faqat shu yozuvni diskka yozadi. snapshot_every ta yozuvdan
+    keyin jurnal siqiladi: joriy jurnal .old ga o'tkaziladi, yangi
+    snapshot atomik yoziladi va .old o'chiriladi. Ishga tushganda snapshot
+    o'qiladi va .old hamda jurnal qayta qo'llanadi.
+
+    Snapshot oddiy data.json fayli - "json" backendga qaytish mumkin
+    (bot to'xtaganda close() jurnalni snapshotga siqadi).
+    """
+
+    name = 'journal'
+
+    def __init__(self, path, snapshot_every=1000):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.snapshot_every = snapshot_every
+        self._data = None
+        self._pending = []
+        self._records_since_snapshot = 0
+        self._file = None
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """Snapshot ni o'qish va jurnalni qayta qo'llash"""
+        data = JsonStorage(self.path).load()
+        replayed = 0
+        for journal in (self.journal_path + '.old', self.journal_path):
+            for record in iter_journal(journal):
+                apply_journal_record(data, record)
+                replayed += 1
+        if replayed:
+            logger.info(f"Jurnaldan {replayed} ta yozuv qayta qo'llandi")
+        truncate_torn_tail(self.journal_path)
+        self._records_since_snapshot = replayed
+        self._data = data
+        return data
+
+    def _append(self, data, op, key=None, value=None):
+        self._data = data
+        record = {'op': op, 'ts': datetime.now().isoformat(timespec='seconds')}
+        if key is not None:
+            record['key'] = key
+        record['value'] = value
+        self._pending.append(_dumps(record) + '\n')
+
+    def save_user(self, data, user_key):
+        self._append(data, 'user', user_key, data['users'][user_key])
+
+    def save_test(self, data, test_id):
+        self._append(data, 'test', test_id, data['tests'][test_id])
+
+    def save_result(self, data, result_id):
+        self._append(data, 'result', result_id, data['user_results'][result_id])
+
+    def save_settings(self, data):
+        self._append(data, 'settings', value={
+            key: value for key, value in data.items() if key not in _COLLECTION_KEYS
+        })
+
+    def delete_test(self, data, test_id, result_ids):
+        self._append(data, 'delete_test', test_id, list(result_ids))
+
+    def prepare_commit(self):
+        """Navbatdagi yozuvlarni jurnalga qo'shishga tayyorlash
+
+        Yozuvlar allaqachon JSON qatorga aylantirilgan; snapshot vaqti kelgan
+        bo'lsa butun ma'lumot ham shu yerda (event loop ichida) matnga
+        aylantiriladi. Diskka yozish qaytarilgan funksiyada bajariladi.
+        """
+        if not self._pending:
+            return None
+        lines, self._pending = self._pending, []
+        self._records_since_snapshot += len(lines)
+        snapshot = None
+        if self._records_since_snapshot >= self.snapshot_every:
+            snapshot = json.dumps(self._data, ensure_ascii=False, indent=2)
+            self._records_since_snapshot = 0
+
+        def job():
+            with self._write_lock:
+                self._write_lines(lines)
+                if snapshot is not None:
+                    self._write_snapshot(snapshot)
+        return job
+
+    def _write_lines(self, lines):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_snapshot(self, text):
+        """Jurnalni siqish: jurnal -> .old, yangi snapshot, .old ni o'chirish"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        old_path = self.journal_path + '.old'
+        if os.path.exists(self.journal_path):
+            if os.path.exists(old_path):
+                # Oldingi siqish tugamay qolgan - ikkala jurnalni birlashtiramiz
+                with open(old_path, 'a', encoding='utf-8') as old, \
+                        open(self.journal_path, 'r', encoding='utf-8') as current:
+                    old.write(current.read())
+                    old.flush()
+                    os.fsync(old.fileno())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, old_path)
+        atomic_write_text(self.path, text)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+    def save(self, data):
+        """Butun ma'lumotlarni snapshot sifatida yozish (jurnal tozalanadi)"""
+        self._data = data
+        self._pending = []
+        self._records_since_snapshot = 0
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        with self._write_lock:
+            self._write_snapshot(text)
+
+    def close(self):
+        job = self.prepare_commit()
+        if job:
+            job()
+        if self._data is not None and self._records_since_snapshot:
+            self.save(self._data)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Natijaning qisqacha ma'lumotiga kirmaydigan (katta) maydonlar
+_RESULT_BODY_KEYS = ('answers', 'correct_bits', 'results')
+
+
+def result_summary(result):
+    """Natijaning javoblarsiz qisqacha ko'rinishi (indeks va statistika uchun)"""
+    return {k: v for k, v in result.items() if k not in _RESULT_BODY_KEYS}
+
+
+class ShardedResults(MutableMapping):
+    """Shard omborida data['user_results'] o'rnida ishlatiladigan obyekt
+
+    Kalitlar va natijalarning qisqacha ma'lumoti doim xotirada turadi,
+    to'liq natija (javoblar bilan) esa murojaat qilinganda o'z testining
+    shardidan yuklanadi. Oddiy dict kabi ishlatiladi; summaries() shardlarni
+    yuklamasdan barcha natijalar bo'yicha o'tish uchun.
+    """
+
+    def __init__(self, storage, summaries):
+        self._storage = storage
+        self._summaries = summaries
+
+    def __getitem__(self, result_id):
+        test_id = self._summaries[result_id].get('test_id')
+        return self._storage.load_shard(test_id)[result_id]
+
+    def __setitem__(self, result_id, result):
+        self._storage.load_shard(result.get('test_id'))[result_id] = result
+        self._summaries[result_id] = result_summary(result)
+
+    def __delitem__(self, result_id):
+        test_id = self._summaries.pop(result_id).get('test_id')
+        self._storage.load_shard(test_id).pop(result_id, None)
+
+    def __iter__(self):
+        return iter(self._summaries)
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def __contains__(self, result_id):
+        return result_id in self._summaries
+
+    def summaries(self):
+        """(result_id, qisqacha ma'lumot) juftliklari - shardlar yuklanmaydi"""
+        return self._summaries.items()
+
+
+class ShardedStorage:
+    """Har bir test alohida shardda
+
+    Katalog tuzilishi:
+        global.json                    - users, admins, mandatory_channels va boshqa sozlamalar
+        index.jsonl                    - natijalarning qisqacha ma'lumoti (append-only)
+        tests/<test_id>.json           - test (savollari bilan)
+        tests/<test_id>.results.jsonl  - shu test natijalari (append-only)
+
+    Testlar ro'yxati (savollari bilan) ishga tushganda yuklanadi, natijalar
+    esa faqat shu testga murojaat bo'lganda o'qiladi va oxirgi cache_size ta
+    test shardi xotirada saqlanadi (LRU). Yangi natija o'z shardiga va
+    indeksga bitta qator bo'lib qo'shiladi. Qatorlar "kalitga qiymat berish"
+    ko'rinishida - bir natija qayta yozilsa, oxirgisi amal qiladi; indeksda
+    qiymati null bo'lgan qator natija o'chirilganini bildiradi.
+    """
+
+    name = 'sharded'
+
+    def __init__(self, directory, cache_size=16):
+        self.directory = directory
+        self.tests_dir = os.path.join(directory, 'tests')
+        self.global_path = os.path.join(directory, 'global.json')
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.cache_size = cache_size
+        # test_id -> {result_id: result}, eng oxirgi ishlatilgani oxirida
+        self._shards = OrderedDict()
+        # Diskka yozilishi kutilayotgan shardlar xotiradan chiqarilmaydi
+        self._pinned = {}
+        self._pinned_lock = threading.Lock()
+        self._appends = {}          # fayl yo'li -> [qator, ...]
+        self._appended_tests = []
+        self._dirty_tests = {}      # test_id -> test
+        self._deleted_tests = set()
+        self._global_data = None
+        self._write_lock = threading.Lock()
+        os.makedirs(self.tests_dir, exist_ok=True)
+
+    def _test_path(self, test_id):
+        return os.path.join(self.tests_dir, f"{test_id}.json")
+
+    def _results_path(self, test_id):
+        return os.path.join(self.tests_dir, f"{test_id}.results.jsonl")
+
+    @staticmethod
+    def _global_text(data):
+        return json.dumps(
+            {k: v for k, v in data.items() if k not in ('tests', 'user_results')},
+            ensure_ascii=False, indent=2
+        )
+
+    @staticmethod
+    def _test_text(test):
+        return json.dumps(test, ensure_ascii=False, indent=2)
+
+    def load(self):
+        """global.json, testlar va natijalar indeksini o'qish (natijalarsiz)"""
+        data = empty_data()
+        if os.path.exists(self.global_path):
+            with open(self.global_path, 'r', encoding='utf-8') as f:
+                data.update(json.load(f))
+        for file_name in sorted(os.listdir(self.tests_dir)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(self.tests_dir, file_name), 'r', encoding='utf-8') as f:
+                    data['tests'][file_name[:-len('.json')]] = json.load(f)
+
+        summaries = {}
+        for record in iter_journal(self.index_path):
+            if record['value'] is None:
+                summaries.pop(record['key'], None)
+            else:
+                summaries[record['key']] = record['value']
+        truncate_torn_tail(self.index_path)
+        data['user_results'] = ShardedResults(self, summaries)
+        self._shards.clear()
+        return data
+
+    def load_shard(self, test_id):
+        """Test natijalari shardini qaytarish (kerak bo'lsa diskdan o'qiladi)"""
+        shard = self._shards.get(test_id)
+        if shard is not None:
+            self._shards.move_to_end(test_id)
+            return shard
+
+        shard = {}
+        path = self._results_path(test_id)
+        for record in iter_journal(path):
+            shard[record['key']] = record['value']
+        truncate_torn_tail(path)
+        self._shards[test_id] = shard
+        self._evict()
+        return shard
+
+    def _evict(self):
+        with self._pinned_lock:
+            pinned = set(self._pinned)
+        # Oxirgi (hozir so'ralgan) shard hech qachon chiqarilmaydi
+        for test_id in list(self._shards)[:-1]:
+            if len(self._shards) <= self.cache_size:
+                break
+            if test_id not in pinned:
+                del self._shards[test_id]
+
+    def _unpin(self, test_ids):
+        with self._pinned_lock:
+            for test_id in test_ids:
+                self._pinned[test_id] -= 1
+                if not self._pinned[test_id]:
+                    del self._pinned[test_id]
+
+    # ===== Qator darajasidagi yozish =====
+
+    def save_user(self, data, user_key):
+        self._global_data = data
+
+    def save_settings(self, data):
+        self._global_data = data
+
+    def save_test(self, data, test_id):
+        self._dirty_tests[test_id] = data['tests'][test_id]
+        self._deleted_tests.discard(test_id)
+
+    def save_result(self, data, result_id):
+        result = data['user_results'][result_id]
+        test_id = result.get('test_id')
+        self._appends.setdefault(self._results_path(test_id), []).append(
+            _dumps({'key': result_id, 'value': result}) + '\n'
+        )
+        self._appends.setdefault(self.index_path, []).append(
+            _dumps({'key': result_id, 'value': result_summary(result)}) + '\n'
+        )
+        self._appended_tests.append(test_id)
+        with self._pinned_lock:
+            self._pinned[test_id] = self._pinned.get(test_id, 0) + 1
+
+    def delete_test(self, data, test_id, result_ids):
+        self._deleted_tests.add(test_id)
+        self._dirty_tests.pop(test_id, None)
+        self._appends.pop(self._results_path(test_id), None)
+        self._appends.setdefault(self.index_path, []).extend(
+            _dumps({'key': result_id, 'value': None}) + '\n' for result_id in result_ids
+        )
+        self._shards.pop(test_id, None)
+
+    def prepare_commit(self):
+        """Tayyorlangan o'zgarishlarni yozishga tayyorlash
+
+        Matnlar shu yerda (event loop ichida) tayyorlanadi, diskka yozish
+        qaytarilgan funksiyada. Yozadigan narsa bo'lmasa None qaytadi.
+        """
+        if not (self._appends or self._dirty_tests or self._deleted_tests
+                or self._global_data is not None):
+            return None
+        rewrites = {self._test_path(test_id): self._test_text(test)
+                    for test_id, test in self._dirty_tests.items()}
+        if self._global_data is not None:
+            rewrites[self.global_path] = self._global_text(self._global_data)
+        appends, self._appends = self._appends, {}
+        tests, self._appended_tests = self._appended_tests, []
+        removals = [path for test_id in self._deleted_tests
+                    for path in (self._test_path(test_id), self._results_path(test_id))]
+        self._dirty_tests = {}
+        self._deleted_tests = set()
+        self._global_data = None
+
+        def job():
+            try:
+                with self._write_lock:
+                    for path, text in rewrites.items():
+                        atomic_write_text(path, text)
+                    # Avval shardlar, keyin indeks - indeksdagi har bir natija shardda bor
+                    for path in sorted(appends, key=lambda p: p == self.index_path):
+                        append_lines(path, appends[path])
+                    # Fayllar indeksdan o'chirilgandan keyin
+                    for path in removals:
+                        if os.path.exists(path):
+                            os.remove(path)
+            finally:
+                self._unpin(tests)
+        return job
+
+    def save(self, data):
+        """Barcha shardlarni qayta yozish (migratsiya yoki to'liq saqlash)"""
+        by_test = {}
+        index_lines = []
+        for result_id, result in data.get('user_results', {}).items():
+            by_test.setdefault(result.get('test_id'), []).append(
+                _dumps({'key': result_id, 'value': result}) + '\n'
+            )
+            index_lines.append(_dumps({'key': result_id, 'value': result_summary(result)}) + '\n')
+
+        expected = {f"{test_id}.json" for test_id in data.get('tests', {})}
+        expected.update(f"{test_id}.results.jsonl" for test_id in by_test)
+        with self._write_lock:
+            atomic_write_text(self.global_path, self._global_text(data))
+            for test_id, test in data.get('tests', {}).items():
+                atomic_write_text(self._test_path(test_id), self._test_text(test))
+            for test_id, lines in by_test.items():
+                atomic_write_text(self._results_path(test_id), ''.join(lines))
+            atomic_write_text(self.index_path, ''.join(index_lines))
+            # Ma'lumotlarda yo'q testlar fayllarini o'chirish
+            for file_name in os.listdir(self.tests_dir):
+                if file_name not in expected and file_name.endswith(('.json', '.results.jsonl')):
+                    os.remove(os.path.join(self.tests_dir, file_name))
+        self._appends = {}
+        self._dirty_tests = {}
+        self._deleted_tests = set()
+        self._global_data = None
+        self._shards.clear()
+
+    def close(self):
+        job = self.prepare_commit()
+        if job:
+            job()
+
+
+class SqliteStorage:
+    """SQLite backend (WAL rejimi)
+
+    Jadvallar:
+    - users        - foydalanuvchilar
+    - tests        - testlar (savollarsiz)
+    - questions    - test savollari (test_id, idx)
+    - results      - foydalanuvchi natijalari (savollar tafsilotisiz)
+    - result_items - har bir savol bo'yicha natija (result_id, idx), faqat
+                     eski formatdagi natijalar uchun - ixcham natijalarda
+                     javoblar va belgilar body ichida
+    - meta         - admins, mandatory_channels va boshqa umumiy kalitlar
+
+    Asosiy ustunlar so'rovlar uchun alohida saqlanadi, yozuvning to'liq
+    mazmuni esa 'body' ustunida JSON ko'rinishida turadi - shuning uchun
+    load() aynan saqlangan dict larni qaytaradi.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_key TEXT PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            body TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tests (
+            test_id TEXT PRIMARY KEY,
+            name TEXT,
+            created_by INTEGER,
+            created_at TEXT,
+            finalized INTEGER NOT NULL DEFAULT 0,
+            body TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS questions (
+            test_id TEXT NOT NULL REFERENCES tests(test_id) ON DELETE CASCADE,
+            idx INTEGER NOT NULL,
+            type TEXT,
+            body TEXT NOT NULL,
+            PRIMARY KEY (test_id, idx)
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            result_id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            test_id TEXT,
+            correct INTEGER,
+            total INTEGER,
+            percentage REAL,
+            completed_at TEXT,
+            body TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_test ON results(test_id);
+        CREATE INDEX IF NOT EXISTS idx_results_user ON results(user_id);
+        CREATE TABLE IF NOT EXISTS result_items (
+            result_id TEXT NOT NULL REFERENCES results(result_id) ON DELETE CASCADE,
+            idx INTEGER NOT NULL,
+            is_correct INTEGER NOT NULL DEFAULT 0,
+            body TEXT NOT NULL,
+            PRIMARY KEY (result_id, idx)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def load(self):
+        """Barcha jadvallarni o'qib, data.json bilan bir xil dict yaratish"""
+        data = empty_data()
+        for key, value in self.conn.execute("SELECT key, value FROM meta"):
+            data[key] = json.loads(value)
+
+        for user_key, body in self.conn.execute("SELECT user_key, body FROM users"):
+            data['users'][user_key] = json.loads(body)
+
+        for test_id, body in self.conn.execute("SELECT test_id, body FROM tests"):
+            test = json.loads(body)
+            test['questions'] = []
+            data['tests'][test_id] = test
+        for test_id, body in self.conn.execute(
+            "SELECT test_id, body FROM questions ORDER BY test_id, idx"
+        ):
+            if test_id in data['tests']:
+                data['tests'][test_id]['questions'].append(json.loads(body))
+
+        for result_id, body in self.conn.execute("SELECT result_id, body FROM results"):
+            result = json.loads(body)
+            if 'correct_bits' not in result:
+                # Eski format - savollar tafsiloti result_items jadvalida
+                result['results'] = []
+            data['user_results'][result_id] = result
+        for result_id, body in self.conn.execute(
+            "SELECT result_id, body FROM result_items ORDER BY result_id, idx"
+        ):
+            if result_id in data['user_results']:
+                data['user_results'][result_id].setdefault('results', []).append(json.loads(body))
+
+        return data
+
+    # ===== Qator darajasidagi yozish =====
+
+    def _write_user(self, user_key, user_info):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO users (user_key, first_name, last_name, body) VALUES (?, ?, ?, ?)",
+            (user_key, user_info.get('first_name'), user_info.get('last_name'), _dumps(user_info))
+        )
+
+    def _write_test(self, test_id, test):
+        body = {k: v for k, v in test.items() if k != 'questions'}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tests (test_id, name, created_by, created_at, finalized, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (test_id, test.get('name'), test.get('created_by'), test.get('created_at'),
+             1 if test.get('finalized') else 0, _dumps(body))
+        )
+        self.conn.execute("DELETE FROM questions WHERE test_id = ?", (test_id,))
+        self.conn.executemany(
+            "INSERT INTO questions (test_id, idx, type, body) VALUES (?, ?, ?, ?)",
+            [(test_id, idx, q.get('type'), _dumps(q)) for idx, q in enumerate(test.get('questions', []))]
+        )
+
+    def _write_result(self, result_id, result):
+        body = {k: v for k, v in result.items() if k != 'results'}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results "
+            "(result_id, user_id, test_id, correct, total, percentage, completed_at, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (result_id, result.get('user_id'), result.get('test_id'), result.get('correct'),
+             result.get('total'), result.get('percentage'), result.get('completed_at'), _dumps(body))
+        )
+        self.conn.execute("DELETE FROM result_items WHERE result_id = ?", (result_id,))
+        self.conn.executemany(
+            "INSERT INTO result_items (result_id, idx, is_correct, body) VALUES (?, ?, ?, ?)",
+            [(result_id, idx, 1 if item.get('is_correct') else 0, _dumps(item))
+             for idx, item in enumerate(result.get('results', []))]
+        )
+
+    def _write_settings(self, data):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, _dumps(value)) for key, value in data.items() if key not in _COLLECTION_KEYS]
+        )
+
+    # Qator darajasidagi metodlar ochiq tranzaksiyaga yozadi, commit esa
+    # prepare_commit() da - bir nechta o'zgarish bitta commit bilan saqlanadi
+    def save_user(self, data, user_key):
+        """Bitta foydalanuvchini saqlash"""
+        self._write_user(user_key, data['users'][user_key])
+
+    def save_test(self, data, test_id):
+        """Bitta testni (savollari bilan) saqlash"""
+        self._write_test(test_id, data['tests'][test_id])
+
+    def save_result(self, data, result_id):
+        """Bitta natijani (savollar tafsiloti bilan) saqlash"""
+        self._write_result(result_id, data['user_results'][result_id])
+
+    def save_settings(self, data):
+        """Adminlar, kanallar va boshqa umumiy kalitlarni saqlash"""
+        self._write_settings(data)
+
+    def delete_test(self, data, test_id, result_ids):
+        """Testni va uning natijalarini o'chirish (savollar va result_items - CASCADE)"""
+        self.conn.execute("DELETE FROM results WHERE test_id = ?", (test_id,))
+        self.conn.execute("DELETE FROM tests WHERE test_id = ?", (test_id,))
+
+    def prepare_commit(self):
+        """Ochiq tranzaksiyani commit qilish
+
+        WAL + synchronous=NORMAL rejimida commit arzon, shuning uchun u
+        shu yerning o'zida bajariladi va alohida oqim kerak emas (None).
+        """
+        if self.conn.in_transaction:
+            self.conn.commit()
+        return None
+
+    def save(self, data):
+        """Butun ma'lumotlarni bitta tranzaksiyada qayta yozish"""
+        with self.conn:
+            for table in ('result_items', 'results', 'questions', 'tests', 'users', 'meta'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self._write_settings(data)
+            for user_key, user_info in data.get('users', {}).items():
+                self._write_user(user_key, user_info)
+            for test_id, test in data.get('tests', {}).items():
+                self._write_test(test_id, test)
+            for result_id, result in data.get('user_results', {}).items():
+                self._write_result(result_id, result)
+
+    def close(self):
+        self.prepare_commit()
+        self.conn.close()
+
+
+def migrate_json_to_shards(json_path, directory):
+    """data.json dagi barcha ma'lumotlarni test shardlariga ko'chirish (bir martalik)
+
+    Natijalar shu yerda ixcham formatga o'tkaziladi (result_codec.py).
+
+    Returns:
+        dict: ko'chirilgan yozuvlar soni
+    """
+    from result_codec import compact_all_results
+
+    data = JsonStorage(json_path).load()
+    compact_all_results(data)
+    ShardedStorage(directory).save(data)
+    counts = {
+        'users': len(data.get('users', {})),
+        'tests': len(data.get('tests', {})),
+        'user_results': len(data.get('user_results', {}))
+    }
+    logger.info(f"data.json shardlarga ko'chirildi: {counts}")
+    return counts
+
+
+def migrate_json_to_sqlite(json_path, sqlite_path):
+    """data.json dagi barcha ma'lumotlarni SQLite bazaga ko'chirish (bir martalik)
+
+    Returns:
+        dict: ko'chirilgan yozuvlar soni
+    """
+    data = JsonStorage(json_path).load()
+    storage = SqliteStorage(sqlite_path)
+    try:
+        storage.save(data)
+    finally:
+        storage.close()
+    counts = {
+        'users': len(data.get('users', {})),
+        'tests': len(data.get('tests', {})),
+        'user_results': len(data.get('user_results', {}))
+    }
+    logger.info(f"data.json SQLite ga ko'chirildi: {counts}")
+    return counts
+
+
+if __name__ == '__main__':
+    # Foydalanish: python3 storage.py data.json data.db
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        print("Foydalanish: python3 storage.py <data.json> <data.db>")
+        sys.exit(1)
+    print(migrate_json_to_sqlite(sys.argv[1], sys.argv[2]))
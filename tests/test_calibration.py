@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kalibrovka davomida javoblar kaliti tahrirlanishi
+
+Fondagi kalibrovka eski kalit bo'yicha qurilgan nusxa ustida ishlayotganda
+kalit o'zgarsa, oxirida testda yangi kalit bo'yicha kalibrovka turishi kerak.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modullar config.py ni import qiladi - vaqtinchalik katalogda test uchun config
+_TMP_DIR = tempfile.mkdtemp(prefix='test_calibration_')
+with open(os.path.join(_TMP_DIR, 'config.py'), 'w', encoding='utf-8') as f:
+    f.write(f'''BOT_TOKEN = "123456:TEST"
+BOSS_ID = 1
+DATA_FILE = {os.path.join(_TMP_DIR, 'data.json')!r}
+WRITE_BEHIND_DELAY = 0
+CALIBRATION_MIN_RESULTS = 10
+''')
+sys.path[:0] = [_TMP_DIR, REPO_DIR]
+
+TEST_ID = 'test_calibration'
+N_STUDENTS = 60
+
+
+def build_questions():
+    """Standart tuzilish: 35 ko'p tanlov, 5 yozma, 3 masalaviy savol"""
+    questions = [{'question': f"Savol {idx + 1}", 'options': list('abcd'), 'correct': 'a'} for idx in range(35)]
+    questions += [{'question': f"Savol {36 + idx}", 'type': 'text_answer', 'options': [], 'correct': 'x'}
+                  for idx in range(5)]
+    questions += [{'question': f"Savol {41 + idx}", 'type': 'problem', 'options': [],
+                   'correct': ['1'] * count, 'sub_question_count': count}
+                  for idx, count in enumerate((4, 3, 5))]
+    return questions
+
+
+def build_answers(questions, rng):
+    """Qobiliyatga bog'liq tasodifiy javoblar (ko'p tanlovda noto'g'ri javob - 'b')"""
+    ability = rng.random()
+    answers = []
+    for question in questions:
+        q_type = question.get('type')
+        if q_type == 'problem':
+            answers.append(','.join('1' if rng.random() < ability else '0'
+                                    for _ in range(question['sub_question_count'])))
+        elif q_type == 'text_answer':
+            answers.append('x' if rng.random() < ability else 'y')
+        else:
+            answers.append('a' if rng.random() < ability else 'b')
+    return answers
+
+
+class CalibrationKeyEditTest(unittest.TestCase):
+
+    def test_key_edit_during_calibration(self):
+        asyncio.run(self.run_key_edit())
+
+    async def run_key_edit(self):
+        import calibration
+        from database import load_data, transaction, save_test, add_result
+        from scoring import get_scoring_plan, rescore_test
+        from utils import build_test_snapshot
+
+        rng = random.Random(5)
+        await save_test(TEST_ID, {'name': 'Kalibrovka', 'questions': build_questions(), 'created_by': 1})
+        data = load_data()
+        questions = data['tests'][TEST_ID]['questions']
+        for idx in range(N_STUDENTS):
+            answers = build_answers(questions, rng)
+            correct_bits, correct = get_scoring_plan(TEST_ID, data).score(answers)
+            await add_result(f"result_{idx}", {
+                'user_id': 1000 + idx, 'test_id': TEST_ID, 'test_name': 'Kalibrovka',
+                'correct': correct, 'total': len(questions),
+                'percentage': correct / len(questions) * 100,
+                'answers': answers, 'correct_bits': correct_bits,
+                'completed_at': '2024-01-01T10:00:00',
+            })
+        old_calibration = calibration.build_calibration(TEST_ID, build_test_snapshot(TEST_ID, load_data()))
+
+        # Kalibrovka ishi eski nusxani olgach to'xtab turadi
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def gated_run_job(func, *args):
+            started.set()
+            await release.wait()
+            return await asyncio.to_thread(func, *args)
+
+        with mock.patch('jobs.run_job', gated_run_job):
+            calibration.schedule_calibration(TEST_ID)
+            await asyncio.wait_for(started.wait(), 10)
+
+            # Kalibrovka davomida kalitni tahrirlash: 1-15 savollar javobi 'b'
+            async with transaction() as data:
+                test = data['tests'][TEST_ID]
+                for question in test['questions'][:15]:
+                    question['correct'] = 'b'
+                durable = save_test(TEST_ID, test)
+            await durable
+            await rescore_test(TEST_ID)
+            calibration.schedule_calibration(TEST_ID, force=True)
+
+            release.set()
+            for _ in range(200):
+                if not calibration._running:
+                    break
+                await asyncio.gather(*calibration._running.values(), return_exceptions=True)
+            self.assertFalse(calibration._running)
+
+        saved = load_data()['tests'][TEST_ID]['calibration']
+        expected = calibration.build_calibration(TEST_ID, build_test_snapshot(TEST_ID, load_data()))
+        # Kutilgan kalibrovka saqlangan qiyinliklardan boshlanadi (warm start) - kichik farq mumkin
+        for question_range, calibrated in expected['ranges'].items():
+            for got, want in zip(saved['ranges'][question_range]['scores'], calibrated['scores']):
+                self.assertAlmostEqual(got, want, places=2)
+        for got, want in zip(saved['ranges']['1-40']['beta'], expected['ranges']['1-40']['beta']):
+            self.assertAlmostEqual(got, want, places=3)
+        self.assertNotEqual(saved['ranges']['1-40']['beta'], old_calibration['ranges']['1-40']['beta'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,45 +2,105 @@
 # -*- coding: utf-8 -*-
 """
 Yordamchi funksiyalar
+
+numpy, scipy, openpyxl va pdfkit modul darajasida import qilinmaydi -
+ular faqat hisobot yoki tahlil funksiyasi birinchi marta chaqirilganda
+yuklanadi. Bot qayta ishga tushganda polling bu kutubxonalarni kutmasdan
+boshlanadi (warm_up() ularni fonda oldindan yuklab qo'yishi mumkin).
 """
 
+import asyncio
 import logging
 import os
 import re
 import shutil
 import textwrap
-import pdfkit
-import numpy as np
+import time
+from collections import OrderedDict
 from io import BytesIO
 from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
-from database import load_data
-from openpyxl import Workbook, load_workbook
-from scipy.special import expit
+import config
+from database import load_data, get_test_results, results_version
+from result_codec import response_layout, is_compact, encode_items, result_items
 
 logger = logging.getLogger(__name__)
 
+# Hisobotlar (Excel) xotirada tayyorlanib to'g'ridan-to'g'ri Telegramga yuboriladi;
+# True bo'lsa nusxasi matrices/ va final_results/ kataloglariga ham yoziladi
+SAVE_REPORTS = getattr(config, 'SAVE_REPORTS', False)
+# Diskka yozilganda har bir test va hisobot turi uchun saqlanadigan eng yangi fayllar
+# soni (eski MATRIX_RETENTION sozlamasi ham qabul qilinadi)
+REPORT_RETENTION = getattr(config, 'REPORT_RETENTION', getattr(config, 'MATRIX_RETENTION', 3))
+# Xotirada saqlanadigan tayyor hisobotlar (fayl baytlari va Telegram file_id) soni
+REPORT_CACHE_SIZE = getattr(config, 'REPORT_CACHE_SIZE', 64)
+# Obuna tekshiruvi natijasi keshda turadigan vaqt (soniya): obuna bo'lgan / bo'lmagan
+SUBSCRIPTION_CACHE_TTL = getattr(config, 'SUBSCRIPTION_CACHE_TTL', 300)
+SUBSCRIPTION_NEGATIVE_TTL = getattr(config, 'SUBSCRIPTION_NEGATIVE_TTL', 15)
+
+# (user_id, kanal) -> (amal qilish muddati, obuna bo'lganmi)
+_subscription_cache = {}
+# test_id -> (results_version, 0-1 javoblar matritsasi)
+_tensor_cache = {}
+# (test_id, hisobot turi) -> (report_version, {'content', 'file_id'}), eng oxirgi ishlatilgani oxirida
+_report_cache = OrderedDict()
+# (test_id, question_range) -> oxirgi Rasch tahlilidagi savollar qiyinligi (warm start uchun)
+_rasch_difficulties = {}
+
+# Rasch modelida theta va beta uchun regulyarizatsiya (ridge) koeffitsienti
+RASCH_REG_LAMBDA = 0.05
+
+
+async def _is_channel_member(bot, channel, user_id):
+    """Foydalanuvchi bitta kanalga obuna ekanligini tekshirish (kesh bilan)"""
+    key = (user_id, channel)
+    cached = _subscription_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+
+    try:
+        # Kanal username yoki ID bo'lishi mumkin
+        channel_id = channel if channel.startswith('@') or channel.startswith('-') else f"@{channel}"
+        member = await bot.get_chat_member(channel_id, user_id)
+    except Exception as e:
+        logger.error(f"Kanal tekshiruvi xatosi: {e} - Kanal: {channel}")
+        # Agar kanal topilmasa, xavfsizlik uchun False qaytaramiz (keshlanmaydi)
+        return False
+
+    is_member = member.status not in ['left', 'kicked']
+    ttl = SUBSCRIPTION_CACHE_TTL if is_member else SUBSCRIPTION_NEGATIVE_TTL
+    if ttl > 0:
+        _subscription_cache[key] = (now + ttl, is_member)
+    return is_member
+
+
+def invalidate_subscription_cache(channel=None):
+    """Obuna keshini tozalash (channel berilsa - faqat shu kanal uchun)"""
+    if channel is None:
+        _subscription_cache.clear()
+        return
+    for key in [k for k in _subscription_cache if k[1] == channel]:
+        del _subscription_cache[key]
+
 
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Majburiy kanallarga obuna tekshiruvi"""
+    """Majburiy kanallarga obuna tekshiruvi
+
+    Kanallar parallel tekshiriladi, natija (user_id, kanal) bo'yicha
+    keshlanadi.
+    """
     data = load_data()
     if not data["mandatory_channels"]:
         return True
-    
+
     user_id = update.effective_user.id
-    for channel in data["mandatory_channels"]:
-        try:
-            # Kanal username yoki ID bo'lishi mumkin
-            channel_id = channel if channel.startswith('@') or channel.startswith('-') else f"@{channel}"
-            member = await context.bot.get_chat_member(channel_id, user_id)
-            if member.status in ['left', 'kicked']:
-                return False
-        except Exception as e:
-            logger.error(f"Kanal tekshiruvi xatosi: {e} - Kanal: {channel}")
-            # Agar kanal topilmasa, xavfsizlik uchun False qaytaramiz
-            return False
-    return True
+    results = await asyncio.gather(*(
+        _is_channel_member(context.bot, channel, user_id)
+        for channel in data["mandatory_channels"]
+    ))
+    return all(results)
 
 
 def generate_pdf(result_id, result_data):
@@ -61,6 +121,7 @@ def generate_pdf(result_id, result_data):
         # Avval pdfkit orqali urinib ko'ramiz (wkhtmltopdf talab qiladi)
         if html_content:
             try:
+                import pdfkit
                 config = None
                 wkhtml_path = shutil.which("wkhtmltopdf")
                 if wkhtml_path:
@@ -97,6 +158,17 @@ def generate_pdf(result_id, result_data):
         return None
 
 
+def _result_items_for_report(result_data):
+    """Hisobot uchun savollar tafsiloti (ixcham natija test savollaridan tiklanadi)"""
+    if not is_compact(result_data):
+        return result_data.get('results', [])
+    questions = result_data.get('questions')
+    if questions is None:
+        test = load_data().get('tests', {}).get(result_data.get('test_id'), {})
+        questions = test.get('questions', [])
+    return result_items(result_data, questions)
+
+
 def _build_default_result_html(result_data):
     """Oddiy foydalanuvchi natijasi uchun HTML yaratish"""
     try:
@@ -126,7 +198,7 @@ def _build_default_result_html(result_data):
             <h2>Javoblar tafsiloti:</h2>
         """
         
-        for idx, res in enumerate(result_data.get('results', []), 1):
+        for idx, res in enumerate(_result_items_for_report(result_data), 1):
             status = "✅ To'g'ri" if res.get('is_correct') else "❌ Noto'g'ri"
             status_class = "correct" if res.get('is_correct') else "incorrect"
             html_content += f"""
@@ -165,7 +237,7 @@ def _build_fallback_lines_from_result(result_data):
             lines.append(f"Foiz: {percentage:.1f}%")
         lines.append("")
         lines.append("Javoblar tafsiloti:")
-        for idx, res in enumerate(result_data.get('results', []), 1):
+        for idx, res in enumerate(_result_items_for_report(result_data), 1):
             status = "To'g'ri" if res.get('is_correct') else "Noto'g'ri"
             lines.append(f"Savol {idx}: {res.get('question', '')}")
             lines.append(
@@ -239,269 +311,852 @@ def _generate_pdf_with_reportlab(title, lines):
         return None
 
 
+def warm_up():
+    """Og'ir kutubxonalarni oldindan yuklash (bot ishga tushgandan keyin fonda)"""
+    import importlib
+
+    for name in ('numpy', 'scipy.special', 'openpyxl', 'openpyxl.styles'):
+        importlib.import_module(name)
+
+
+def cleanup_old_files(directory, prefix, keep):
+    """Katalogdagi prefix bilan boshlanadigan fayllardan eng yangi keep tasini qoldirish
+
+    Fayl nomlari vaqt belgisi (YYYYmmddHHMMSS) bilan tugagani uchun nom
+    bo'yicha tartiblash yaratilish vaqti bo'yicha tartiblash bilan bir xil.
+    """
+    try:
+        files = sorted(f for f in os.listdir(directory) if f.startswith(prefix))
+        for file_name in files[:max(len(files) - keep, 0)]:
+            os.remove(os.path.join(directory, file_name))
+    except OSError as e:
+        logger.error(f"Eski fayllarni o'chirish xatosi: {e} - {directory}/{prefix}*")
+
+
+def build_response_tensor(test_id, data):
+    """Test natijalaridan 0-1 javoblar matritsasini bir o'tishda yaratish
+
+    Returns:
+        dict yoki None:
+        - user_ids: np.int64 massiv (qatorlar - natijalar qo'shilish tartibida)
+        - matrix: np.uint8 (talabgorlar x ustunlar), faqat o'qish uchun
+        - labels: ustun nomlari (Q1 ... Q40, 41.1, 41.2, ...)
+        - item_question: har bir ustun qaysi savolga tegishli (0 dan boshlab)
+        - question_types: har bir savol turi ('choice', 'text_answer', 'problem')
+    """
+    import numpy as np
+
+    test_results = get_test_results(test_id, data)
+    if not test_results:
+        return None
+
+    test = data.get('tests', {}).get(test_id)
+    if test and test.get('questions'):
+        questions = test['questions']
+    elif not is_compact(test_results[0]):
+        # Test topilmasa, savollar tuzilishi (eski formatdagi) natijaning o'zidan olinadi
+        questions = test_results[0]['results']
+    else:
+        return None
+    labels, _, sub_counts = response_layout(questions)
+    n_items = len(labels)
+
+    # Har bir natija uchun '0'/'1' satri (ixcham natijalarda tayyor turadi)
+    rows = []
+    for result in test_results:
+        bits = result['correct_bits'] if is_compact(result) else encode_items(questions, result['results'])[1]
+        if len(bits) != n_items:
+            # Natijadan keyin test tuzilishi o'zgargan - yetishmagan ustunlar 0
+            bits = bits[:n_items].ljust(n_items, '0')
+        rows.append(bits)
+    cells = bytearray(''.join(rows).encode('ascii'))
+    matrix = np.frombuffer(cells, dtype=np.uint8).reshape(len(test_results), n_items)
+    matrix -= ord('0')
+    # Kesh bir nechta hisobot orasida umumiy - tasodifan o'zgartirilmasin
+    matrix.flags.writeable = False
+    item_question = np.repeat(np.arange(len(questions)), [max(c, 1) for c in sub_counts])
+    return {
+        'user_ids': np.array([r['user_id'] for r in test_results], dtype=np.int64),
+        'matrix': matrix,
+        'labels': labels,
+        'item_question': item_question,
+        'question_types': [q.get('type', 'choice') for q in questions]
+    }
+
+
+def get_response_tensor(test_id, data=None):
+    """Test uchun 0-1 javoblar matritsasi (keshdan)
+
+    Kesh test versiyasi (database.results_version) bo'yicha tekshiriladi -
+    yangi natija qo'shilsa yoki test o'zgarsa matritsa qayta quriladi.
+    build_test_snapshot() nusxasida tayyor matritsa bo'lsa, o'shandan
+    foydalaniladi.
+    """
+    if data is not None and test_id in data.get('response_tensors', {}):
+        return data['response_tensors'][test_id]
+
+    version = results_version(test_id, data)
+    if version is None:
+        # Keshdagi ma'lumot emas (nusxa) - keshlamasdan quramiz
+        return build_response_tensor(test_id, data)
+
+    cached = _tensor_cache.get(test_id)
+    if cached and cached[0] == version:
+        return cached[1]
+    tensor = build_response_tensor(test_id, data if data is not None else load_data())
+    _tensor_cache[test_id] = (version, tensor)
+    return tensor
+
+
+def report_version(test_id, data=None):
+    """Hisobotlar keshi uchun versiya (cached_report) yoki None (keshlab bo'lmaydi)
+
+    database.results_version yangi natija, qayta baholash va javoblar kaliti
+    tahririda oshadi. Talabgorlar ismi foydalanuvchi ma'lumotida turadi va
+    unga kirmaydi - shuning uchun ismlar xeshi ham qo'shiladi: talabgor
+    ismini o'zgartirsa eski matrix (file_id) qayta yuborilmaydi.
+    """
+    version = results_version(test_id, data)
+    if version is None:
+        return None
+    tensor = get_response_tensor(test_id, data)
+    if tensor is None:
+        return version
+    names = _participant_names(tensor['user_ids'], data if data is not None else load_data())
+    return version + (hash(tuple(names)),)
+
+
+def cached_report(test_id, kind, version):
+    """Tayyor hisobot (keshdan) yoki None
+
+    Kalit - (test_id, hisobot turi) va report_version(): yangi natija
+    qo'shilsa, natijalar qayta baholansa, javoblar kaliti tahrirlansa yoki
+    talabgor ismi o'zgarsa versiya o'zgaradi va eski hisobot ishlatilmaydi.
+
+    Returns:
+        dict yoki None: {'content': baytlar (yoki matn), 'file_id': Telegram file_id yoki None}
+    """
+    cached = _report_cache.get((test_id, kind))
+    if version is None or cached is None or cached[0] != version:
+        return None
+    _report_cache.move_to_end((test_id, kind))
+    return cached[1]
+
+
+def store_report(test_id, kind, version, content):
+    """Yangi yaratilgan hisobotni keshga qo'yish (version None bo'lsa keshlanmaydi)
+
+    Returns:
+        dict: hisobot yozuvi - yuborilgandan keyin unga Telegram file_id yoziladi
+    """
+    report = {'content': content, 'file_id': None}
+    if version is None or not REPORT_CACHE_SIZE:
+        return report
+    _report_cache[(test_id, kind)] = (version, report)
+    _report_cache.move_to_end((test_id, kind))
+    while len(_report_cache) > REPORT_CACHE_SIZE:
+        _report_cache.popitem(last=False)
+    return report
+
+
+def response_columns(tensor, first, last, types=None):
+    """first..last savollarga (1 dan boshlab, ikkalasi ham kiradi) tegishli ustunlar indekslari
+
+    types berilsa, faqat shu turdagi savollar ustunlari olinadi.
+    """
+    import numpy as np
+
+    item_question = tensor['item_question']
+    mask = (item_question >= first - 1) & (item_question <= last - 1)
+    if types is not None:
+        allowed = np.array([t in types for t in tensor['question_types']], dtype=bool)
+        mask &= allowed[item_question]
+    return np.flatnonzero(mask)
+
+
+def _participant_names(user_ids, data):
+    """Matrix qatorlari uchun talabgorlar ism-familyasi"""
+    users = data.get('users', {})
+    names = []
+    for user_id in user_ids:
+        user_info = users.get(str(user_id), {})
+        first_name = user_info.get('first_name', '').strip()
+        last_name = user_info.get('last_name', '').strip()
+        full_name = f"{first_name} {last_name}".strip()
+        # Agar ism-familya bo'lmasa, user_id ni ko'rsatish
+        names.append(full_name or str(user_id))
+    return names
+
+
+def _excel_workbook():
+    """Hisobotlar uchun write-only (oqimli) Excel kitobi
+
+    Qatorlar xotirada to'planmasdan darhol faylga yoziladi. Formatlash har
+    bir katak uchun alohida Font/Alignment obyekti emas, kitobda bir marta
+    ro'yxatdan o'tkazilgan nomlangan uslublar (_styled_row) bilan beriladi.
+    Ustunlar kengligi birinchi qatordan oldin berilishi kerak.
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import NamedStyle, Font, Alignment, PatternFill
+
+    wb = Workbook(write_only=True)
+    center = Alignment(horizontal='center', vertical='center')
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    for style in (
+        NamedStyle('report_header', font=Font(bold=True, color="FFFFFF"), fill=header_fill, alignment=center),
+        NamedStyle('matrix_header', font=Font(bold=True), alignment=Alignment(horizontal='center')),
+        NamedStyle('section_title', font=Font(bold=True)),
+        NamedStyle('centered', alignment=center),
+    ):
+        wb.add_named_style(style)
+    return wb
+
+
+def _styled_row(ws, values, style):
+    """Write-only varaq uchun qator - barcha kataklar bitta nomlangan uslub bilan"""
+    from openpyxl.cell import WriteOnlyCell
+
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value)
+        cell.style = style
+        cells.append(cell)
+    return cells
+
+
+def _workbook_buffer(wb, directory, prefix):
+    """Kitobni xotiradagi buferga yozish (Telegramga to'g'ridan-to'g'ri yuborish uchun)
+
+    SAVE_REPORTS yoqilgan bo'lsa nusxasi directory/{prefix}{vaqt}.xlsx ga
+    ham yoziladi va shu prefix bilan eng yangi REPORT_RETENTION ta fayl
+    qoldiriladi. Diskka yozish xatosi hisobotni to'xtatmaydi.
+    """
+    buffer = BytesIO()
+    wb.save(buffer)
+    if SAVE_REPORTS:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            with open(os.path.join(directory, f"{prefix}{timestamp}.xlsx"), 'wb') as f:
+                f.write(buffer.getvalue())
+            cleanup_old_files(directory, prefix, REPORT_RETENTION)
+        except OSError as e:
+            logger.error(f"Hisobotni diskka saqlash xatosi: {e} - {directory}/{prefix}*")
+    buffer.seek(0)
+    return buffer
+
+
+def _write_matrix_excel(sheet_title, header, names, rows, prefix):
+    """0-1 matrixni Excel ga yozish (qalin header bilan, oqimli) - BytesIO"""
+    wb = _excel_workbook()
+    ws = wb.create_sheet(sheet_title)
+    ws.append(_styled_row(ws, header, 'matrix_header'))
+    for name, row in zip(names, rows):
+        ws.append([name] + row)
+    return _workbook_buffer(wb, "matrices", prefix)
+
+
 def generate_response_matrix(test_id, data):
     """0-1 matrix yaratish Excel formatida - ikkita alohida fayl
     
-    Ikkita alohida Excel fayl yaratadi:
-    1. matrix_1-40_*.xlsx - Questions 1-40 uchun
-    2. matrix_41-43_*.xlsx - Questions 41-43 uchun
+    Ikkita alohida Excel fayl (xotirada) yaratadi:
+    1. Questions 1-40 uchun
+    2. Questions 41-43 uchun
+    SAVE_REPORTS bo'lsa matrices/matrix_1-40_*.xlsx va matrix_41-43_*.xlsx
+    sifatida diskka ham yoziladi.
     
     Returns:
-        tuple: (file_path_1_40, file_path_41_43, matrix_text) yoki (None, None, None)
+        tuple: (BytesIO 1-40, BytesIO 41-43, matrix_text) yoki (None, None, None)
     """
     try:
-        # Test natijalarini to'plash
-        test_results = [
-            r for r_id, r in data.get('user_results', {}).items()
-            if r.get('test_id') == test_id
-        ]
-        
-        if not test_results:
+        tensor = get_response_tensor(test_id, data)
+        if tensor is None:
             return None, None, None
-        
-        from openpyxl.styles import Font, Alignment
-        
-        matrix_dir = "matrices"
-        os.makedirs(matrix_dir, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        
+
+        matrix = tensor['matrix']
+        labels = tensor['labels']
+        names = _participant_names(tensor['user_ids'], data)
+
         # ===== 1. Questions 1-40 uchun alohida Excel fayl =====
-        wb_main = Workbook()
-        
-        # Standart sheetni o'chirish
-        if 'Sheet' in wb_main.sheetnames:
-            wb_main.remove(wb_main['Sheet'])
-        
-        ws_main = wb_main.create_sheet("Questions 1-40")
-        
-        # Header: Talabgor, Q1, Q2, ..., Q40
-        main_header = ['Talabgor'] + [f'Q{i+1}' for i in range(40)]
-        ws_main.append(main_header)
-        
-        # Header qatorini qalinlashtirish
-        for cell in ws_main[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Har bir foydalanuvchi uchun qator (1-40 savollar)
-        for result in test_results:
-            user_id = result['user_id']
-            # Foydalanuvchi ism-familyasini olish
-            user_info = data.get('users', {}).get(str(user_id), {})
-            first_name = user_info.get('first_name', '').strip()
-            last_name = user_info.get('last_name', '').strip()
-            full_name = f"{first_name} {last_name}".strip()
-            # Agar ism-familya bo'lmasa, user_id ni ko'rsatish
-            if not full_name:
-                full_name = str(user_id)
-            row = [full_name]
-            
-            # Birinchi 40 ta savol (0-39 indices)
-            for i, res in enumerate(result['results'][:40]):
-                value = 1 if res.get('is_correct') else 0
-                row.append(value)
-            
-            ws_main.append(row)
-        
-        # Birinchi faylni saqlash
-        file_path_1_40 = os.path.join(matrix_dir, f"matrix_1-40_{test_id}_{timestamp}.xlsx")
-        wb_main.save(file_path_1_40)
-        
+        main_cols = response_columns(tensor, 1, 40)
+        main_header = ['Talabgor'] + [labels[c] for c in main_cols]
+        main_rows = matrix[:, main_cols].tolist()
+        file_1_40 = _write_matrix_excel("Questions 1-40", main_header, names, main_rows,
+                                        f"matrix_1-40_{test_id}_")
+
         # ===== 2. Questions 41-43 uchun alohida Excel fayl =====
-        # Har bir kichik savol uchun alohida ustun
-        wb_problem = Workbook()
-        
-        # Standart sheetni o'chirish
-        if 'Sheet' in wb_problem.sheetnames:
-            wb_problem.remove(wb_problem['Sheet'])
-        
-        ws_problem = wb_problem.create_sheet("Questions 41-43")
-        
-        # Header yaratish: Talabgor, 41.1, 41.2, ..., 43.n
-        problem_header = ['Talabgor']
-        
-        # Testdan masalaviy savollar strukturasini olish
-        test = data.get('tests', {}).get(test_id)
-        if test and test.get('questions'):
-            problem_questions = [q for q in test['questions'][40:43] if q.get('type') == 'problem']
-            
-            for q_idx, question in enumerate(problem_questions, start=41):
-                sub_count = question.get('sub_question_count', 0)
-                if sub_count > 0:
-                    # Har bir kichik savol uchun ustun
-                    for sub_idx in range(1, sub_count + 1):
-                        problem_header.append(f"{q_idx}.{sub_idx}")
-                else:
-                    # Eski format - faqat Q41, Q42, Q43
-                    problem_header.append(f"Q{q_idx}")
-        
-        ws_problem.append(problem_header)
-        
-        # Header qatorini qalinlashtirish
-        for cell in ws_problem[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Har bir foydalanuvchi uchun qator (41-43 savollar)
-        for result in test_results:
-            user_id = result['user_id']
-            
-            # Foydalanuvchi ism-familyasini olish
-            user_info = data.get('users', {}).get(str(user_id), {})
-            first_name = user_info.get('first_name', '').strip()
-            last_name = user_info.get('last_name', '').strip()
-            full_name = f"{first_name} {last_name}".strip()
-            # Agar ism-familya bo'lmasa, user_id ni ko'rsatish
-            if not full_name:
-                full_name = str(user_id)
-            row = [full_name]
-            
-            # 41-43 savollar uchun javoblar (indices 40-42)
-            problem_results = result['results'][40:43] if len(result['results']) > 40 else []
-            
-            for q_idx, res in enumerate(problem_results, start=41):
-                if res.get('type') == 'problem' and 'sub_results' in res:
-                    # Yangi format - har bir kichik javob uchun alohida ustun
-                    for sub in res['sub_results']:
-                        value = 1 if sub.get('is_correct') else 0
-                        row.append(value)
-                else:
-                    # Eski format - sub_results ni qayta yaratish
-                    # user_answer va correct_answer ni taqqoslash
-                    if test and len(test.get('questions', [])) > 40:
-                        original_q_idx = 40 + (q_idx - 41)
-                        question = test['questions'][original_q_idx]
-                        
-                        # Testdan to'g'ri javoblar ro'yxatini olish
-                        correct_answers = question.get('correct', [])
-                        
-                        # Foydalanuvchi javoblarini olish
-                        user_answer = res.get('user_answer', '')
-                        user_answers_list = [a.strip() for a in user_answer.split(',')] if user_answer else []
-                        
-                        # Har bir javobni taqqoslash
-                        for i, correct_ans in enumerate(correct_answers):
-                            if i < len(user_answers_list):
-                                user_ans = user_answers_list[i]
-                                is_sub_correct = user_ans.lower() == correct_ans.strip().lower()
-                                row.append(1 if is_sub_correct else 0)
-                            else:
-                                # Javob berilmagan
-                                row.append(0)
-                    else:
-                        # Test topilmasa, faqat umumiy natijani qo'shamiz
-                        value = 1 if res.get('is_correct') else 0
-                        row.append(value)
-            
-            ws_problem.append(row)
-        
-        # Ikkinchi faylni saqlash
-        file_path_41_43 = os.path.join(matrix_dir, f"matrix_41-43_{test_id}_{timestamp}.xlsx")
-        wb_problem.save(file_path_41_43)
+        # Har bir kichik savol uchun alohida ustun: Talabgor, 41.1, 41.2, ..., 43.n
+        problem_cols = response_columns(tensor, 41, 43)
+        problem_header = ['Talabgor'] + [labels[c] for c in problem_cols]
+        file_41_43 = _write_matrix_excel("Questions 41-43", problem_header, names,
+                                         matrix[:, problem_cols].tolist(), f"matrix_41-43_{test_id}_")
         
         # Matn formatini ham saqlash (1-40 savollar uchun)
-        matrix_lines = []
-        matrix_lines.append('\t'.join(main_header))
-        for result in test_results:
-            user_id = result['user_id']
-            # Foydalanuvchi ism-familyasini olish
-            user_info = data.get('users', {}).get(str(user_id), {})
-            first_name = user_info.get('first_name', '').strip()
-            last_name = user_info.get('last_name', '').strip()
-            full_name = f"{first_name} {last_name}".strip()
-            # Agar ism-familya bo'lmasa, user_id ni ko'rsatish
-            if not full_name:
-                full_name = str(user_id)
-            row = [full_name]
-            for i, res in enumerate(result['results'][:40]):
-                value = '1' if res.get('is_correct') else '0'
-                row.append(value)
-            matrix_lines.append('\t'.join(row))
+        matrix_lines = ['\t'.join(main_header)]
+        for name, row in zip(names, main_rows):
+            matrix_lines.append('\t'.join([name] + [str(v) for v in row]))
         matrix_text = '\n'.join(matrix_lines)
         
-        return file_path_1_40, file_path_41_43, matrix_text
+        return file_1_40, file_41_43, matrix_text
         
     except Exception as e:
         logger.error(f"Matrix yaratish xatosi: {e}")
         return None, None, None
 
 
-def rasch_model_analysis(data_matrix):
+def build_test_snapshot(test_id, data):
+    """Bitta test bo'yicha hisobot uchun kerakli ma'lumotlar nusxasi
+
+    Alohida jarayonga (jobs.run_job) butun bazani emas, faqat shu test,
+    uning natijalari va qatnashgan foydalanuvchilarni yuborish uchun.
+    Natijalar kaliti sifatida tartib raqami ishlatiladi - hisobotlar
+    natija ID sidan foydalanmaydi.
+    """
+    test_results = get_test_results(test_id, data)
+    users = data.get('users', {})
+    participants = {str(r['user_id']) for r in test_results}
+    snapshot = {
+        'tests': {},
+        'user_results': {str(idx): r for idx, r in enumerate(test_results)},
+        'users': {uid: users[uid] for uid in participants if uid in users}
+    }
+    if test_id in data.get('tests', {}):
+        snapshot['tests'][test_id] = data['tests'][test_id]
+    # 0-1 matritsa bot jarayonida bir marta quriladi (keshdan), ishchi
+    # jarayonlardagi barcha hisobotlar shu matritsadan foydalanadi
+    tensor = get_response_tensor(test_id, data)
+    if tensor is not None:
+        snapshot['response_tensors'] = {test_id: tensor}
+    return snapshot
+
+
+def generate_test_results_excel(test_id, finalized_results):
+    """Test natijalari Excel faylini yaratish (foiz bo'yicha tartiblangan)
+
+    Format:
+    # | Talabgor | To'g'ri javoblar | Jami savollar | Foiz (%) | Vaqt
+
+    Returns:
+    - BytesIO: Excel fayl (SAVE_REPORTS bo'lsa final_results/ ga ham yoziladi)
+    """
+    from openpyxl.utils import get_column_letter
+
+    # Excel fayl yaratish (oqimli)
+    wb = _excel_workbook()
+    ws = wb.create_sheet("Test Natijalari")
+    headers = ['#', 'Talabgor', 'To\'g\'ri javoblar', 'Jami savollar', 'Foiz (%)', 'Vaqt']
+
+    # Ustunlarni kengaytirish (write-only rejimda qatorlardan oldin)
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 20
+
+    # Header qator
+    ws.append(_styled_row(ws, headers, 'report_header'))
+
+    # Ma'lumotlar qatorlari (markazlashtirilgan)
+    for idx, result in enumerate(finalized_results, 1):
+        completed_time = datetime.fromisoformat(result['completed_at']).strftime('%Y-%m-%d %H:%M')
+        row = [
+            idx,
+            result['user_id'],
+            result['correct'],
+            result['total'],
+            round(result['percentage'], 2),
+            completed_time
+        ]
+        ws.append(_styled_row(ws, row, 'centered'))
+
+    return _workbook_buffer(wb, "final_results", f"test_results_{test_id}_")
+
+
+def _solve_rasch(data_matrix, beta_init=None, group_responses=False):
+    """Rasch modeli tenglamalarini yechish (guruhlangan to'liq Newton)
+
+    rasch_model_analysis() va rasch_fit_analysis() uchun umumiy. Theta
+    xom ball guruhlari bo'yicha va markazlashtirilmagan holda qaytariladi.
+
+    Returns:
+        dict: theta, beta, scores (guruhlar xom bali), counts (guruhdagi
+        talabalar soni), student_scores, responses (group_responses=True
+        bo'lsa - guruhlar x savollar to'g'ri javoblar soni), p va info
+        buferlari, iterations
+    """
+    import numpy as np
+    from scipy.special import expit
+
+    n_students, n_items = data_matrix.shape
+    
+    # Boshlang'ich baholar
+    student_scores = np.sum(data_matrix, axis=1, dtype=np.int64)
+    
+    # Talabalarni xom ball bo'yicha guruhlash
+    score_counts = np.bincount(student_scores, minlength=n_items + 1)
+    scores = np.flatnonzero(score_counts)
+    counts = score_counts[scores].astype(np.float64)
+    raw_scores = scores.astype(np.float64)
+    n_groups = len(scores)
+    
+    responses = None
+    if group_responses:
+        # Har bir guruhda har bir savolga to'g'ri javoblar soni (guruhlar x savollar) -
+        # savollar bo'yicha yig'indi ham shundan olinadi
+        order = np.argsort(student_scores, kind='stable')
+        starts = np.searchsorted(student_scores[order], scores)
+        responses = np.add.reduceat(data_matrix[order], starts, axis=0, dtype=np.float64)
+        item_scores = responses.sum(axis=0)
+    else:
+        item_scores = np.sum(data_matrix, axis=0, dtype=np.float64)
+    
+    # Theta (guruh qobiliyatlari) - logit transformatsiya
+    p0 = np.clip((raw_scores + 0.5) / (n_items + 1), 1e-6, 1 - 1e-6)
+    theta = np.log(p0 / (1 - p0))
+    theta[raw_scores == 0] = -3.0
+    theta[raw_scores == n_items] = 3.0
+    
+    if beta_init is not None and len(beta_init) == n_items:
+        # Warm start - oldingi tahlil natijasidan
+        beta = np.array(beta_init, dtype=np.float64)
+    else:
+        # Beta (savol qiyinliklari) - logit transformatsiya
+        p0 = np.clip((item_scores + 0.5) / (n_students + 1), 1e-6, 1 - 1e-6)
+        beta = -np.log(p0 / (1 - p0))
+        beta[item_scores == 0] = 3.0
+        beta[item_scores == n_students] = -3.0
+    
+    # MLE iteratsiyalari (Rasch model uchun) - to'liq Newton qadami.
+    # Guruhlash tufayli tenglamalar soni kichik (n_groups + n_items), shuning
+    # uchun theta va beta orasidagi bog'liqlikni hisobga olgan holda bitta
+    # chiziqli sistema yechiladi va bir necha iteratsiyada yaqinlashadi.
+    max_iter = 100
+    tol = 1e-6
+    max_step = 2.0
+    REG_LAMBDA = RASCH_REG_LAMBDA
+    
+    # Iteratsiyalar davomida qayta ishlatiladigan buferlar
+    p = np.empty((n_groups, n_items), dtype=np.float64)
+    info = np.empty_like(p)
+    n_params = n_groups + n_items
+    hessian = np.zeros((n_params, n_params), dtype=np.float64)
+    gradient = np.empty(n_params, dtype=np.float64)
+    grad_theta = gradient[:n_groups]
+    grad_beta = gradient[n_groups:]
+    diagonal = hessian.reshape(-1)[::n_params + 1]
+    theta_diag = diagonal[:n_groups]
+    beta_diag = diagonal[n_groups:]
+    cross = hessian[:n_groups, n_groups:]
+    cross_t = hessian[n_groups:, :n_groups]
+    group_buf = np.empty(n_groups, dtype=np.float64)
+    item_buf = np.empty(n_items, dtype=np.float64)
+    
+    for iteration in range(max_iter):
+        # Ehtimolliklar hisoblash: p = expit(theta - beta)
+        np.subtract.outer(theta, beta, out=p)
+        np.clip(p, -15, 15, out=p)
+        expit(p, out=p)
+        # Fisher ma'lumoti: p * (1 - p)
+        np.subtract(1.0, p, out=info)
+        info *= p
+        
+        # Gradient: guruh uchun c * (xom ball - kutilgan ball - lambda*theta),
+        # savol uchun kutilgan ball - haqiqiy ball - lambda*beta
+        np.sum(p, axis=1, out=grad_theta)
+        np.subtract(raw_scores, grad_theta, out=grad_theta)
+        grad_theta -= REG_LAMBDA * theta
+        grad_theta *= counts
+        np.dot(counts, p, out=grad_beta)
+        grad_beta -= item_scores
+        grad_beta -= REG_LAMBDA * beta
+        
+        # Manfiy Hessian (musbat aniqlangan)
+        np.sum(info, axis=1, out=group_buf)
+        group_buf += REG_LAMBDA
+        np.multiply(group_buf, counts, out=theta_diag)
+        np.dot(counts, info, out=item_buf)
+        np.add(item_buf, REG_LAMBDA, out=beta_diag)
+        np.multiply(info, counts[:, np.newaxis], out=cross)
+        np.negative(cross, out=cross)
+        cross_t[...] = cross.T
+        
+        step = np.linalg.solve(hessian, gradient)
+        step_size = np.max(np.abs(step))
+        if step_size > max_step:
+            # Boshlang'ich nuqta uzoq bo'lsa, qadamni cheklash
+            step *= max_step / step_size
+        theta += step[:n_groups]
+        beta += step[n_groups:]
+        
+        # Konvergensiya tekshiruvi
+        if step_size < tol:
+            break
+    
+    return {
+        'theta': theta,
+        'beta': beta,
+        'scores': scores,
+        'counts': counts,
+        'student_scores': student_scores,
+        'responses': responses,
+        'p': p,
+        'info': info,
+        'iterations': iteration + 1,
+    }
+
+
+def rasch_model_analysis(data_matrix, beta_init=None):
     """
     Rasch model (1PL IRT) tahlili
     
+    Rasch modelida xom ball theta uchun yetarli statistika: bir xil ballga
+    ega talabalar bir xil theta oladi. Shuning uchun Newton iteratsiyalari
+    talabalar bo'yicha emas, turli xom ballar bo'yicha (ko'pi bilan
+    n_items + 1 guruh) bajariladi - 10k+ talabada ham iteratsiya narxi
+    o'zgarmaydi.
+    
     Parameters:
     - data_matrix: Numpy array (qatorlar: talabalar, ustunlar: savollar), 0/1
+    - beta_init: Oldingi tahlildan savollar qiyinligi (warm start), ixtiyoriy
     
     Returns:
     - theta: Talabalar qobiliyati (float32)
     - beta: Savollar qiyinligi (float32)
     """
-    n_students, n_items = data_matrix.shape
+    import numpy as np
+
+    solution = _solve_rasch(data_matrix, beta_init)
+    return _student_abilities(solution).astype(np.float32), solution['beta'].astype(np.float32)
+
+
+def _student_abilities(solution):
+    """Guruh qiymatlarini talabalarga qaytarish (theta markazlashtirilgan)"""
+    import numpy as np
+
+    counts = solution['counts']
+    # Identifikatsiya: theta ni markazlash (talabalar bo'yicha mean = 0)
+    theta = solution['theta'] - np.dot(counts, solution['theta']) / counts.sum()
+    theta_by_score = np.zeros(solution['scores'][-1] + 1, dtype=np.float64)
+    theta_by_score[solution['scores']] = theta
+    return theta_by_score[solution['student_scores']]
+
+
+def _separation(values, errors, weights=None):
+    """Ishonchlilik (reliability) va ajratish (separation) indekslari
+
+    Kuzatilgan dispersiyadan o'rtacha xatolik kvadrati ayiriladi - qolgani
+    "haqiqiy" dispersiya.
+    """
+    import numpy as np
+
+    if len(values) == 0 or (weights is not None and weights.sum() == 0):
+        return 0.0, 0.0
+    mean = np.average(values, weights=weights)
+    observed = np.average((values - mean) ** 2, weights=weights)
+    error = np.average(errors ** 2, weights=weights)
+    true_variance = max(observed - error, 0.0)
+    reliability = true_variance / observed if observed > 0 else 0.0
+    separation = np.sqrt(true_variance / error) if error > 0 else 0.0
+    return float(reliability), float(separation)
+
+
+def rasch_fit_analysis(data_matrix, beta_init=None):
+    """
+    Rasch tahlili standart xatoliklar va moslik (fit) ko'rsatkichlari bilan
     
-    # Boshlang'ich baholar
-    student_scores = np.sum(data_matrix, axis=1, dtype=np.float64)
-    item_scores = np.sum(data_matrix, axis=0, dtype=np.float64)
-    
-    # Theta (talaba qobiliyatlari) - logit transformatsiya
-    theta = np.zeros(n_students, dtype=np.float64)
-    for i in range(n_students):
-        if student_scores[i] == 0:
-            theta[i] = -3.0
-        elif student_scores[i] == n_items:
-            theta[i] = 3.0
-        else:
-            p = (student_scores[i] + 0.5) / (n_items + 1)
-            p = np.clip(p, 1e-6, 1 - 1e-6)
-            theta[i] = np.log(p / (1 - p))
-    
-    # Beta (savol qiyinliklari) - logit transformatsiya
-    beta = np.zeros(n_items, dtype=np.float64)
-    for j in range(n_items):
-        if item_scores[j] == 0:
-            beta[j] = 3.0
-        elif item_scores[j] == n_students:
-            beta[j] = -3.0
-        else:
-            p = (item_scores[j] + 0.5) / (n_students + 1)
-            p = np.clip(p, 1e-6, 1 - 1e-6)
-            beta[j] = -np.log(p / (1 - p))
+    Barcha ko'rsatkichlar yechimdagi guruhlar x savollar ehtimolliklar
+    matritsasidan (p) hisoblanadi - talabalar matritsasi qayta o'qilmaydi.
+    Qoldiqlar kvadrati guruhlar bo'yicha yig'iladi: guruhdagi to'g'ri
+    javoblar soni n1 bo'lsa, sum (x - p)^2 = n1 * (1 - 2p) + c * p^2.
+    Infit/outfit hisoblashda 0 va maksimal ball olgan talabalar
+    hisobga olinmaydi (ular uchun qoldiqlar ma'lumot bermaydi).
+    
+    Parameters:
+    - data_matrix: Numpy array (qatorlar: talabalar, ustunlar: savollar), 0/1
+    - beta_init: Oldingi tahlildan savollar qiyinligi (warm start), ixtiyoriy
+    
+    Returns:
+    - dict: theta, beta (float32), theta_se, beta_se, infit, outfit,
+      item_reliability, item_separation, person_reliability,
+      person_separation, iterations
+    """
+    import numpy as np
+    from scipy.special import expit
+
+    n_items = data_matrix.shape[1]
+    solution = _solve_rasch(data_matrix, beta_init, group_responses=True)
+    beta, counts, scores = solution['beta'], solution['counts'], solution['scores']
+    
+    # Ehtimolliklarni yakuniy baholarda yangilash (markazlashtirishdan oldingi shkalada)
+    p, info = solution['p'], solution['info']
+    np.subtract.outer(solution['theta'], beta, out=p)
+    np.clip(p, -15, 15, out=p)
+    expit(p, out=p)
+    np.subtract(1.0, p, out=info)
+    info *= p
+    
+    # Standart xatoliklar: 1 / sqrt(Fisher ma'lumoti)
+    group_se = 1.0 / np.sqrt(info.sum(axis=1))
+    beta_se = 1.0 / np.sqrt(np.dot(counts, info))
+    
+    # Infit/outfit (o'rtacha kvadratlar)
+    fitted = (scores > 0) & (scores < n_items)
+    n_fitted = counts[fitted].sum()
+    if n_fitted > 0:
+        fit_p, fit_info, fit_counts = p[fitted], info[fitted], counts[fitted]
+        residuals = solution['responses'][fitted] * (1.0 - 2.0 * fit_p) + fit_counts[:, np.newaxis] * fit_p ** 2
+        outfit = (residuals / fit_info).sum(axis=0) / n_fitted
+        infit = residuals.sum(axis=0) / np.dot(fit_counts, fit_info)
+    else:
+        outfit = infit = np.full(n_items, np.nan)
+    
+    item_reliability, item_separation = _separation(beta, beta_se)
+    person_reliability, person_separation = _separation(
+        solution['theta'][fitted], group_se[fitted], weights=counts[fitted]
+    )
+    
+    se_by_score = np.zeros(n_items + 1, dtype=np.float64)
+    se_by_score[scores] = group_se
+    return {
+        'theta': _student_abilities(solution).astype(np.float32),
+        'beta': beta.astype(np.float32),
+        'theta_se': se_by_score[solution['student_scores']].astype(np.float32),
+        'beta_se': beta_se.astype(np.float32),
+        'infit': infit.astype(np.float32),
+        'outfit': outfit.astype(np.float32),
+        'item_reliability': item_reliability,
+        'item_separation': item_separation,
+        'person_reliability': person_reliability,
+        'person_separation': person_separation,
+        'iterations': solution['iterations'],
+    }
+
+
+def _pcm_moments(theta, steps, step_item, step_level, max_scores):
+    """Partial credit modeli: guruhlar x savollar kategoriya ehtimolliklari va momentlari
+
+    Returns:
+        tuple: (at_least, expected, variance, steps_at_least, steps_cov)
+        at_least[g, i, j] = P(X >= j), steps_* - har bir qadam (i, j) uchun
+        P(X >= j) va Cov(X, [X >= j])
+    """
+    import numpy as np
+
+    n_items = len(max_scores)
+    top = int(max_scores.max())
+    levels = np.arange(top + 1, dtype=np.float64)
+    # Kumulyativ qadam qiyinliklari: sum_{j<=k} delta_ij (k > m_i kategoriyalar yo'q)
+    padded = np.zeros((n_items, top), dtype=np.float64)
+    padded[step_item, step_level - 1] = steps
+    cumulative = np.zeros((n_items, top + 1), dtype=np.float64)
+    np.cumsum(padded, axis=1, out=cumulative[:, 1:])
+    logits = theta[:, np.newaxis, np.newaxis] * levels - cumulative
+    logits[:, levels[np.newaxis, :] > max_scores[:, np.newaxis]] = -np.inf
+    logits -= logits.max(axis=2, keepdims=True)
+    prob = np.exp(logits)
+    prob /= prob.sum(axis=2, keepdims=True)
+
+    # Teskari kumulyativ yig'indilar: P(X >= j) va E[X * [X >= j]]
+    at_least = np.cumsum(prob[:, :, ::-1], axis=2)[:, :, ::-1]
+    weighted = np.cumsum((prob * levels)[:, :, ::-1], axis=2)[:, :, ::-1]
+    expected = weighted[:, :, 0]
+    variance = (prob * levels ** 2).sum(axis=2) - expected ** 2
+    steps_at_least = at_least[:, step_item, step_level]
+    steps_cov = weighted[:, step_item, step_level] - expected[:, step_item] * steps_at_least
+    return at_least, expected, variance, steps_at_least, steps_cov
+
+
+def partial_credit_analysis(score_matrix, max_scores, steps_init=None):
+    """
+    Partial credit model (Masters) - ko'p ballik savollar uchun Rasch tahlili
+    
+    i-savolga k ball olish ehtimoli exp(k*theta - sum_{j<=k} delta_ij) ga
+    proporsional. Bir ballik savol (m = 1) - oddiy Rasch savoli, delta - beta.
+    Bu modelda ham umumiy ball theta uchun yetarli statistika, shuning uchun
+    rasch_model_analysis() dagidek talabalar xom ball bo'yicha guruhlanadi va
+    theta va qadam qiyinliklari uchun bitta to'liq Newton sistemasi
+    yechiladi (xuddi shu regulyarizatsiya bilan).
+    
+    Parameters:
+    - score_matrix: Numpy array (talabalar x savollar), har bir katak 0..max_scores[i]
+    - max_scores: Har bir savolning maksimal bali (kichik savollar soni)
+    - steps_init: Oldingi tahlildan qadam qiyinliklari (warm start), ixtiyoriy
+    
+    Returns:
+    - dict: rasch_fit_analysis() bilan bir xil kalitlar (beta - savolning
+      o'rtacha qadam qiyinligi) va steps - barcha qadam qiyinliklari
+      (savollar tartibida, float32)
+    """
+    import numpy as np
+
+    n_students, n_items = score_matrix.shape
+    max_scores = np.asarray(max_scores, dtype=np.int64)
+    n_steps = int(max_scores.sum())
+    step_item = np.repeat(np.arange(n_items), max_scores)
+    step_level = np.concatenate([np.arange(1, m + 1) for m in max_scores])
+    
+    # Talabalarni umumiy ball bo'yicha guruhlash
+    student_scores = np.sum(score_matrix, axis=1, dtype=np.int64)
+    score_counts = np.bincount(student_scores, minlength=n_steps + 1)
+    scores = np.flatnonzero(score_counts)
+    counts = score_counts[scores].astype(np.float64)
+    raw_scores = scores.astype(np.float64)
+    n_groups = len(scores)
+    
+    # Guruhlar bo'yicha ballar yig'indisi va kvadratlari (fit ko'rsatkichlari uchun)
+    order = np.argsort(student_scores, kind='stable')
+    starts = np.searchsorted(student_scores[order], scores)
+    sorted_scores = score_matrix[order].astype(np.float64)
+    sum_x = np.add.reduceat(sorted_scores, starts, axis=0)
+    sum_x2 = np.add.reduceat(sorted_scores ** 2, starts, axis=0)
+    # Har bir savol bo'yicha kategoriyalar soni -> kamida j ball olganlar soni
+    category_counts = np.zeros((n_items, int(max_scores.max()) + 1), dtype=np.float64)
+    for item in range(n_items):
+        category_counts[item] = np.bincount(score_matrix[:, item], minlength=category_counts.shape[1])
+    at_least_counts = np.cumsum(category_counts[:, ::-1], axis=1)[:, ::-1]
+    observed_steps = at_least_counts[step_item, step_level]
+    
+    # Boshlang'ich qiymatlar
+    p0 = np.clip((raw_scores + 0.5) / (n_steps + 1), 1e-6, 1 - 1e-6)
+    theta = np.log(p0 / (1 - p0))
+    theta[raw_scores == 0] = -3.0
+    theta[raw_scores == n_steps] = 3.0
+    if steps_init is not None and len(steps_init) == n_steps:
+        steps = np.array(steps_init, dtype=np.float64)
+    else:
+        # Qo'shni kategoriyalar nisbati: delta_ij ~ log(n_{j-1} / n_j)
+        below = category_counts[step_item, step_level - 1]
+        steps = np.log((below + 0.5) / (category_counts[step_item, step_level] + 0.5))
     
-    # MLE iteratsiyalari (Rasch model uchun)
     max_iter = 100
     tol = 1e-6
-    REG_LAMBDA = 0.05
+    max_step = 2.0
+    REG_LAMBDA = RASCH_REG_LAMBDA
+    
+    n_params = n_groups + n_steps
+    hessian = np.zeros((n_params, n_params), dtype=np.float64)
+    gradient = np.empty(n_params, dtype=np.float64)
+    same_item = step_item[:, np.newaxis] == step_item[np.newaxis, :]
+    higher_level = np.maximum(step_level[:, np.newaxis], step_level[np.newaxis, :])
     
     for iteration in range(max_iter):
-        old_theta = theta.copy()
-        old_beta = beta.copy()
-        
-        # Ehtimolliklar hisoblash
-        logits = theta[:, np.newaxis] - beta[np.newaxis, :]
-        np.clip(logits, -15, 15, out=logits)
-        p = expit(logits)
-        residuals = data_matrix - p
-        
-        # Theta yangilanishi
-        grad_theta = np.sum(residuals, axis=1) - REG_LAMBDA * theta
-        hess_theta = np.sum(p * (1 - p), axis=1) + REG_LAMBDA
-        update_theta = np.where(hess_theta > 1e-10, grad_theta / hess_theta, 0.0)
-        theta += update_theta
-        
-        # Beta yangilanishi
-        grad_beta = -np.sum(residuals, axis=0) - REG_LAMBDA * beta
-        hess_beta = np.sum(p * (1 - p), axis=0) + REG_LAMBDA
-        update_beta = np.where(hess_beta > 1e-10, grad_beta / hess_beta, 0.0)
-        beta += update_beta
+        at_least, expected, variance, steps_at_least, steps_cov = _pcm_moments(
+            theta, steps, step_item, step_level, max_scores
+        )
         
-        # Konvergensiya tekshiruvi
-        if max(np.max(np.abs(update_theta)), np.max(np.abs(update_beta))) < tol:
+        # Gradient: guruh uchun c * (xom ball - kutilgan ball - lambda*theta),
+        # qadam uchun kutilgan - haqiqiy "kamida j ball" soni - lambda*delta
+        gradient[:n_groups] = counts * (raw_scores - expected.sum(axis=1) - REG_LAMBDA * theta)
+        gradient[n_groups:] = counts @ steps_at_least - observed_steps - REG_LAMBDA * steps
+        
+        # Manfiy Hessian: theta - Var(X), qadamlar - Cov([X >= j], [X >= l])
+        # (faqat bitta savol qadamlari orasida), theta x qadam - -Cov(X, [X >= j])
+        hessian[:n_groups, :n_groups] = np.diag(counts * (variance.sum(axis=1) + REG_LAMBDA))
+        cross = -counts[:, np.newaxis] * steps_cov
+        hessian[:n_groups, n_groups:] = cross
+        hessian[n_groups:, :n_groups] = cross.T
+        weighted_at_least = counts @ at_least.reshape(n_groups, -1)
+        weighted_at_least = weighted_at_least.reshape(n_items, -1)[step_item[:, np.newaxis], higher_level]
+        step_block = weighted_at_least - (steps_at_least * counts[:, np.newaxis]).T @ steps_at_least
+        step_block[~same_item] = 0.0
+        step_block[np.diag_indices(n_steps)] += REG_LAMBDA
+        hessian[n_groups:, n_groups:] = step_block
+        
+        step = np.linalg.solve(hessian, gradient)
+        step_size = np.max(np.abs(step))
+        if step_size > max_step:
+            step *= max_step / step_size
+        theta += step[:n_groups]
+        steps += step[n_groups:]
+        if step_size < tol:
             break
     
-    # Identifikatsiya: theta ni markazlash (mean = 0)
-    theta = theta - np.mean(theta)
+    # Yakuniy baholardagi momentlar - standart xatoliklar va fit ko'rsatkichlari
+    _, expected, variance, _, _ = _pcm_moments(theta, steps, step_item, step_level, max_scores)
+    group_se = 1.0 / np.sqrt(variance.sum(axis=1))
+    beta_se = 1.0 / np.sqrt(counts @ variance)
+    
+    fitted = (scores > 0) & (scores < n_steps)
+    n_fitted = counts[fitted].sum()
+    if n_fitted > 0:
+        fit_expected, fit_variance, fit_counts = expected[fitted], variance[fitted], counts[fitted]
+        # sum (x - E)^2 = sum x^2 - 2E * sum x + c * E^2
+        residuals = sum_x2[fitted] - 2.0 * fit_expected * sum_x[fitted] + fit_counts[:, np.newaxis] * fit_expected ** 2
+        outfit = (residuals / fit_variance).sum(axis=0) / n_fitted
+        infit = residuals.sum(axis=0) / (fit_counts @ fit_variance)
+    else:
+        outfit = infit = np.full(n_items, np.nan)
     
-    return theta.astype(np.float32), beta.astype(np.float32)
+    # Savol joylashuvi - qadam qiyinliklarining o'rtachasi
+    locations = np.bincount(step_item, weights=steps, minlength=n_items) / max_scores
+    item_reliability, item_separation = _separation(locations, beta_se)
+    person_reliability, person_separation = _separation(theta[fitted], group_se[fitted], weights=counts[fitted])
+    
+    solution = {'theta': theta, 'beta': locations, 'scores': scores, 'counts': counts,
+                'student_scores': student_scores}
+    se_by_score = np.zeros(n_steps + 1, dtype=np.float64)
+    se_by_score[scores] = group_se
+    return {
+        'theta': _student_abilities(solution).astype(np.float32),
+        'beta': locations.astype(np.float32),
+        'steps': steps.astype(np.float32),
+        'theta_se': se_by_score[student_scores].astype(np.float32),
+        'beta_se': beta_se.astype(np.float32),
+        'infit': infit.astype(np.float32),
+        'outfit': outfit.astype(np.float32),
+        'item_reliability': item_reliability,
+        'item_separation': item_separation,
+        'person_reliability': person_reliability,
+        'person_separation': person_separation,
+        'iterations': iteration + 1,
+    }
+
+
+def estimate_ability(raw_score, beta, max_iter=50, tol=1e-6):
+    """Bitta talaba qobiliyatini (theta) ma'lum savollar qiyinligi bo'yicha baholash
+
+    rasch_model_analysis() (yoki partial_credit_analysis()) dagi theta
+    tenglamasi (xuddi shu regulyarizatsiya bilan) qiyinliklar o'zgarmas deb
+    yechiladi. Har bir Newton iteratsiyasi O(savollar soni) - numpy kerak emas.
+
+    Parameters:
+    - raw_score: Umumiy ball (shu savollar bo'yicha)
+    - beta: Savollar qiyinligi (kalibrovkadan); ko'p ballik savol uchun
+      qadam qiyinliklari ro'yxati
+
+    Returns:
+    - theta: Qobiliyat bahosi (markazlashtirilmagan)
+    """
+    import math
+
+    items = [b if isinstance(b, (list, tuple)) else [b] for b in beta]
+    max_score = sum(len(steps) for steps in items)
+    if max_score == 0:
+        return 0.0
+    p0 = min(max((raw_score + 0.5) / (max_score + 1), 1e-6), 1 - 1e-6)
+    theta = math.log(p0 / (1 - p0))
+    for _ in range(max_iter):
+        expected = 0.0
+        info = RASCH_REG_LAMBDA
+        for steps in items:
+            if len(steps) == 1:
+                p = 1.0 / (1.0 + math.exp(-min(max(theta - steps[0], -15.0), 15.0)))
+                expected += p
+                info += p * (1.0 - p)
+                continue
+            # Kategoriyalar ehtimolliklari: exp(k*theta - sum_{j<=k} delta_j)
+            logits = [0.0]
+            for delta in steps:
+                logits.append(logits[-1] + theta - delta)
+            top = max(logits)
+            weights = [math.exp(logit - top) for logit in logits]
+            total = sum(weights)
+            mean = sum(k * w for k, w in enumerate(weights)) / total
+            expected += mean
+            info += sum(k * k * w for k, w in enumerate(weights)) / total - mean * mean
+        step = (raw_score - expected - RASCH_REG_LAMBDA * theta) / info
+        step = min(max(step, -2.0), 2.0)
+        theta += step
+        if abs(step) < tol:
+            break
+    return theta
 
 
 def ability_to_standard_score(ability):
@@ -514,6 +1169,8 @@ def ability_to_standard_score(ability):
     Returns:
     - standard_score: Standart ball (0-100)
     """
+    import numpy as np
+
     t_score = 50 + (10 * ability)
     standard_score = np.clip(t_score, 0, 100)
     return standard_score
@@ -529,6 +1186,8 @@ def ability_to_grade(ability):
     Returns:
     - grade: Tayinlangan baho
     """
+    import numpy as np
+
     t_score = ability_to_standard_score(ability)
     
     if isinstance(t_score, np.ndarray):
@@ -556,6 +1215,92 @@ def ability_to_grade(ability):
             return 'NC'
 
 
+def _fit_rasch(test_id, question_range, data_matrix, beta_init=None):
+    """Rasch tahlili - shu test uchun oldingi qiyinliklardan boshlab (warm start)
+
+    Standart xatoliklar va fit ko'rsatkichlari ham qaytariladi
+    (rasch_fit_analysis). Bir nechta yangi natija qo'shilgandan keyingi
+    qayta tahlil oldingi yechimga yaqin nuqtadan boshlanadi. Qiyinliklar jarayon xotirasida
+    saqlanadi (har bir ishchi jarayonda o'zining nusxasi); xotirada
+    bo'lmasa beta_init (testning saqlangan kalibrovkasi) ishlatiladi.
+    """
+    key = (test_id, question_range)
+    fit = rasch_fit_analysis(data_matrix, beta_init=_rasch_difficulties.get(key, beta_init))
+    _rasch_difficulties[key] = fit['beta']
+    return fit
+
+
+def rasch_columns(tensor, question_range):
+    """Rasch tahlilida ishlatiladigan matrix ustunlari
+
+    '1-40' - 1-40 savollarning barcha ustunlari; '40-43' - 36-40 yozma
+    savollar va 41-43 masalalarning har bir kichik savoli.
+    """
+    import numpy as np
+
+    if question_range == '1-40':
+        return response_columns(tensor, 1, 40)
+    return np.concatenate([
+        response_columns(tensor, 36, 40, types=('text_answer',)),
+        response_columns(tensor, 41, 43, types=('problem',))
+    ])
+
+
+def _calibrated_difficulties(test, question_range, columns):
+    """Testning saqlangan kalibrovkasidagi qiyinliklar (ustunlar mos kelsa)
+
+    '1-40' uchun savollar qiyinligi (beta), '40-43' uchun partial credit
+    modelining qadam qiyinliklari (steps).
+    """
+    calibrated = (test.get('calibration') or {}).get('ranges', {}).get(question_range)
+    if calibrated and calibrated.get('columns') == [int(c) for c in columns]:
+        return calibrated.get('steps' if question_range == '40-43' else 'beta')
+    return None
+
+
+def written_item_scores(tensor, columns):
+    """'40-43' qism uchun talabgorlar x savollar ballari matritsasi
+
+    36-40 yozma savollar - 0/1, 41-43 masalalar - to'g'ri kichik javoblar
+    soni (0..kichik savollar soni). columns - rasch_columns(tensor, '40-43').
+
+    Returns:
+        tuple: (ballar matritsasi (uint8), har bir savolning maksimal bali, savollar nomlari)
+    """
+    import numpy as np
+
+    item_question = tensor['item_question'][columns]
+    # Bitta savol ustunlari ketma-ket turadi - har bir savolning birinchi ustuni
+    starts = np.flatnonzero(np.r_[True, item_question[1:] != item_question[:-1]])
+    scores = np.add.reduceat(tensor['matrix'][:, columns], starts, axis=1, dtype=np.uint8)
+    max_scores = np.diff(np.r_[starts, len(columns)])
+    labels = [f"Q{int(q) + 1}" for q in item_question[starts]]
+    return scores, max_scores.tolist(), labels
+
+
+def _fit_partial_credit(test_id, score_matrix, max_scores, steps_init=None):
+    """Partial credit tahlili - _fit_rasch() dagidek oldingi qadam qiyinliklaridan boshlab"""
+    key = (test_id, '40-43')
+    fit = partial_credit_analysis(score_matrix, max_scores, steps_init=_rasch_difficulties.get(key, steps_init))
+    _rasch_difficulties[key] = fit['steps']
+    return fit
+
+
+def _fit_statistics(fit, labels):
+    """perform_rasch_analysis natijasi uchun xatoliklar va fit ko'rsatkichlari"""
+    return {
+        'item_labels': labels,
+        'ability_standard_errors': fit['theta_se'].tolist(),
+        'item_standard_errors': fit['beta_se'].tolist(),
+        'item_infit': fit['infit'].tolist(),
+        'item_outfit': fit['outfit'].tolist(),
+        'item_reliability': fit['item_reliability'],
+        'item_separation': fit['item_separation'],
+        'person_reliability': fit['person_reliability'],
+        'person_separation': fit['person_separation'],
+    }
+
+
 def perform_rasch_analysis(test_id, data, question_range='1-40'):
     """
     Test natijalarini Rasch modelida tahlil qilish
@@ -563,42 +1308,37 @@ def perform_rasch_analysis(test_id, data, question_range='1-40'):
     Parameters:
     - test_id: Test ID
     - data: Ma'lumotlar bazasi
-    - question_range: '1-40' yoki '40-43' (yozma savollar)
+    - question_range: '1-40' yoki '40-43' (yozma savollar, partial credit model)
     
     Returns:
     - dict: Rasch tahlil natijalari
     """
+    import numpy as np
+
     try:
-        # Test natijalarini to'plash
-        test_results = [
-            r for r_id, r in data.get('user_results', {}).items()
-            if r.get('test_id') == test_id
-        ]
+        # 0-1 matritsa (keshdan yoki nusxadan) - natijalar qayta aylanib chiqilmaydi
+        tensor = get_response_tensor(test_id, data)
         
-        if not test_results or len(test_results) < 2:
+        if tensor is None or len(tensor['user_ids']) < 2:
             return None  # Kamida 2 ta natija kerak
         
-        test = data.get('tests', {}).get(test_id)
-        if not test:
+        if test_id not in data.get('tests', {}):
             return None
+        test = data['tests'][test_id]
         
-        user_ids = []
+        user_ids = tensor['user_ids'].tolist()
+        n_students = len(user_ids)
         
         if question_range == '1-40':
             # 1-40 savollar uchun (ko'p tanlov)
-            n_students = len(test_results)
-            n_items = 40
-            
-            data_matrix = np.zeros((n_students, n_items), dtype=np.int32)
+            columns = rasch_columns(tensor, question_range)
+            data_matrix = tensor['matrix'][:, columns]
+            n_items = data_matrix.shape[1]
             
-            for idx, result in enumerate(test_results):
-                user_ids.append(result['user_id'])
-                # Birinchi 40 ta savol uchun javoblar
-                for i, res in enumerate(result['results'][:40]):
-                    data_matrix[idx, i] = 1 if res.get('is_correct') else 0
-            
-            # Rasch model tahlili
-            theta, beta = rasch_model_analysis(data_matrix)
+            # Rasch model tahlili (oldingi yoki kalibrovkadagi qiyinliklardan boshlab)
+            fit = _fit_rasch(test_id, question_range, data_matrix,
+                             _calibrated_difficulties(test, question_range, columns))
+            theta = fit['theta']
             
             # Har bir talaba uchun standart ball va baho
             standard_scores = ability_to_standard_score(theta)
@@ -609,65 +1349,29 @@ def perform_rasch_analysis(test_id, data, question_range='1-40'):
                 'abilities': theta.tolist(),
                 'standard_scores': standard_scores.tolist() if isinstance(standard_scores, np.ndarray) else [standard_scores],
                 'grades': grades.tolist() if isinstance(grades, np.ndarray) else [grades],
-                'item_difficulties': beta.tolist(),
+                'item_difficulties': fit['beta'].tolist(),
                 'n_students': n_students,
-                'n_items': n_items
+                'n_items': n_items,
+                **_fit_statistics(fit, [tensor['labels'][c] for c in columns])
             }
         
         elif question_range == '40-43':
-            # 40-43 savollar uchun (yozma savollar) - Rasch modelida
-            n_students = len(test_results)
-            
-            # 40-43 savollar sonini aniqlash va 0-1 matrix yaratish
-            text_questions = [q for q in test.get('questions', [])[35:40] if q.get('type') == 'text_answer']
-            problem_questions = [q for q in test.get('questions', [])[40:43] if q.get('type') == 'problem']
-            
-            # Har bir masalaviy savol uchun kichik savollar sonini hisoblash
-            total_sub_items = 0
-            for q in problem_questions:
-                total_sub_items += q.get('sub_question_count', 1)
+            # 40-43 savollar uchun (yozma savollar) - partial credit modelida:
+            # 36-40 yozma savollar 0/1, 41-43 masalalar - bitta ko'p ballik savol
+            # (to'g'ri kichik javoblar soni)
+            columns = rasch_columns(tensor, question_range)
             
-            n_text_items = len(text_questions)
-            total_items = n_text_items + total_sub_items
-            
-            if total_items == 0:
+            if len(columns) == 0:
                 return None
             
-            # 0-1 matrix yaratish (har bir kichik savol uchun alohida ustun)
-            data_matrix = np.zeros((n_students, total_items), dtype=np.int32)
-            
-            # Avval barcha user_ids ni to'plash
-            for result in test_results:
-                user_ids.append(result['user_id'])
+            score_matrix, max_scores, labels = written_item_scores(tensor, columns)
+            total_items = len(max_scores)
             
-            # Keyin matrix yaratish
-            for idx, result in enumerate(test_results):
-                item_idx = 0
-                
-                # 36-40 yozma savollar (indices 35-39)
-                for i in range(35, min(40, len(result['results']))):
-                    res = result['results'][i]
-                    if res.get('is_correct'):
-                        data_matrix[idx, item_idx] = 1
-                    item_idx += 1
-                
-                # 41-43 masalaviy savollar (indices 40-42)
-                for i in range(40, min(43, len(result['results']))):
-                    res = result['results'][i]
-                    if res.get('type') == 'problem' and 'sub_results' in res:
-                        # Har bir kichik savol uchun alohida ustun
-                        for sub in res['sub_results']:
-                            if sub.get('is_correct'):
-                                data_matrix[idx, item_idx] = 1
-                            item_idx += 1
-                    else:
-                        # Oddiy savol
-                        if res.get('is_correct'):
-                            data_matrix[idx, item_idx] = 1
-                        item_idx += 1
-            
-            # Rasch model tahlili
-            theta, beta = rasch_model_analysis(data_matrix)
+            # Tahlil (oldingi yoki kalibrovkadagi qadam qiyinliklaridan boshlab)
+            fit = _fit_partial_credit(test_id, score_matrix, max_scores,
+                                      _calibrated_difficulties(test, question_range, columns))
+            theta = fit['theta']
+            steps = iter(fit['steps'].tolist())
             
             # Har bir talaba uchun standart ball (0-100)
             standard_scores = ability_to_standard_score(theta)
@@ -678,11 +1382,14 @@ def perform_rasch_analysis(test_id, data, question_range='1-40'):
             return {
                 'user_ids': user_ids,
                 'abilities': theta.tolist(),
-                'written_scores': written_scores_scaled,  # 0-75 shkalada (Rasch model asosida)
-                'written_scores_raw': standard_scores.tolist() if isinstance(standard_scores, np.ndarray) else [standard_scores],  # 0-100 shkalada (Rasch model)
-                'item_difficulties': beta.tolist(),
+                'written_scores': written_scores_scaled,  # 0-75 shkalada (partial credit model asosida)
+                'written_scores_raw': standard_scores.tolist() if isinstance(standard_scores, np.ndarray) else [standard_scores],  # 0-100 shkalada
+                'item_difficulties': fit['beta'].tolist(),  # qadam qiyinliklarining o'rtachasi
+                'step_difficulties': [[next(steps) for _ in range(m)] for m in max_scores],
+                'max_scores': max_scores,
                 'n_students': n_students,
-                'n_items': total_items
+                'n_items': total_items,
+                **_fit_statistics(fit, labels)
             }
         
         return None
@@ -692,6 +1399,58 @@ def perform_rasch_analysis(test_id, data, question_range='1-40'):
         return None
 
 
+def _excel_number(value, digits=3):
+    """Excel katagi uchun son (NaN - bo'sh katak)"""
+    import math
+
+    return None if value is None or math.isnan(value) else round(value, digits)
+
+
+def _write_rasch_statistics_sheet(wb, analyses, data):
+    """Yakuniy natijalar faylida Rasch tahlili ko'rsatkichlari varag'i
+
+    analyses - [(question_range, perform_rasch_analysis natijasi), ...]
+    wb - _excel_workbook() kitobi
+    """
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet("Rasch tahlili")
+    ws.column_dimensions['A'].width = 28
+    for col in range(2, 2 * len(analyses) + 2):
+        ws.column_dimensions[get_column_letter(col)].width = 14
+
+    # Savollar: qiyinlik, standart xatolik, infit/outfit
+    for question_range, analysis in analyses:
+        ws.append(_styled_row(ws, [f"{question_range} savollar"], 'section_title'))
+        ws.append(_styled_row(ws, ['Savol', 'Qiyinlik (β)', 'SE', 'Infit MNSQ', 'Outfit MNSQ'], 'report_header'))
+        for row in zip(analysis['item_labels'], analysis['item_difficulties'], analysis['item_standard_errors'],
+                       analysis['item_infit'], analysis['item_outfit']):
+            ws.append([row[0]] + [_excel_number(v) for v in row[1:]])
+        ws.append([])
+
+    # Ishonchlilik va ajratish indekslari
+    ws.append(_styled_row(ws, ["Ko'rsatkich"] + [question_range for question_range, _ in analyses],
+                          'report_header'))
+    for title, key in (("Savollar ishonchliligi", 'item_reliability'),
+                       ("Savollar ajratilishi", 'item_separation'),
+                       ("Talabgorlar ishonchliligi", 'person_reliability'),
+                       ("Talabgorlar ajratilishi", 'person_separation')):
+        ws.append([title] + [_excel_number(analysis[key]) for _, analysis in analyses])
+    ws.append([])
+
+    # Talabgorlar: qobiliyat (θ) va uning standart xatoligi
+    ws.append(_styled_row(ws, ['Talabgor'] + [f"{label} ({question_range})" for question_range, _ in analyses
+                                              for label in ('θ', 'SE')], 'report_header'))
+    user_ids = analyses[0][1]['user_ids']
+    names = _participant_names(user_ids, data)
+    columns = [(a['abilities'], a['ability_standard_errors']) for _, a in analyses]
+    for idx, name in enumerate(names):
+        row = [name]
+        for abilities, errors in columns:
+            row += [_excel_number(abilities[idx]), _excel_number(errors[idx])]
+        ws.append(row)
+
+
 def generate_final_results_excel(test_id, data):
     """
     Yakuniy natijalar Excel faylini yaratish
@@ -699,12 +1458,15 @@ def generate_final_results_excel(test_id, data):
     Format:
     Talabgor | Test-ball | Yozma ball | Yakuniy ball | Daraja | Foiz
     
+    Ikkinchi varaq ("Rasch tahlili") - savollar qiyinligi, standart
+    xatoliklar, infit/outfit, ishonchlilik va talabgorlar qobiliyati xatoligi.
+    
     Parameters:
     - test_id: Test ID
     - data: Ma'lumotlar bazasi
     
     Returns:
-    - str: Excel fayl yo'li yoki None
+    - BytesIO: Excel fayl yoki None
     """
     try:
         # 1-40 savollar uchun Rasch tahlili
@@ -715,27 +1477,22 @@ def generate_final_results_excel(test_id, data):
         if not test_results_1_40:
             return None
         
+        from openpyxl.utils import get_column_letter
+        
         # Barcha foydalanuvchilar ro'yxatini olish
         all_user_ids = test_results_1_40['user_ids']
         
-        # Excel fayl yaratish
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Yakuniy Natijalar"
-        
-        # Header
+        # Excel fayl yaratish (oqimli)
+        wb = _excel_workbook()
+        ws = wb.create_sheet("Yakuniy Natijalar")
         headers = ['Talabgor', 'Test-ball', 'Yozma ball', 'Yakuniy ball', 'Daraja', 'Foiz']
-        ws.append(headers)
         
-        # Header qatorini formatlash
-        from openpyxl.styles import Font, Alignment, PatternFill
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
+        # Ustunlarni kengaytirish (write-only rejimda qatorlardan oldin)
+        for col in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 20
         
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = header_fill
+        # Header
+        ws.append(_styled_row(ws, headers, 'report_header'))
         
         # User ID bo'yicha mapping
         test_scores_map = {}
@@ -792,20 +1549,11 @@ def generate_final_results_excel(test_id, data):
             ]
             ws.append(row)
         
-        # Ustunlarni kengaytirish
-        from openpyxl.utils import get_column_letter
-        for col in range(1, len(headers) + 1):
-            col_letter = get_column_letter(col)
-            ws.column_dimensions[col_letter].width = 20
-        
-        # Faylni saqlash
-        results_dir = "final_results"
-        os.makedirs(results_dir, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        file_path = os.path.join(results_dir, f"final_results_{test_id}_{timestamp}.xlsx")
-        wb.save(file_path)
+        # Rasch tahlili ko'rsatkichlari (alohida varaq)
+        analyses = [('1-40', test_results_1_40), ('40-43', test_results_40_43)]
+        _write_rasch_statistics_sheet(wb, [(r, a) for r, a in analyses if a], data)
         
-        return file_path
+        return _workbook_buffer(wb, "final_results", f"final_results_{test_id}_")
         
     except Exception as e:
         logger.error(f"Yakuniy natijalar Excel yaratish xatosi: {e}")